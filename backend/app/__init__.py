@@ -1,22 +1,27 @@
 from flask import Flask, jsonify
 from flask_jwt_extended import JWTManager
-from flask_migrate import Migrate
-from flask_cors import CORS
-from flask_mail import Mail
 from .models import db
 from .config import config_options, validate_mpesa_config
+from .utils.json_provider import FastJSONProvider
+from .utils.db_routing import init_replica
 import os
 from datetime import timedelta
 from .models.user import User  # Make sure to import User model
 
 # Initialize extensions
 jwt = JWTManager()
-migrate = Migrate()
-mail = Mail()
 
-def create_app(config_name='development'):
-    """Application factory function with M-PESA integration"""
+def create_app(config_name='development', slim=False):
+    """Application factory function with M-PESA integration
+    
+    slim=True builds the app for scripts, CLI commands and worker processes:
+    configuration, the database and the background services, but no
+    blueprints, JWT, CORS, rate limiting or compression, so none of the
+    web-only modules are imported. Flask-Migrate (and Alembic) is only set
+    up for slim apps and the `flask` command, never for served web apps.
+    """
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)  # orjson-backed when installed, compact outside debug
     
     # Load configuration
     config_class = config_options[config_name]
@@ -36,7 +41,49 @@ def create_app(config_name='development'):
     app.config['JWT_ERROR_MESSAGE_KEY'] = 'error'
     
     # Initialize extensions
+    init_replica(app, db)  # Adds the read replica bind, so before db.init_app
     db.init_app(app)
+    
+    if slim or os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    
+    # Mail is set up on first send (services.mail_service.get_mail)
+    
+    # Buffered admin activity log writer
+    from .services.audit_writer import audit_writer
+    audit_writer.init_app(app)
+
+    # Matches and posts stored PayBill (C2B) payments off the confirmation request
+    from .services.c2b import c2b_processor
+    c2b_processor.init_app(app)
+
+    # Bump ETag version counters on every commit
+    from .services.cache_versions import register_version_hooks
+    register_version_hooks()
+
+    # WAL, pragmas, write queue and read pool for file-based SQLite
+    from .services.sqlite_tuning import sqlite_tuning
+    sqlite_tuning.init_app(app, db)
+
+    # Password hashing pool with admission control
+    from .services.password_hasher import password_hasher
+    password_hasher.init_app(app)
+
+    if slim:
+        return app
+
+    _init_web(app, config_name)
+    return app
+
+def _init_web(app, config_name):
+    """JWT, request-time services, blueprints and startup checks of the served app"""
+    # Trust X-Forwarded-* only from our own proxies, so request.remote_addr is the real client
+    proxy_count = app.config.get('PROXY_COUNT', 0)
+    if proxy_count:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_count, x_proto=proxy_count)
+    
     jwt.init_app(app)
     
     # Add JWT identity handlers to fix the "Subject must be a string" error
@@ -52,11 +99,19 @@ def create_app(config_name='development'):
         if isinstance(identity, str) and identity.isdigit():
             return User.query.get(int(identity))
         return User.query.get(identity)
-    
-    migrate.init_app(app, db)
-    mail.init_app(app)
+
+    # One-time login codes and the token buckets limiting the auth endpoints
+    from .services.otp_store import otp_service
+    from .services.rate_limit import rate_limiter
+    otp_service.init_app(app)
+    rate_limiter.init_app(app)
+
+    # gzip/brotli response compression
+    from .services.compression import response_compressor
+    response_compressor.init_app(app)
     
     # Configure CORS with support for credentials
+    from flask_cors import CORS
     CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
     
     # Add JWT error handlers
@@ -136,12 +191,14 @@ def create_app(config_name='development'):
     from .routes.loan import loan_bp
     from .routes.admin import admin_bp
     from .routes.mpesa import mpesa_bp
+    from .routes.health import health_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(user_bp, url_prefix='/api/users')
     app.register_blueprint(loan_bp, url_prefix='/api/loans')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
     app.register_blueprint(mpesa_bp, url_prefix='/api/mpesa')
+    app.register_blueprint(health_bp, url_prefix='/api/health')
     
     # Add startup message
     @app.before_first_request
@@ -150,8 +207,6 @@ def create_app(config_name='development'):
         print("🎉 NINEFUND SERVER STARTED")
         print("="*50)
         print(f"🌐 Environment: {config_name}")
-        print(f"📱 M-PESA: {'✅ Configured' if validate_mpesa_config(app) else '❌ Not Configured'}")
+        print(f"📱 M-PESA: {'✅ Configured' if mpesa_configured else '❌ Not Configured'}")
         print(f"🔒 Security: {'🔐 High' if app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds() <= 1800 else '🔓 Standard'}")
-        print("="*50)
-    
-    return app
\ No newline at end of file
+        print("="*50)
\ No newline at end of file
@@ -55,13 +55,103 @@ class Config:
     MPESA_ACCOUNT_NUMBER = os.environ.get('MPESA_ACCOUNT_NUMBER', 'NINEFUND')
     MPESA_TEST_MODE = os.environ.get('MPESA_TEST_MODE', 'false').lower() in ['true', 'on', '1']
     MPESA_TIMEOUT_SECONDS = int(os.environ.get('MPESA_TIMEOUT_SECONDS', 60))
+    MPESA_REQUEST_TIMEOUT = int(os.environ.get('MPESA_REQUEST_TIMEOUT', 30))  # Per Daraja HTTP call; gunicorn.conf.py reads it too
     MPESA_LOG_LEVEL = os.environ.get('MPESA_LOG_LEVEL', 'INFO')
     
+    # Admin activity log writer (batched, flushed in the background)
+    AUDIT_LOG_ASYNC = os.environ.get('AUDIT_LOG_ASYNC', 'true').lower() in ['true', 'on', '1']
+    AUDIT_LOG_BATCH_SIZE = int(os.environ.get('AUDIT_LOG_BATCH_SIZE', 50))
+    AUDIT_LOG_FLUSH_INTERVAL = float(os.environ.get('AUDIT_LOG_FLUSH_INTERVAL', 2.0))
+    
+    # PayBill (C2B) confirmations are stored by the endpoint and matched/posted in the background
+    C2B_ASYNC = os.environ.get('C2B_ASYNC', 'true').lower() in ['true', 'on', '1']
+    C2B_POLL_INTERVAL = float(os.environ.get('C2B_POLL_INTERVAL', 30.0))  # Seconds between sweeps for missed rows
+    C2B_BATCH_SIZE = int(os.environ.get('C2B_BATCH_SIZE', 100))
+    C2B_CLAIM_TIMEOUT = int(os.environ.get('C2B_CLAIM_TIMEOUT', 300))  # Retry rows claimed by a processor that died
+    C2B_MAX_ATTEMPTS = int(os.environ.get('C2B_MAX_ATTEMPTS', 5))  # Then leave the payment for admin review
+
+    # C2B callbacks are only accepted with ?token=<MPESA_C2B_TOKEN> (register the Validation and
+    # Confirmation URLs with it) and from Safaricom's callback addresses; empty MPESA_CALLBACK_ALLOWED_IPS
+    # skips the address check. Behind a proxy, set PROXY_COUNT so the real address is seen.
+    MPESA_C2B_TOKEN = os.environ.get('MPESA_C2B_TOKEN')
+    MPESA_CALLBACK_ALLOWED_IPS = os.environ.get('MPESA_CALLBACK_ALLOWED_IPS', ','.join([
+        '196.201.214.200', '196.201.214.206', '196.201.213.114', '196.201.214.207',
+        '196.201.214.208', '196.201.213.44', '196.201.212.127', '196.201.212.138',
+        '196.201.212.129', '196.201.212.136', '196.201.212.74', '196.201.212.69'
+    ]))
+
+    # Activity logs older than this many months move to gzipped monthly archives
+    AUDIT_LOG_RETENTION_MONTHS = int(os.environ.get('AUDIT_LOG_RETENTION_MONTHS', 12))
+    AUDIT_LOG_ARCHIVE_DIR = os.environ.get('AUDIT_LOG_ARCHIVE_DIR')  # Defaults to instance/archives
+    
+    # Member statements (closed months are cached on disk)
+    STATEMENT_CACHE_DIR = os.environ.get('STATEMENT_CACHE_DIR')  # Defaults to instance/statements
+    STATEMENT_RENDER_WORKERS = int(os.environ.get('STATEMENT_RENDER_WORKERS', 0)) or None
+    
+    # Connection pool and timeouts (PostgreSQL; other databases keep SQLAlchemy's defaults)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # Replace connections older than this (seconds)
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ['true', 'on', '1']
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))  # 0 disables
+    DB_APPLICATION_NAME = os.environ.get('DB_APPLICATION_NAME', 'ninefund')
+    
+    # Read replica for reporting endpoints (@read_replica views); unset keeps every read on the primary
+    SQLALCHEMY_REPLICA_URI = os.environ.get('DATABASE_REPLICA_URI')
+    SQLALCHEMY_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 10))
+    
+    # File-based SQLite: WAL and pragmas, in-process write queue, read-only connection pool
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'true').lower() in ['true', 'on', '1']
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 10000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 16384))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_WRITE_QUEUE = os.environ.get('SQLITE_WRITE_QUEUE', 'true').lower() in ['true', 'on', '1']
+    SQLITE_READ_POOL_SIZE = int(os.environ.get('SQLITE_READ_POOL_SIZE', 4))
+    
+    # Response compression (brotli when installed, gzip otherwise)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() in ['true', 'on', '1']
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+    
+    # Password hashing: method and cost, and the bounded pool that runs it
+    # ('pbkdf2:sha256:<iterations>' or 'scrypt:<n>:<r>:<p>'; users are rehashed on their next login when this changes)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:260000')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))  # 0 uses the CPU count
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 0)) or None  # Unset allows 8 per worker
+    PASSWORD_HASH_MAX_WAIT = float(os.environ.get('PASSWORD_HASH_MAX_WAIT', 5.0))  # Seconds before answering 503
+    PASSWORD_HASH_RETRY_AFTER = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER', 2))
+    
+    # One-time login codes, kept out of the main database ('sqlite' shares them between workers on one host)
+    OTP_STORE = os.environ.get('OTP_STORE', 'sqlite')
+    OTP_TTL_SECONDS = int(os.environ.get('OTP_TTL_SECONDS', 600))
+    OTP_MAX_ATTEMPTS = int(os.environ.get('OTP_MAX_ATTEMPTS', 5))  # Wrong guesses before a code is discarded
+    OTP_PURGE_INTERVAL = int(os.environ.get('OTP_PURGE_INTERVAL', 3600))
+    
+    # Token-bucket limits ('<count>/<period>') per route group
+    # Reverse proxies (nginx, load balancer) in front of the app. ProxyFix takes the client
+    # address from that many X-Forwarded-For hops; with none, the header is ignored
+    PROXY_COUNT = int(os.environ.get('PROXY_COUNT', 0))
+    
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() in ['true', 'on', '1']
+    RATE_LIMIT_STORAGE = os.environ.get('RATE_LIMIT_STORAGE', 'sqlite')  # 'memory' limits each worker separately
+    AUTH_RATE_LIMIT_PER_IP = os.environ.get('AUTH_RATE_LIMIT_PER_IP', '30/minute')  # Login and OTP, per endpoint
+    LOGIN_RATE_LIMIT_PER_USER = os.environ.get('LOGIN_RATE_LIMIT_PER_USER', '10/minute')
+    OTP_RESEND_RATE_LIMIT_PER_USER = os.environ.get('OTP_RESEND_RATE_LIMIT_PER_USER', '3/10minutes')
+    OTP_VERIFY_RATE_LIMIT_PER_USER = os.environ.get('OTP_VERIFY_RATE_LIMIT_PER_USER', '10/10minutes')
+    REGISTER_RATE_LIMIT_PER_IP = os.environ.get('REGISTER_RATE_LIMIT_PER_IP', '20/hour')  # Mobile carriers share IPs
+    PAYMENT_RATE_LIMIT_PER_IP = os.environ.get('PAYMENT_RATE_LIMIT_PER_IP', '30/minute')  # STK pushes
+    PAYMENT_RATE_LIMIT_PER_USER = os.environ.get('PAYMENT_RATE_LIMIT_PER_USER', '5/minute')
+    MPESA_CALLBACK_RATE_LIMIT_PER_IP = os.environ.get('MPESA_CALLBACK_RATE_LIMIT_PER_IP', '600/minute')
+    
     # FIXED: Daraja API URLs as regular config variables
     def __init__(self):
         super().__init__()
-        # Set URLs based on environment
-        if self.MPESA_PRODUCTION:
+        # Set URLs based on environment (MPESA_BASE_URL points at a proxy or a stand-in server)
+        if os.environ.get('MPESA_BASE_URL'):
+            base_url = os.environ['MPESA_BASE_URL'].rstrip('/')
+        elif self.MPESA_PRODUCTION:
             base_url = "https://api.safaricom.co.ke"
         else:
             base_url = "https://sandbox.safaricom.co.ke"
@@ -72,6 +162,34 @@ class Config:
         self.MPESA_STK_PUSH_URL = f"{base_url}/mpesa/stkpush/v1/processrequest"
         self.MPESA_STK_QUERY_URL = f"{base_url}/mpesa/stkpushquery/v1/query"
         self.MPESA_C2B_REGISTER_URL = f"{base_url}/mpesa/c2b/v1/registerurl"
+        
+        # Database engine options derived from the URI and DB_* settings
+        database_uri = getattr(self, 'SQLALCHEMY_DATABASE_URI', None)
+        if database_uri and database_uri.startswith('postgres://'):
+            # SQLAlchemy only accepts the postgresql:// scheme
+            self.SQLALCHEMY_DATABASE_URI = database_uri = 'postgresql://' + database_uri[len('postgres://'):]
+        self.SQLALCHEMY_ENGINE_OPTIONS = self.engine_options(database_uri)
+    
+    def engine_options(self, database_uri):
+        """SQLALCHEMY_ENGINE_OPTIONS: a sized, monitored, self-healing pool with statement timeouts on PostgreSQL"""
+        if not database_uri or not database_uri.startswith('postgresql'):
+            return {}
+        
+        from .services.db_pool import MonitoredQueuePool
+        
+        connect_args = {'application_name': self.DB_APPLICATION_NAME}
+        if self.DB_STATEMENT_TIMEOUT_MS:
+            connect_args['options'] = f"-c statement_timeout={self.DB_STATEMENT_TIMEOUT_MS}"
+        
+        return {
+            'poolclass': MonitoredQueuePool,
+            'pool_size': self.DB_POOL_SIZE,
+            'max_overflow': self.DB_MAX_OVERFLOW,
+            'pool_timeout': self.DB_POOL_TIMEOUT,
+            'pool_recycle': self.DB_POOL_RECYCLE,
+            'pool_pre_ping': self.DB_POOL_PRE_PING,
+            'connect_args': connect_args
+        }
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -86,6 +204,9 @@ class DevelopmentConfig(Config):
     MPESA_PRODUCTION = False  # Always use sandbox in development
     MPESA_LOG_LEVEL = 'DEBUG'  # Verbose logging for development
     
+    # Bodies are easier to inspect uncompressed on localhost
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'false').lower() in ['true', 'on', '1']
+    
     def __init__(self):
         super().__init__()
         # Check if ngrok URLs are properly configured
@@ -98,12 +219,28 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URI', 'sqlite:///ninefund_test.db')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URI', 'sqlite://')  # In-memory, one per test process
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=5)  # Short for testing
     
     # Testing M-PESA settings
     MPESA_TEST_MODE = True  # Always use test mode for unit tests
     MPESA_PRODUCTION = False
+    
+    # Write activity logs immediately so tests can assert on them
+    AUDIT_LOG_ASYNC = False
+    
+    # Post PayBill confirmations inside the confirmation request
+    C2B_ASYNC = False
+    MPESA_C2B_TOKEN = 'test-c2b-token'
+    MPESA_CALLBACK_ALLOWED_IPS = '127.0.0.1'  # The test client's address
+
+    # Full-cost hashing would dominate test run time
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    
+    # Per-process stores; no background purge thread
+    OTP_STORE = 'memory'
+    OTP_PURGE_INTERVAL = 0
+    RATE_LIMIT_STORAGE = 'memory'
 
 class ProductionConfig(Config):
     """Production configuration with maximum security."""
@@ -122,6 +259,10 @@ class ProductionConfig(Config):
     SESSION_COOKIE_SECURE = True
     PREFERRED_URL_SCHEME = 'https'
     
+    # Admins often download on mobile data; spend a little more CPU for smaller bodies
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 512))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+    
     # Production M-PESA settings
     MPESA_LOG_LEVEL = 'WARNING'  # Less verbose logging in production
     
@@ -135,7 +276,8 @@ class ProductionConfig(Config):
             'MPESA_CONSUMER_SECRET',
             'MPESA_SHORTCODE',
             'MPESA_PASSKEY',
-            'MPESA_CALLBACK_URL'
+            'MPESA_CALLBACK_URL',
+            'MPESA_C2B_TOKEN'
         ]
         
         missing_settings = []
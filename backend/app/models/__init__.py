@@ -1,8 +1,10 @@
 # app/models/__init__.py
 
 from flask_sqlalchemy import SQLAlchemy
+from ..utils.db_routing import RoutingSession
 
-db = SQLAlchemy()
+# Reads inside @read_replica views go to the replica bind when one is configured
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Import all models to ensure they're registered with SQLAlchemy
 from .user import User
@@ -13,6 +15,9 @@ from .otp import OTP
 from .payment_status import PaymentStatus
 from .admin_log import AdminActivityLog
 from .overpayment import Overpayment
+from .cache_version import CacheVersion
+from .ledger import LedgerEntry, LedgerSnapshot
+from .c2b_transaction import C2BTransaction
 
 # Make models available at package level
 __all__ = [
@@ -25,5 +30,9 @@ __all__ = [
     'OTP',
     'PaymentStatus',
     'AdminActivityLog',
-    'Overpayment'
+    'Overpayment',
+    'CacheVersion',
+    'LedgerEntry',
+    'LedgerSnapshot',
+    'C2BTransaction'
 ]
\ No newline at end of file
@@ -1,6 +1,7 @@
 # app/models/admin_log.py
 from datetime import datetime
 from . import db
+from ..utils.serializers import Serializer, json_default
 
 class AdminActivityLog(db.Model):
     """Model to track admin activities and actions"""
@@ -17,7 +18,7 @@ class AdminActivityLog(db.Model):
     new_values = db.Column(db.Text, nullable=True)  # JSON string of new values (for updates)
     ip_address = db.Column(db.String(45), nullable=True)  # Admin's IP address
     user_agent = db.Column(db.String(500), nullable=True)  # Admin's browser info
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Relationships
     admin = db.relationship('User', foreign_keys=[admin_id], backref='admin_activities')
@@ -25,35 +26,34 @@ class AdminActivityLog(db.Model):
     def __init__(self, **kwargs):
         super(AdminActivityLog, self).__init__(**kwargs)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'admin_id': self.admin_id,
-            'admin_name': f"{self.admin.first_name} {self.admin.last_name}" if self.admin else "Unknown Admin",
-            'action': self.action,
-            'target_type': self.target_type,
-            'target_id': self.target_id,
-            'target_name': self.target_name,
-            'description': self.description,
-            'old_values': self.old_values,
-            'new_values': self.new_values,
-            'ip_address': self.ip_address,
-            'user_agent': self.user_agent,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    serializer = Serializer(
+        ['id', 'admin_id', 'action', 'target_type', 'target_id', 'target_name', 'description',
+         'old_values', 'new_values', 'ip_address', 'user_agent', 'created_at'],
+        computed={
+            'admin_name': lambda log: f"{log.admin.first_name} {log.admin.last_name}" if log.admin else "Unknown Admin"
+        },
+        depends={'admin_name': ['admin_id']}
+    )
+
+    def to_dict(self, fields=None):
+        return self.serializer.dump(self, fields)
     
     @staticmethod
     def log_activity(admin_id, action, target_type, target_id=None, target_name=None, 
                     description=None, old_values=None, new_values=None, 
-                    ip_address=None, user_agent=None):
-        """Helper method to log admin activities"""
+                    ip_address=None, user_agent=None, commit=True):
+        """Helper method to log admin activities
+        
+        With commit=False the entry is only added to the session, so it is written
+        atomically with whatever change the caller commits next.
+        """
         import json
         
         # Convert old_values and new_values to JSON strings if they're dicts
         if isinstance(old_values, dict):
-            old_values = json.dumps(old_values)
+            old_values = json.dumps(old_values, default=json_default)
         if isinstance(new_values, dict):
-            new_values = json.dumps(new_values)
+            new_values = json.dumps(new_values, default=json_default)
             
         log_entry = AdminActivityLog(
             admin_id=admin_id,
@@ -68,11 +68,49 @@ class AdminActivityLog(db.Model):
             user_agent=user_agent
         )
         
+        db.session.add(log_entry)
+        if not commit:
+            return True
+        
         try:
-            db.session.add(log_entry)
             db.session.commit()
             return True
         except Exception as e:
             db.session.rollback()
             print(f"Error logging admin activity: {str(e)}")
+            return False
+    
+    @staticmethod
+    def log_activities(entries, commit=True):
+        """Insert several activity log rows with a single executemany INSERT
+        
+        Each entry takes the same keys as log_activity. With commit=False the rows
+        join the caller's transaction and are written when the caller commits.
+        """
+        import json
+        
+        if not entries:
+            return True
+        
+        now = datetime.utcnow()
+        rows = []
+        for entry in entries:
+            row = dict(entry)
+            for key in ('old_values', 'new_values'):
+                if isinstance(row.get(key), dict):
+                    row[key] = json.dumps(row[key], default=json_default)
+            row.setdefault('created_at', now)
+            rows.append(row)
+        
+        db.session.execute(db.insert(AdminActivityLog), rows)
+        
+        if not commit:
+            return True
+        
+        try:
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error logging admin activities: {str(e)}")
             return False
\ No newline at end of file
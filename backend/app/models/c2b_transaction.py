@@ -0,0 +1,55 @@
+# app/models/c2b_transaction.py
+from datetime import datetime
+from . import db
+from ..utils.serializers import Serializer
+
+class C2BTransaction(db.Model):
+    """A PayBill payment reported by M-PESA's C2B confirmation callback
+
+    The confirmation endpoint only stores the row (status 'received'); the C2B
+    processor matches it to a member and posts it as a contribution or loan
+    payment ('posted'), or leaves it for an admin to assign ('unmatched').
+    trans_id is M-PESA's transaction ID, so a repeated confirmation is never
+    stored or posted twice.
+    """
+    __tablename__ = 'c2b_transactions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    trans_id = db.Column(db.String(32), unique=True, nullable=False)  # M-PESA receipt, e.g. 'RKTQDM7W6S'
+    trans_type = db.Column(db.String(30), nullable=True)  # 'Pay Bill', 'Buy Goods'
+    trans_time = db.Column(db.DateTime, nullable=True)  # M-PESA's TransTime, East Africa Time
+    amount = db.Column(db.Float, nullable=False)
+    business_short_code = db.Column(db.String(20), nullable=True)
+    bill_ref_number = db.Column(db.String(100), nullable=True)  # Account number the payer typed
+    msisdn = db.Column(db.String(64), nullable=True)  # Payer's number; may be masked or hashed by Safaricom
+    payer_name = db.Column(db.String(150), nullable=True)
+    payload = db.Column(db.Text, nullable=True)  # Confirmation body as received
+
+    status = db.Column(db.String(20), nullable=False, default='received', index=True)  # 'received', 'processing', 'posted', 'unmatched'
+    claimed_at = db.Column(db.DateTime, nullable=True)  # When a processor took the row
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    failure_reason = db.Column(db.String(255), nullable=True)  # Why it is unmatched
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True, index=True)
+    match_method = db.Column(db.String(20), nullable=True)  # 'reference', 'msisdn', 'admin'
+    transaction_type = db.Column(db.String(20), nullable=True)  # 'contribution', 'loan_repayment'
+    loan_id = db.Column(db.Integer, db.ForeignKey('loans.id', ondelete='SET NULL'), nullable=True)
+    contribution_id = db.Column(db.Integer, db.ForeignKey('contributions.id', ondelete='SET NULL'), nullable=True)
+    loan_payment_id = db.Column(db.Integer, db.ForeignKey('loan_payments.id', ondelete='SET NULL'), nullable=True)
+    overpayment_amount = db.Column(db.Float, nullable=True)
+    resolved_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Admin who assigned an unmatched payment
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship('User', foreign_keys=[user_id])
+
+    serializer = Serializer(
+        ['id', 'trans_id', 'trans_type', 'trans_time', 'amount', 'business_short_code', 'bill_ref_number',
+         'msisdn', 'payer_name', 'status', 'attempts', 'failure_reason', 'user_id', 'match_method',
+         'transaction_type', 'loan_id', 'contribution_id', 'loan_payment_id', 'overpayment_amount',
+         'resolved_by', 'created_at', 'processed_at']
+    )
+
+    def to_dict(self, fields=None):
+        return self.serializer.dump(self, fields)
@@ -0,0 +1,11 @@
+# app/models/cache_version.py
+from datetime import datetime
+from . import db
+
+class CacheVersion(db.Model):
+    """Version counter for a cacheable scope ('table:loans', 'member:42', ...)"""
+    __tablename__ = 'cache_versions'
+    
+    scope = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
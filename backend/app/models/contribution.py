@@ -1,6 +1,7 @@
 # app/models/contribution.py - Complete updated Contribution model
 from datetime import datetime
 from . import db
+from ..utils.serializers import Serializer
 
 class Contribution(db.Model):
     """Contribution model to track monthly user contributions"""
@@ -18,13 +19,7 @@ class Contribution(db.Model):
     # Relationships
     user = db.relationship('User', back_populates='contributions')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'amount': self.amount,
-            'month': self.month.isoformat() if self.month else None,
-            'payment_method': self.payment_method,
-            'transaction_id': self.transaction_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+    serializer = Serializer(['id', 'user_id', 'amount', 'month', 'payment_method', 'transaction_id', 'created_at'])
+
+    def to_dict(self, fields=None):
+        return self.serializer.dump(self, fields)
\ No newline at end of file
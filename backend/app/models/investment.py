@@ -1,6 +1,7 @@
 # app/models/investment.py - Complete updated Investment model
 from datetime import datetime
 from . import db
+from ..utils.serializers import Serializer
 
 class ExternalInvestment(db.Model):
     """Model to track external investments made by admins"""
@@ -20,16 +21,14 @@ class ExternalInvestment(db.Model):
     # Relationships
     admin = db.relationship('User')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'amount': self.amount,
-            'description': self.description,
-            'investment_date': self.investment_date.isoformat() if self.investment_date else None,
-            'expected_return': self.expected_return,
-            'expected_return_date': self.expected_return_date.isoformat() if self.expected_return_date else None,
-            'status': self.status,
-            'admin_id': self.admin_id,
-            'admin_name': f"{self.admin.first_name} {self.admin.last_name}" if self.admin else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+    serializer = Serializer(
+        ['id', 'amount', 'description', 'investment_date', 'expected_return', 'expected_return_date',
+         'status', 'admin_id', 'created_at'],
+        computed={
+            'admin_name': lambda i: f"{i.admin.first_name} {i.admin.last_name}" if i.admin else None
+        },
+        depends={'admin_name': ['admin_id']}
+    )
+
+    def to_dict(self, fields=None):
+        return self.serializer.dump(self, fields)
\ No newline at end of file
@@ -0,0 +1,56 @@
+# app/models/ledger.py
+from datetime import datetime
+from sqlalchemy import event
+from . import db
+from ..utils.serializers import Serializer
+
+class LedgerEntry(db.Model):
+    """One leg of a double-entry posting; debits are positive, credits negative
+
+    Entries are never updated or deleted. A correction is a new posting that
+    reverses or adjusts the old one. The legs of one posting share a
+    transaction_ref and add up to zero.
+    """
+    __tablename__ = 'ledger_entries'
+    __table_args__ = (
+        db.Index('ix_ledger_entries_account_created_at', 'account', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_ref = db.Column(db.String(32), nullable=False, index=True)  # Groups the legs of one posting
+    account = db.Column(db.String(64), nullable=False)  # e.g. 'fund_cash', 'member_savings:12', 'loan_receivable:7'
+    amount = db.Column(db.Float, nullable=False)  # Debit > 0, credit < 0
+    entry_type = db.Column(db.String(50), nullable=False)  # 'contribution', 'loan_disbursement', 'loan_payment', ...
+    user_id = db.Column(db.Integer, nullable=True, index=True)  # Member the posting concerns; no FK so history outlives the user
+    source_type = db.Column(db.String(50), nullable=True)  # Row that caused the posting: 'contribution', 'loan_payment', ...
+    source_id = db.Column(db.Integer, nullable=True)
+    description = db.Column(db.String(255), nullable=True)
+    created_by = db.Column(db.Integer, nullable=True)  # Admin who posted it, if any
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    serializer = Serializer(
+        ['id', 'transaction_ref', 'account', 'amount', 'entry_type', 'user_id', 'source_type',
+         'source_id', 'description', 'created_by', 'created_at']
+    )
+
+    def to_dict(self, fields=None):
+        return self.serializer.dump(self, fields)
+
+class LedgerSnapshot(db.Model):
+    """Closing balance of an account at the end of a month
+
+    balance covers every entry created before the first day of the following
+    month, so a current balance is the latest snapshot plus the entries since.
+    """
+    __tablename__ = 'ledger_snapshots'
+    
+    account = db.Column(db.String(64), primary_key=True)
+    period = db.Column(db.Date, primary_key=True)  # First day of the month the snapshot closes
+    balance = db.Column(db.Float, nullable=False)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)  # Entries in this month alone
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+@event.listens_for(LedgerEntry, 'before_update')
+@event.listens_for(LedgerEntry, 'before_delete')
+def _reject_ledger_changes(mapper, connection, target):
+    raise ValueError("Ledger entries are append-only; post a correcting entry instead")
@@ -1,6 +1,7 @@
 # app/models/loan.py - Complete updated Loan model
 from datetime import datetime, timedelta
 from . import db
+from ..utils.serializers import Serializer
 
 class Loan(db.Model):
     """Loan model to track user loans"""
@@ -10,7 +11,7 @@ class Loan(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     interest_rate = db.Column(db.Float, default=5.0)  # 5% default
-    status = db.Column(db.String(20), default='pending')  # pending, approved, paid
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, approved, paid
     amount_due = db.Column(db.Float)
     borrowed_date = db.Column(db.DateTime, default=datetime.utcnow)
     due_date = db.Column(db.DateTime)
@@ -80,46 +81,31 @@ class Loan(db.Model):
         return False
     
     def make_payment(self, amount, transaction_id=None):
-        """Record a payment against the loan"""
+        """Record a payment against the loan through the loan ledger"""
+        from ..services.loan_ledger import apply_loan_payment, run_in_transaction, LoanPaymentError
+        
         if amount <= 0:
             return False
-            
-        self.paid_amount += amount
-        self.unpaid_balance = max(0, self.amount_due - self.paid_amount)
         
-        # Create payment record
-        payment = LoanPayment(
-            loan_id=self.id,
-            amount=amount,
-            payment_date=datetime.utcnow(),
-            transaction_id=transaction_id
-        )
-        db.session.add(payment)
-        
-        # Update status if fully paid
-        if self.unpaid_balance == 0:
-            self.status = 'paid'
-            self.paid_date = datetime.utcnow()
-            
-        db.session.commit()
+        try:
+            run_in_transaction(lambda: apply_loan_payment(
+                self.id, amount, transaction_id=transaction_id, require_status=None
+            ))
+        except LoanPaymentError:
+            return False
         return True
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'amount': self.amount,
-            'interest_rate': self.interest_rate,
-            'status': self.status,
-            'amount_due': self.amount_due,
-            'borrowed_date': self.borrowed_date.isoformat() if self.borrowed_date else None,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'paid_amount': self.paid_amount,
-            'paid_date': self.paid_date.isoformat() if self.paid_date else None,
-            'unpaid_balance': self.unpaid_balance,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'days_remaining': (self.due_date - datetime.utcnow()).days if self.due_date else None
-        }
+    serializer = Serializer(
+        ['id', 'user_id', 'amount', 'interest_rate', 'status', 'amount_due', 'borrowed_date',
+         'due_date', 'paid_amount', 'paid_date', 'unpaid_balance', 'created_at'],
+        computed={
+            'days_remaining': lambda l: (l.due_date - datetime.utcnow()).days if l.due_date else None
+        },
+        depends={'days_remaining': ['due_date']}
+    )
+
+    def to_dict(self, fields=None):
+        return self.serializer.dump(self, fields)
 
 
 class LoanPayment(db.Model):
@@ -137,13 +123,7 @@ class LoanPayment(db.Model):
     # Relationships
     loan = db.relationship('Loan', back_populates='payments')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'loan_id': self.loan_id,
-            'amount': self.amount,
-            'payment_date': self.payment_date.isoformat() if self.payment_date else None,
-            'payment_method': self.payment_method,
-            'transaction_id': self.transaction_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
\ No newline at end of file
+    serializer = Serializer(['id', 'loan_id', 'amount', 'payment_date', 'payment_method', 'transaction_id', 'created_at'])
+
+    def to_dict(self, fields=None):
+        return self.serializer.dump(self, fields)
\ No newline at end of file
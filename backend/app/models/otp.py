@@ -5,7 +5,11 @@ import string
 from . import db
 
 class OTP(db.Model):
-    """One Time Password model for authentication"""
+    """One Time Password model for authentication
+    
+    Legacy: codes are now issued and checked by services.otp_store, which
+    purges the rows left in this table in the background.
+    """
     __tablename__ = 'otps'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -1,6 +1,7 @@
 # app/models/overpayment.py
 from datetime import datetime
 from . import db
+from ..utils.serializers import Serializer
 
 class Overpayment(db.Model):
     """Model to track overpayments and their allocation"""
@@ -33,32 +34,28 @@ class Overpayment(db.Model):
         if not self.remaining_amount and self.overpayment_amount:
             self.remaining_amount = self.overpayment_amount
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'user_name': f"{self.user.first_name} {self.user.last_name}" if self.user else "Unknown User",
-            'original_payment_type': self.original_payment_type,
-            'original_payment_id': self.original_payment_id,
-            'expected_amount': self.expected_amount,
-            'actual_amount': self.actual_amount,
-            'overpayment_amount': self.overpayment_amount,
-            'status': self.status,
-            'allocation_type': self.allocation_type,
-            'allocation_target_id': self.allocation_target_id,
-            'allocated_amount': self.allocated_amount,
-            'remaining_amount': self.remaining_amount,
-            'admin_id': self.admin_id,
-            'admin_name': f"{self.admin.first_name} {self.admin.last_name}" if self.admin else None,
-            'admin_notes': self.admin_notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'allocated_at': self.allocated_at.isoformat() if self.allocated_at else None
-        }
+    serializer = Serializer(
+        ['id', 'user_id', 'original_payment_type', 'original_payment_id', 'expected_amount',
+         'actual_amount', 'overpayment_amount', 'status', 'allocation_type', 'allocation_target_id',
+         'allocated_amount', 'remaining_amount', 'admin_id', 'admin_notes', 'created_at', 'allocated_at'],
+        computed={
+            'user_name': lambda o: f"{o.user.first_name} {o.user.last_name}" if o.user else "Unknown User",
+            'admin_name': lambda o: f"{o.admin.first_name} {o.admin.last_name}" if o.admin else None
+        },
+        depends={'user_name': ['user_id'], 'admin_name': ['admin_id']}
+    )
+
+    def to_dict(self, fields=None):
+        return self.serializer.dump(self, fields)
     
     def allocate_to_future_contribution(self, admin_id, notes=None):
         """Allocate overpayment to future contributions"""
+        from ..services.ledger import record_overpayment_to_contribution
+        
+        record_overpayment_to_contribution(self, self.remaining_amount, created_by=admin_id)
+        
         self.allocation_type = 'future_contribution'
-        self.allocated_amount = self.overpayment_amount
+        self.allocated_amount = (self.allocated_amount or 0) + self.remaining_amount
         self.remaining_amount = 0.0
         self.status = 'allocated'
         self.admin_id = admin_id
@@ -75,46 +72,15 @@ class Overpayment(db.Model):
     
     def allocate_to_loan(self, loan_id, admin_id, notes=None):
         """Allocate overpayment to loan payment"""
-        from .loan import Loan
-        
-        loan = Loan.query.get(loan_id)
-        if not loan or loan.user_id != self.user_id:
-            return False, "Invalid loan or loan doesn't belong to this user"
-        
-        if loan.status != 'approved':
-            return False, "Loan must be approved to receive payments"
-        
-        # Calculate how much can be allocated to this loan
-        remaining_loan_balance = loan.unpaid_balance or (loan.amount_due - loan.paid_amount)
-        allocation_amount = min(self.remaining_amount, remaining_loan_balance)
-        
-        if allocation_amount <= 0:
-            return False, "No amount to allocate or loan is already fully paid"
-        
-        # Update loan payment
-        loan.paid_amount += allocation_amount
-        loan.unpaid_balance = max(0, loan.unpaid_balance - allocation_amount)
-        
-        if loan.unpaid_balance <= 0:
-            loan.status = 'paid'
-            loan.paid_date = datetime.utcnow()
-        
-        # Update overpayment
-        self.allocation_type = 'loan_payment'
-        self.allocation_target_id = loan_id
-        self.allocated_amount += allocation_amount
-        self.remaining_amount -= allocation_amount
-        
-        if self.remaining_amount <= 0:
-            self.status = 'allocated'
-        
-        self.admin_id = admin_id
-        self.admin_notes = notes
-        self.allocated_at = datetime.utcnow()
+        from ..services.loan_ledger import allocate_overpayment_to_loan, LoanPaymentError
         
         try:
+            allocation_amount = allocate_overpayment_to_loan(self.id, loan_id, admin_id, notes)
             db.session.commit()
             return True, f"Allocated {allocation_amount} to loan #{loan_id}"
+        except LoanPaymentError as e:
+            db.session.rollback()
+            return False, str(e)
         except Exception as e:
             db.session.rollback()
             print(f"Error allocating overpayment to loan: {str(e)}")
@@ -3,6 +3,7 @@
 
 from datetime import datetime
 from . import db
+from ..utils.serializers import Serializer
 
 class PaymentStatus(db.Model):
     """Model to track M-PESA payment status for real-time updates"""
@@ -80,26 +81,15 @@ class PaymentStatus(db.Model):
         """Check if payment is completed (success or failed)"""
         return self.status in ['success', 'failed', 'timeout']
     
-    def to_dict(self):
+    serializer = Serializer([
+        'id', 'checkout_request_id', 'merchant_request_id', 'user_id', 'transaction_type', 'amount',
+        'phone_number', 'status', 'mpesa_receipt_number', 'failure_reason', 'contribution_id',
+        'loan_payment_id', 'loan_id', 'created_at', 'updated_at', 'completed_at'
+    ])
+
+    def to_dict(self, fields=None):
         """Convert to dictionary for API responses"""
-        return {
-            'id': self.id,
-            'checkout_request_id': self.checkout_request_id,
-            'merchant_request_id': self.merchant_request_id,
-            'user_id': self.user_id,
-            'transaction_type': self.transaction_type,
-            'amount': self.amount,
-            'phone_number': self.phone_number,
-            'status': self.status,
-            'mpesa_receipt_number': self.mpesa_receipt_number,
-            'failure_reason': self.failure_reason,
-            'contribution_id': self.contribution_id,
-            'loan_payment_id': self.loan_payment_id,
-            'loan_id': self.loan_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None
-        }
+        return self.serializer.dump(self, fields)
     
     @classmethod
     def create_pending_payment(cls, checkout_request_id, merchant_request_id, user_id, 
@@ -1,7 +1,10 @@
 # app/models/user.py - Complete updated User model
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import validates
 from . import db
+from ..services.password_hasher import password_hasher
+from ..utils.phone import to_msisdn
+from ..utils.serializers import Serializer
 from .loan import Loan
 
 class User(db.Model):
@@ -15,6 +18,7 @@ class User(db.Model):
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
     phone_number = db.Column(db.String(15), nullable=False)
+    msisdn = db.Column(db.String(12), index=True)  # 254XXXXXXXXX, set from phone_number
     is_admin = db.Column(db.Boolean, default=False)
     is_verified = db.Column(db.Boolean, default=False)
     is_suspended = db.Column(db.Boolean, default=False)
@@ -44,16 +48,76 @@ class User(db.Model):
         passive_deletes=True
     )
     
+    @validates('phone_number')
+    def _normalize_phone_number(self, key, phone_number):
+        """Store Kenyan numbers as +254XXXXXXXXX and keep msisdn in step; other numbers are kept as given"""
+        try:
+            self.msisdn = to_msisdn(phone_number)
+        except ValueError:
+            self.msisdn = None
+            return phone_number
+        return '+' + self.msisdn
+    
+    @classmethod
+    def find_by_msisdn(cls, phone_number):
+        """Find the member a payment's phone number (MSISDN or any local format) belongs to"""
+        try:
+            msisdn = to_msisdn(phone_number)
+        except ValueError:
+            return None
+        return cls.query.filter_by(msisdn=msisdn).order_by(cls.id).first()
+    
+    @classmethod
+    def backfill_msisdn(cls, chunk_size=1000):
+        """
+        Normalize phone_number and fill msisdn for members saved before the column existed
+        
+        Walks the table in id order and commits every `chunk_size` rows, so it
+        holds no long locks and picks up where it left off if interrupted.
+        Returns the number of members updated.
+        """
+        updated = last_id = 0
+        while True:
+            rows = db.session.execute(
+                db.select(cls.id, cls.phone_number)
+                .where(cls.msisdn.is_(None), cls.id > last_id)
+                .order_by(cls.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                return updated
+            last_id = rows[-1].id
+            
+            changes = []
+            for user_id, phone_number in rows:
+                try:
+                    msisdn = to_msisdn(phone_number)
+                except ValueError:
+                    continue
+                changes.append({'id': user_id, 'phone_number': '+' + msisdn, 'msisdn': msisdn})
+            if changes:
+                db.session.execute(db.update(cls), changes)
+            db.session.commit()
+            updated += len(changes)
+    
     @property
     def password(self):
         raise AttributeError('password is not a readable attribute')
     
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Check a password, upgrading the stored hash if the hashing method or cost changed
+        
+        An upgraded hash is left in the session for the caller to commit. Raises
+        PasswordHashingBusy when the hashing pool is full.
+        """
+        matches, new_hash = password_hasher.verify_and_rehash(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return matches
     
     def total_contribution(self):
         """Calculate total contributions made by the user"""
@@ -80,19 +144,15 @@ class User(db.Model):
         """Calculate remaining available loan limit"""
         return max(0, self.loan_limit() - self.current_loan_total())
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'phone_number': self.phone_number,
-            'is_admin': self.is_admin,
-            'is_verified': self.is_verified,
-            'is_suspended': self.is_suspended,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'total_contribution': self.total_contribution(),
-            'loan_limit': self.loan_limit(),
-            'available_loan_limit': self.available_loan_limit()
-        }
\ No newline at end of file
+    serializer = Serializer(
+        ['id', 'username', 'email', 'first_name', 'last_name', 'phone_number', 'is_admin',
+         'is_verified', 'is_suspended', 'created_at'],
+        computed={
+            'total_contribution': lambda u: u.total_contribution(),
+            'loan_limit': lambda u: u.loan_limit(),
+            'available_loan_limit': lambda u: u.available_loan_limit()
+        }
+    )
+
+    def to_dict(self, fields=None):
+        return self.serializer.dump(self, fields)
\ No newline at end of file
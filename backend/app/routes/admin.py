@@ -1,5 +1,5 @@
 # app/routes/admin.py - Enhanced with activity logging and overpayment management
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import db
 from ..models.user import User
@@ -8,10 +8,23 @@ from ..models.investment import ExternalInvestment
 from ..models.contribution import Contribution
 from ..models.admin_log import AdminActivityLog
 from ..models.overpayment import Overpayment
-from ..utils.decorators import admin_required
-from ..utils.admin_logging import log_admin_activity, AdminActions, get_user_display_name, get_loan_display_name, format_values_for_log
+from ..models.ledger import LedgerEntry
+from ..models.c2b_transaction import C2BTransaction
+from ..utils.decorators import admin_required, conditional_get, read_replica
+from ..services.audit_archive import query_activity_logs
+from ..services.c2b import C2BError, resolve_unmatched
+from ..services.reconciliation import StatementError, reconcile_statement
+from ..services.loan_ledger import apply_loan_payment, lock_row, LoanPaymentError
+from ..services import ledger
+from ..services.db_pool import pool_stats
+from ..services.password_hasher import PasswordHashingBusy
+from ..services.rate_limit import rate_limiter
+from ..services.search_index import search_users, search_activity_logs
+from ..services.exports import EXPORT_DATASETS, export_columns, iter_export_rows, encode_csv, encode_ndjson
+from ..utils.admin_logging import log_admin_activity, log_admin_activities, AdminActions, get_user_display_name, get_loan_display_name, format_values_for_log
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
+import io
 import json
 
 admin_bp = Blueprint('admin', __name__)
@@ -20,6 +33,8 @@ admin_bp = Blueprint('admin', __name__)
 @admin_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
 @admin_required
+@read_replica
+@conditional_get('users', 'contributions', 'loans', 'external_investments', 'overpayments', 'admin_activity_logs')
 def get_admin_dashboard():
     """Get admin dashboard data"""
     try:
@@ -49,8 +64,10 @@ def get_admin_dashboard():
         pending_overpayments = Overpayment.query.filter_by(status='pending').count()
         total_overpayment_amount = db.session.query(db.func.sum(Overpayment.remaining_amount)).filter_by(status='pending').scalar() or 0
         
-        # Get recent activity logs (last 10)
-        recent_activities = AdminActivityLog.query.order_by(AdminActivityLog.created_at.desc()).limit(10).all()
+        # Get recent activity logs (last 10), read from the created_at index
+        recent_activities = AdminActivityLog.query.options(
+            db.joinedload(AdminActivityLog.admin)
+        ).order_by(AdminActivityLog.created_at.desc()).limit(10).all()
         
         dashboard_data = {
             "stats": {
@@ -83,11 +100,20 @@ def get_admin_dashboard():
 @jwt_required()
 @admin_required
 def get_all_users():
-    """Get all users (admin only)"""
+    """Get all users (admin only)
+    
+    Supports ?fields=id,first_name,... to return only those fields; the derived
+    loan figures are only computed when asked for.
+    """
     try:
-        users = User.query.all()
+        try:
+            fields = User.serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        users = User.query.options(*User.serializer.load_options(User, fields)).all()
         return jsonify({
-            "users": [user.to_dict() for user in users]
+            "users": [user.to_dict(fields) for user in users]
         }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -150,6 +176,9 @@ def create_user():
             "user": new_user.to_dict()
         }), 201
         
+    except PasswordHashingBusy as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -283,6 +312,7 @@ def add_contribution():
         )
         
         db.session.add(contribution)
+        ledger.record_contribution(contribution, created_by=current_user_id)
         db.session.commit()
         
         # Log the activity
@@ -315,21 +345,62 @@ def add_contribution():
 @jwt_required()
 @admin_required
 def get_all_loans():
-    """Get all loans (admin only)"""
+    """Get all loans, optionally filtered by ?status= (admin only)
+    
+    Supports ?fields= for the loan and ?user_fields= for the embedded borrower.
+    """
     try:
-        loans = Loan.query.all()
-        loans_data = []
+        try:
+            fields, user_fields = _loan_list_fields()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        for loan in loans:
-            loan_dict = loan.to_dict()
-            loan_dict['user'] = loan.user.to_dict() if loan.user else None
-            loans_data.append(loan_dict)
+        return jsonify({"loans": _list_loans(request.args.get('status'), fields, user_fields)}), 200
         
-        return jsonify({"loans": loans_data}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route('/loans/pending', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_pending_loans():
+    """Get pending loan applications (admin only)"""
+    try:
+        try:
+            fields, user_fields = _loan_list_fields()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify({"loans": _list_loans('pending', fields, user_fields)}), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _loan_list_fields():
+    """Parse ?fields= and ?user_fields= for the loan listings"""
+    return (
+        Loan.serializer.parse_fields(request.args.get('fields')),
+        User.serializer.parse_fields(request.args.get('user_fields'))
+    )
+
+def _list_loans(status=None, fields=None, user_fields=None):
+    """Serialize loans with their borrower, using the status index when filtering"""
+    user_loader = db.joinedload(Loan.user)
+    if user_fields is not None:
+        user_loader = user_loader.options(*User.serializer.load_options(User, user_fields))
+    
+    query = Loan.query.options(user_loader, *Loan.serializer.load_options(Loan, fields))
+    if status:
+        query = query.filter(Loan.status == status)
+    
+    loans_data = []
+    for loan in query.order_by(Loan.created_at.desc()).all():
+        loan_dict = loan.to_dict(fields)
+        loan_dict['user'] = loan.user.to_dict(user_fields) if loan.user else None
+        loans_data.append(loan_dict)
+    
+    return loans_data
+
 @admin_bp.route('/loans/<int:loan_id>/approve', methods=['PUT'])
 @jwt_required()
 @admin_required
@@ -349,10 +420,9 @@ def approve_loan(loan_id):
         loan.status = 'approved'
         loan.borrowed_date = datetime.utcnow()
         loan.calculate_loan_details()  # Recalculate due date and amount
+        ledger.record_loan_disbursement(loan.id, loan.user_id, loan.amount, loan.amount_due, created_by=current_user_id)
         
-        db.session.commit()
-        
-        # Log the activity
+        # Log the activity in the same transaction as the approval
         log_admin_activity(
             admin_id=current_user_id,
             action=AdminActions.LOAN_APPROVED,
@@ -361,9 +431,12 @@ def approve_loan(loan_id):
             target_name=get_loan_display_name(loan),
             description=f"Approved loan application for {loan.user.first_name} {loan.user.last_name}",
             old_values={'status': old_status},
-            new_values={'status': loan.status, 'borrowed_date': loan.borrowed_date.isoformat()}
+            new_values={'status': loan.status, 'borrowed_date': loan.borrowed_date.isoformat()},
+            sync=True
         )
         
+        db.session.commit()
+        
         return jsonify({
             "message": "Loan approved successfully",
             "loan": loan.to_dict()
@@ -391,9 +464,7 @@ def reject_loan(loan_id):
         old_status = loan.status
         loan.status = 'rejected'
         
-        db.session.commit()
-        
-        # Log the activity
+        # Log the activity in the same transaction as the rejection
         log_admin_activity(
             admin_id=current_user_id,
             action=AdminActions.LOAN_REJECTED,
@@ -402,9 +473,12 @@ def reject_loan(loan_id):
             target_name=get_loan_display_name(loan),
             description=f"Rejected loan application for {loan.user.first_name} {loan.user.last_name}",
             old_values={'status': old_status},
-            new_values={'status': loan.status}
+            new_values={'status': loan.status},
+            sync=True
         )
         
+        db.session.commit()
+        
         return jsonify({
             "message": "Loan rejected successfully",
             "loan": loan.to_dict()
@@ -414,10 +488,194 @@ def reject_loan(loan_id):
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+@admin_bp.route('/loans/bulk-decision', methods=['PUT'])
+@jwt_required()
+@admin_required
+def bulk_loan_decision():
+    """Approve or reject several pending loans in one transaction (admin only)
+    
+    Expects {"loan_ids": [...], "decision": "approve" | "reject"}. Loans that are
+    missing, no longer pending or would exceed the borrower's loan limit are
+    skipped and reported instead of failing the whole batch.
+    """
+    try:
+        current_user_id = int(get_jwt_identity())
+        data = request.get_json() or {}
+        
+        decision = data.get('decision')
+        if decision not in ('approve', 'reject'):
+            return jsonify({"error": "decision must be 'approve' or 'reject'"}), 400
+        
+        try:
+            loan_ids = sorted({int(loan_id) for loan_id in data.get('loan_ids') or []})
+        except (TypeError, ValueError):
+            return jsonify({"error": "loan_ids must be a list of integers"}), 400
+        
+        if not loan_ids:
+            return jsonify({"error": "loan_ids is required"}), 400
+        
+        # Load the loans together with borrower names in one query
+        rows = db.session.execute(
+            db.select(
+                Loan.id, Loan.user_id, Loan.amount, Loan.interest_rate, Loan.status,
+                User.first_name, User.last_name, User.username
+            ).join(User, User.id == Loan.user_id).where(Loan.id.in_(loan_ids))
+        ).all()
+        loans_by_id = {row.id: row for row in rows}
+        
+        skipped = []
+        candidates = []
+        for loan_id in loan_ids:
+            row = loans_by_id.get(loan_id)
+            if row is None:
+                skipped.append({"loan_id": loan_id, "reason": "Loan not found"})
+            elif row.status != 'pending':
+                skipped.append({"loan_id": loan_id, "reason": f"Loan is {row.status}, not pending"})
+            else:
+                candidates.append(row)
+        
+        if decision == 'approve' and candidates:
+            candidates, over_limit = _filter_loans_within_limit(candidates)
+            skipped.extend(
+                {"loan_id": row.id, "reason": "Approval would exceed the member's loan limit"}
+                for row in over_limit
+            )
+        
+        candidate_ids = [row.id for row in candidates]
+        applied_ids = set()
+        
+        if candidate_ids:
+            now = datetime.utcnow()
+            if decision == 'approve':
+                amount_due = Loan.amount + (Loan.amount * Loan.interest_rate) / 100
+                values = {
+                    'status': 'approved',
+                    'borrowed_date': now,
+                    'due_date': now + timedelta(days=30),
+                    'amount_due': amount_due,
+                    'unpaid_balance': amount_due - db.func.coalesce(Loan.paid_amount, 0),
+                    'updated_at': now
+                }
+            else:
+                values = {'status': 'rejected', 'updated_at': now}
+            
+            # The status guard makes each transition happen at most once, even if
+            # another admin decides the same loan concurrently
+            statement = (
+                db.update(Loan)
+                .where(Loan.id.in_(candidate_ids), Loan.status == 'pending')
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if db.engine.dialect.update_returning:
+                applied_ids = set(db.session.execute(statement.returning(Loan.id)).scalars())
+            else:
+                db.session.execute(statement)
+                applied_ids = set(db.session.execute(
+                    db.select(Loan.id).where(
+                        Loan.id.in_(candidate_ids),
+                        Loan.status == values['status'],
+                        Loan.updated_at == now
+                    )
+                ).scalars())
+        
+        skipped.extend(
+            {"loan_id": row.id, "reason": "Loan was decided by another request"}
+            for row in candidates if row.id not in applied_ids
+        )
+        applied = [row for row in candidates if row.id in applied_ids]
+        
+        if decision == 'approve':
+            for row in applied:
+                ledger.record_loan_disbursement(
+                    row.id, row.user_id, row.amount, row.amount + (row.amount * row.interest_rate) / 100,
+                    created_by=current_user_id
+                )
+        
+        if decision == 'approve':
+            action, new_status, verb = AdminActions.LOAN_APPROVED, 'approved', 'Approved'
+        else:
+            action, new_status, verb = AdminActions.LOAN_REJECTED, 'rejected', 'Rejected'
+        
+        log_admin_activities(current_user_id, [
+            {
+                'action': action,
+                'target_type': 'loan',
+                'target_id': row.id,
+                'target_name': f"Loan #{row.id} - {row.first_name} {row.last_name} ({row.username}) - {row.amount}",
+                'description': f"{verb} loan application for {row.first_name} {row.last_name} (bulk decision)",
+                'old_values': {'status': 'pending'},
+                'new_values': {'status': new_status}
+            }
+            for row in applied
+        ])
+        
+        db.session.commit()
+        
+        return jsonify({
+            "message": f"{verb} {len(applied)} of {len(loan_ids)} loans",
+            "decision": decision,
+            "processed": [row.id for row in applied],
+            "skipped": skipped
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+def _filter_loans_within_limit(candidates):
+    """Split pending loans into those that fit their borrowers' limits and those that don't
+    
+    Contribution totals and outstanding approved balances for every borrower in the
+    batch are fetched with one grouped aggregate query. Loans are admitted in ID order
+    so several applications by the same member share one remaining limit.
+    """
+    user_ids = {row.user_id for row in candidates}
+    
+    contributions = (
+        db.select(Contribution.user_id, db.func.sum(Contribution.amount).label('total'))
+        .where(Contribution.user_id.in_(user_ids))
+        .group_by(Contribution.user_id)
+        .subquery()
+    )
+    outstanding = (
+        db.select(Loan.user_id, db.func.sum(Loan.unpaid_balance).label('total'))
+        .where(Loan.user_id.in_(user_ids), Loan.status == 'approved')
+        .group_by(Loan.user_id)
+        .subquery()
+    )
+    limits = db.session.execute(
+        db.select(
+            User.id,
+            db.func.coalesce(contributions.c.total, 0),
+            db.func.coalesce(outstanding.c.total, 0)
+        )
+        .outerjoin(contributions, contributions.c.user_id == User.id)
+        .outerjoin(outstanding, outstanding.c.user_id == User.id)
+        .where(User.id.in_(user_ids))
+    ).all()
+    
+    # Same rule as User.available_loan_limit: limit is capped at 100,000
+    available = {
+        user_id: min(total_contribution, 100000) - outstanding_total
+        for user_id, total_contribution, outstanding_total in limits
+    }
+    
+    within_limit = []
+    over_limit = []
+    for row in candidates:
+        if row.amount <= available.get(row.user_id, 0):
+            available[row.user_id] -= row.amount
+            within_limit.append(row)
+        else:
+            over_limit.append(row)
+    
+    return within_limit, over_limit
+
 @admin_bp.route('/loans/<int:loan_id>/payment', methods=['POST'])
 @jwt_required()
 @admin_required
-def add_loan_payment():
+def add_loan_payment(loan_id):
     """Add loan payment (admin only)"""
     try:
         current_user_id = int(get_jwt_identity())
@@ -430,61 +688,28 @@ def add_loan_payment():
         if not loan:
             return jsonify({"error": "Loan not found"}), 404
         
-        if loan.status != 'approved':
-            return jsonify({"error": "Can only add payments to approved loans"}), 400
-        
         payment_amount = float(data['amount'])
-        expected_payment = loan.unpaid_balance or (loan.amount_due - loan.paid_amount)
         
-        # Check for overpayment
-        if payment_amount > expected_payment:
-            overpayment_amount = payment_amount - expected_payment
-            
-            # Create overpayment record
-            overpayment = Overpayment(
-                user_id=loan.user_id,
-                original_payment_type='loan_payment',
-                original_payment_id=None,  # Will be set after payment is created
-                expected_amount=expected_payment,
-                actual_amount=payment_amount,
-                overpayment_amount=overpayment_amount,
-                remaining_amount=overpayment_amount
+        # Lock the loan and apply the payment with atomic balance updates
+        try:
+            result = apply_loan_payment(
+                loan.id, payment_amount,
+                payment_method=data.get('payment_method', 'manual'),
+                transaction_id=data.get('transaction_id', f"ADMIN-{datetime.now().strftime('%Y%m%d%H%M%S')}"),
+                created_by=current_user_id
             )
-            
-            db.session.add(overpayment)
-            
-            # Use only the expected amount for the loan payment
-            actual_payment_amount = expected_payment
-        else:
-            actual_payment_amount = payment_amount
+        except LoanPaymentError as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 400
         
-        # Create loan payment record
-        payment = LoanPayment(
-            loan_id=loan.id,
-            amount=actual_payment_amount,
-            payment_method=data.get('payment_method', 'manual'),
-            transaction_id=data.get('transaction_id', f"ADMIN-{datetime.now().strftime('%Y%m%d%H%M%S')}")
-        )
+        payment = result.payment
+        actual_payment_amount = result.applied_amount
+        overpayment_amount = result.overpayment_amount
+        overpayment = result.overpayment
         
-        # Update loan
-        loan.paid_amount += actual_payment_amount
-        loan.unpaid_balance = max(0, loan.unpaid_balance - actual_payment_amount)
-        
-        if loan.unpaid_balance <= 0:
-            loan.status = 'paid'
-            loan.paid_date = datetime.utcnow()
-        
-        db.session.add(payment)
-        
-        # Update overpayment record with payment ID if overpayment exists
-        if payment_amount > expected_payment:
-            overpayment.original_payment_id = payment.id
-        
-        db.session.commit()
-        
-        # Log the activity
+        # Log the activity in the same transaction as the payment
         description = f"Added payment of {actual_payment_amount} to loan"
-        if payment_amount > expected_payment:
+        if overpayment:
             description += f" (Overpayment of {overpayment_amount} recorded)"
         
         log_admin_activity(
@@ -496,19 +721,22 @@ def add_loan_payment():
             description=description,
             new_values={
                 'payment_amount': actual_payment_amount,
-                'overpayment_amount': overpayment_amount if payment_amount > expected_payment else 0,
+                'overpayment_amount': overpayment_amount,
                 'loan_status': loan.status,
                 'remaining_balance': loan.unpaid_balance
-            }
+            },
+            sync=True
         )
         
+        db.session.commit()
+        
         response_data = {
             "message": "Payment added successfully",
-            "payment": payment.to_dict(),
+            "payment": payment.to_dict() if payment else None,
             "loan": loan.to_dict()
         }
         
-        if payment_amount > expected_payment:
+        if overpayment:
             response_data["overpayment"] = overpayment.to_dict()
             response_data["message"] += f" (Overpayment of {overpayment_amount} recorded)"
         
@@ -523,11 +751,18 @@ def add_loan_payment():
 @jwt_required()
 @admin_required
 def get_overpayments():
-    """Get all overpayments (admin only)"""
+    """Get all overpayments (admin only), optionally only the ?fields= listed"""
     try:
-        overpayments = Overpayment.query.filter_by(status='pending').all()
+        try:
+            fields = Overpayment.serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        overpayments = Overpayment.query.options(
+            *Overpayment.serializer.load_options(Overpayment, fields)
+        ).filter_by(status='pending').all()
         return jsonify({
-            "overpayments": [op.to_dict() for op in overpayments]
+            "overpayments": [op.to_dict(fields) for op in overpayments]
         }), 200
         
     except Exception as e:
@@ -594,6 +829,123 @@ def allocate_overpayment(overpayment_id):
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+# ============= PAYBILL (C2B) REVIEW =============
+@admin_bp.route('/c2b-payments', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_c2b_payments():
+    """PayBill payments by ?status= (default: unmatched, awaiting review), newest first (admin only)"""
+    try:
+        try:
+            fields = C2BTransaction.serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        status = request.args.get('status', 'unmatched')
+        limit = min(request.args.get('limit', 100, type=int), 500)
+        
+        payments = C2BTransaction.query.options(
+            *C2BTransaction.serializer.load_options(C2BTransaction, fields)
+        ).filter_by(status=status).order_by(C2BTransaction.id.desc()).limit(limit).all()
+        return jsonify({
+            "payments": [payment.to_dict(fields) for payment in payments]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route('/c2b-payments/<int:payment_id>/assign', methods=['PUT'])
+@jwt_required()
+@admin_required
+def assign_c2b_payment(payment_id):
+    """Post an unmatched PayBill payment to a member's contribution or loan (admin only)"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        data = request.get_json()
+        
+        if not data.get('user_id'):
+            return jsonify({"error": "user_id is required"}), 400
+        
+        month = None
+        if data.get('month'):
+            try:
+                month = datetime.strptime(data['month'], '%Y-%m').date()
+            except ValueError:
+                return jsonify({"error": "Invalid month format. Use YYYY-MM"}), 400
+        
+        try:
+            payment = resolve_unmatched(
+                payment_id, current_user_id, data['user_id'],
+                loan_id=data.get('loan_id'), month=month
+            )
+        except (C2BError, LoanPaymentError) as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 400
+        
+        # Log the activity in the same transaction as the posting
+        log_admin_activity(
+            admin_id=current_user_id,
+            action=AdminActions.C2B_PAYMENT_ASSIGNED,
+            target_type='c2b_payment',
+            target_id=payment.id,
+            target_name=f"M-PESA {payment.trans_id}",
+            description=f"Assigned PayBill payment of {payment.amount} to {get_user_display_name(payment.user)} as {payment.transaction_type}",
+            new_values={
+                'user_id': payment.user_id,
+                'transaction_type': payment.transaction_type,
+                'loan_id': payment.loan_id,
+                'contribution_id': payment.contribution_id,
+                'notes': data.get('notes', '')
+            },
+            sync=True
+        )
+        
+        db.session.commit()
+        
+        return jsonify({
+            "message": f"Payment {payment.trans_id} posted as {payment.transaction_type}",
+            "payment": payment.to_dict()
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route('/reconciliation', methods=['POST'])
+@jwt_required()
+@admin_required
+@read_replica
+def reconcile_mpesa_statement():
+    """Reconcile an uploaded M-PESA settlement statement CSV (form field `statement`) against recorded payments (admin only)"""
+    try:
+        current_user_id = int(get_jwt_identity())
+        statement = request.files.get('statement')
+        if not statement:
+            return jsonify({"error": "Upload the statement CSV as the 'statement' file field"}), 400
+        
+        max_items = min(request.args.get('max_items', 1000, type=int), 10000)
+        
+        # Parsed straight off the upload stream, one line at a time
+        lines = io.TextIOWrapper(statement.stream, encoding='utf-8-sig', newline='')
+        try:
+            report = reconcile_statement(lines, max_items=max_items)
+        except (StatementError, UnicodeDecodeError) as e:
+            return jsonify({"error": f"Could not read statement: {str(e)}"}), 400
+        
+        log_admin_activity(
+            admin_id=current_user_id,
+            action=AdminActions.STATEMENT_RECONCILED,
+            target_type='statement',
+            target_name=statement.filename,
+            description=f"Reconciled {report['statement']['credits']} statement credits",
+            new_values=report['summary']
+        )
+        
+        return jsonify(report), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # ============= ADMIN-TO-ADMIN OPERATIONS =============
 @admin_bp.route('/loans/<int:loan_id>/modify-debt', methods=['PUT'])
 @jwt_required()
@@ -604,7 +956,8 @@ def modify_loan_debt(loan_id):
         current_user_id = int(get_jwt_identity())
         data = request.get_json()
         
-        loan = Loan.query.get(loan_id)
+        # Lock the loan so payments can't land between reading and rewriting its balance
+        loan = lock_row(Loan, loan_id)
         if not loan:
             return jsonify({"error": "Loan not found"}), 404
         
@@ -630,9 +983,13 @@ def modify_loan_debt(loan_id):
             loan.interest_rate = float(data['new_interest_rate'])
             loan.calculate_loan_details()
         
-        db.session.commit()
+        # Book the change in what the member owes, once the loan has been disbursed
+        if loan.status in ('approved', 'paid') and old_values['unpaid_balance'] is not None:
+            ledger.record_loan_adjustment(
+                loan.id, loan.user_id, loan.unpaid_balance - old_values['unpaid_balance'], created_by=current_user_id
+            )
         
-        # Log the activity
+        # Log the activity in the same transaction as the change
         log_admin_activity(
             admin_id=current_user_id,
             action=AdminActions.LOAN_DEBT_MODIFIED,
@@ -646,9 +1003,12 @@ def modify_loan_debt(loan_id):
                 'amount_due': loan.amount_due,
                 'unpaid_balance': loan.unpaid_balance,
                 'interest_rate': loan.interest_rate
-            }
+            },
+            sync=True
         )
         
+        db.session.commit()
+        
         return jsonify({
             "message": "Loan debt modified successfully",
             "loan": loan.to_dict()
@@ -703,6 +1063,7 @@ def add_admin_contribution():
         )
         
         db.session.add(contribution)
+        ledger.record_contribution(contribution, created_by=current_user_id)
         db.session.commit()
         
         # Log the activity
@@ -733,6 +1094,7 @@ def add_admin_contribution():
 @admin_bp.route('/activity-logs', methods=['GET'])
 @jwt_required()
 @admin_required
+@read_replica
 def get_activity_logs():
     """Get admin activity logs with pagination and filtering"""
     try:
@@ -743,59 +1105,155 @@ def get_activity_logs():
         target_type = request.args.get('target_type')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        include_archived = request.args.get('include_archived', type=lambda v: v.lower() in ['true', '1'])
+        
+        start_dt = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d') if end_date else None
         
-        # Build query
-        query = AdminActivityLog.query
-        
-        # Apply filters
-        if admin_id:
-            query = query.filter_by(admin_id=admin_id)
-        if action:
-            query = query.filter_by(action=action)
-        if target_type:
-            query = query.filter_by(target_type=target_type)
-        if start_date:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            query = query.filter(AdminActivityLog.created_at >= start_dt)
-        if end_date:
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-            query = query.filter(AdminActivityLog.created_at <= end_dt)
-        
-        # Order by most recent first
-        query = query.order_by(AdminActivityLog.created_at.desc())
-        
-        # Paginate
-        pagination = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
+        # Spans the hot table and, for older date ranges, the monthly archives
+        logs, total = query_activity_logs(
+            admin_id=admin_id,
+            action=action,
+            target_type=target_type,
+            start=start_dt,
+            end=end_dt,
+            page=page,
+            per_page=per_page,
+            include_archived=include_archived
         )
+        pages = (total + per_page - 1) // per_page if per_page else 0
         
         return jsonify({
-            "logs": [log.to_dict() for log in pagination.items],
+            "logs": logs,
             "pagination": {
                 "page": page,
                 "per_page": per_page,
-                "total": pagination.total,
-                "pages": pagination.pages,
-                "has_next": pagination.has_next,
-                "has_prev": pagination.has_prev
+                "total": total,
+                "pages": pages,
+                "has_next": page < pages,
+                "has_prev": page > 1
             }
         }), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# ============= EXPORTS =============
+@admin_bp.route('/export/<dataset>', methods=['GET'])
+@jwt_required()
+@admin_required
+@read_replica
+def export_dataset(dataset):
+    """Stream a finance dataset as CSV or NDJSON (admin only)
+    
+    Supports ?format=csv|ndjson, ?start_date= and ?end_date= (YYYY-MM-DD, inclusive).
+    The body is compressed on the fly by the response compressor when the client accepts it.
+    """
+    try:
+        if dataset not in EXPORT_DATASETS:
+            return jsonify({"error": f"Unknown dataset. Choose one of: {', '.join(EXPORT_DATASETS)}"}), 404
+        
+        export_format = request.args.get('format', 'csv')
+        if export_format not in ('csv', 'ndjson'):
+            return jsonify({"error": "format must be 'csv' or 'ndjson'"}), 400
+        
+        try:
+            start_date = request.args.get('start_date')
+            end_date = request.args.get('end_date')
+            start_dt = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
+            end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1) if end_date else None
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+        
+        log_admin_activity(
+            admin_id=int(get_jwt_identity()),
+            action=AdminActions.DATA_EXPORTED,
+            target_type='export',
+            target_name=dataset,
+            description=f"Exported {dataset} as {export_format}",
+            new_values={'start_date': start_date, 'end_date': end_date}
+        )
+        
+        columns = export_columns(dataset)
+        rows = iter_export_rows(dataset, start_dt, end_dt)
+        if export_format == 'csv':
+            body = encode_csv(columns, rows)
+            mimetype = 'text/csv'
+        else:
+            body = encode_ndjson(columns, rows)
+            mimetype = 'application/x-ndjson'
+        
+        headers = {
+            'Content-Disposition': f"attachment; filename={dataset}-{datetime.utcnow().strftime('%Y%m%d')}.{export_format}",
+            'Cache-Control': 'no-store'
+        }
+        
+        return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ============= SEARCH =============
+@admin_bp.route('/search', methods=['GET'])
+@jwt_required()
+@admin_required
+@read_replica
+def search():
+    """Full-text search over members and activity logs (admin only)"""
+    try:
+        query = request.args.get('q', '').strip()
+        search_type = request.args.get('type', 'all')  # all, users, activity_logs
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        
+        if not query:
+            return jsonify({"error": "Search query (q) is required"}), 400
+        
+        if search_type not in ('all', 'users', 'activity_logs'):
+            return jsonify({"error": "Invalid search type"}), 400
+        
+        results = {"query": query}
+        
+        if search_type in ('all', 'users'):
+            results["users"] = [
+                {
+                    'id': user.id,
+                    'username': user.username,
+                    'email': user.email,
+                    'first_name': user.first_name,
+                    'last_name': user.last_name,
+                    'phone_number': user.phone_number,
+                    'is_admin': user.is_admin,
+                    'is_suspended': user.is_suspended
+                }
+                for user in search_users(query, limit)
+            ]
+        
+        if search_type in ('all', 'activity_logs'):
+            results["activity_logs"] = [log.to_dict() for log in search_activity_logs(query, limit)]
+        
+        return jsonify(results), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # ============= INVESTMENT MANAGEMENT =============
 @admin_bp.route('/investments', methods=['GET'])
 @jwt_required()
 @admin_required
+@conditional_get('external_investments', 'users')
 def get_investments():
-    """Get all investments"""
+    """Get all investments, optionally only the ?fields= listed"""
     try:
-        investments = ExternalInvestment.query.all()
+        try:
+            fields = ExternalInvestment.serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        investments = ExternalInvestment.query.options(
+            *ExternalInvestment.serializer.load_options(ExternalInvestment, fields)
+        ).all()
         return jsonify({
-            "investments": [investment.to_dict() for investment in investments]
+            "investments": [investment.to_dict(fields) for investment in investments]
         }), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -821,6 +1279,7 @@ def create_investment():
         )
         
         db.session.add(investment)
+        ledger.record_investment(investment, created_by=current_user_id)
         db.session.commit()
         
         # Log the activity
@@ -846,6 +1305,92 @@ def create_investment():
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
+
+# ============= LEDGER =============
+@admin_bp.route('/ledger/balances', methods=['GET'])
+@jwt_required()
+@admin_required
+@read_replica
+@conditional_get('ledger_entries')
+def get_ledger_balances():
+    """Current account balances and per-kind totals, optionally for one ?kind= of account"""
+    try:
+        kind = request.args.get('kind')
+        return jsonify({
+            "balances": ledger.account_balances(kind=kind),
+            "totals": ledger.trial_balance()
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route('/ledger/accounts/<account>', methods=['GET'])
+@jwt_required()
+@admin_required
+@read_replica
+def get_ledger_account(account):
+    """Balance and newest-first entries of one ledger account"""
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 50, type=int)
+        
+        entries = LedgerEntry.query.filter_by(account=account).order_by(
+            LedgerEntry.created_at.desc(), LedgerEntry.id.desc()
+        ).paginate(page=page, per_page=per_page, error_out=False)
+        
+        return jsonify({
+            "account": account,
+            "balance": ledger.account_balance(account),
+            "entries": [entry.to_dict() for entry in entries.items],
+            "pagination": {
+                "page": page,
+                "per_page": per_page,
+                "total": entries.total,
+                "pages": entries.pages,
+                "has_next": entries.has_next,
+                "has_prev": entries.has_prev
+            }
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route('/ledger/snapshots', methods=['POST'])
+@jwt_required()
+@admin_required
+def close_ledger_months():
+    """Snapshot closing balances for every finished month not yet snapshotted (safe to call from cron)"""
+    try:
+        closed = ledger.close_months()
+        return jsonify({
+            "message": f"Snapshotted {len(closed)} months",
+            "periods": [period.strftime('%Y-%m') for period in closed]
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+    
+# ============= DATABASE =============
+@admin_bp.route('/db/pool', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_db_pool_stats():
+    """Connection pool usage and checkout wait times for this worker process (admin only)"""
+    try:
+        return jsonify({
+            "pools": {key or 'primary': pool_stats(engine) for key, engine in db.engines.items()}
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ============= RATE LIMITS =============
+@admin_bp.route('/rate-limits', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_rate_limit_stats():
+    """Allowed and rate-limited requests per route group for this worker process (admin only)"""
+    try:
+        return jsonify(rate_limiter.stats()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
     
 # Add this route to app/routes/admin.py (append to the file)
 
@@ -5,14 +5,21 @@ from flask_jwt_extended import (
 )
 from ..models import db
 from ..models.user import User
-from ..models.otp import OTP
 from ..services.mail_service import send_otp_email
-from email_validator import validate_email, EmailNotValidError
+from ..services.otp_store import otp_service, OTP_MISSING, OTP_MISMATCH
+from ..services.password_hasher import PasswordHashingBusy
+from ..utils.decorators import rate_limit
 import re
 
 auth_bp = Blueprint('auth', __name__)
 
+def _print_debug_otp(user, otp_code):
+    """Print an OTP for local development; never in production, where only its HMAC is stored"""
+    if current_app.debug or current_app.testing:
+        print(f"DEBUG - OTP for {user.username}: {otp_code}")
+
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('register', per_ip='REGISTER_RATE_LIMIT_PER_IP')
 def register():
     """Register a new user"""
     try:
@@ -30,7 +37,8 @@ def register():
         ]):
             return jsonify({"error": "All fields are required"}), 400
         
-        # Validate email format
+        # Validate email format (email_validator is slow to import and only needed here)
+        from email_validator import validate_email, EmailNotValidError
         try:
             valid = validate_email(data['email'])
             email = valid.email
@@ -66,16 +74,19 @@ def register():
         db.session.commit()
         
         # Generate OTP and send it to the user's email
-        otp = OTP.generate_otp(new_user.id)
-        send_otp_email(new_user, otp.code)
+        otp_code = otp_service.issue(new_user.id)
+        send_otp_email(new_user, otp_code)
         
         # Print OTP for development purposes
-        print(f"DEBUG - OTP for {new_user.username}: {otp.code}")
+        _print_debug_otp(new_user, otp_code)
         
         return jsonify({
             "message": "User registered successfully. Check your email for verification code.",
             "user_id": new_user.id
         }), 201
+    except PasswordHashingBusy as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         db.session.rollback()
         import traceback
@@ -86,6 +97,7 @@ def register():
 # Replace the login and verify_otp functions in app/routes/auth.py
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', per_ip='AUTH_RATE_LIMIT_PER_IP', per_user='LOGIN_RATE_LIMIT_PER_USER', user_field='username')
 def login():
     """Login user and generate OTP for verification"""
     try:
@@ -103,6 +115,10 @@ def login():
             print(f"Invalid credentials for user: {data.get('username')}")
             return jsonify({"error": "Invalid username or password"}), 401
         
+        # Save the hash if verify_password upgraded it
+        if db.session.is_modified(user):
+            db.session.commit()
+        
         # Check if user is suspended - BLOCK SUSPENDED USERS
         if getattr(user, 'is_suspended', False):
             print(f"Suspended user tried to login: {user.username}")
@@ -111,14 +127,14 @@ def login():
             }), 403
         
         # Generate and send OTP for non-suspended users
-        otp = OTP.generate_otp(user.id)
+        otp_code = otp_service.issue(user.id)
         
-        # For development, print OTP instead of sending email
-        print(f"DEBUG - OTP for {user.username}: {otp.code}")
+        # For development, also print the OTP in case email isn't set up
+        _print_debug_otp(user, otp_code)
         
         # Try to send email, but don't fail if it doesn't work
         try:
-            send_otp_email(user, otp.code)
+            send_otp_email(user, otp_code)
         except Exception as e:
             print(f"Email sending failed: {str(e)}")
             # Continue without failing the login process
@@ -127,13 +143,18 @@ def login():
             "message": "Login credentials valid. Check your email for verification code.",
             "user_id": user.id
         }), 200
+    except PasswordHashingBusy as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
+        db.session.rollback()
         import traceback
         print(f"Login error: {str(e)}")
         print(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
 @auth_bp.route('/verify-otp', methods=['POST'])
+@rate_limit('verify-otp', per_ip='AUTH_RATE_LIMIT_PER_IP', per_user='OTP_VERIFY_RATE_LIMIT_PER_USER', user_field='user_id')
 def verify_otp():
     """Verify OTP code sent to user's email"""
     try:
@@ -155,24 +176,17 @@ def verify_otp():
                 "error": "Account suspended. Please contact administrator at support@ninefund.com or call +254-XXX-XXXX for assistance."
             }), 403
         
-        # Get the latest unused OTP for this user
-        otp = OTP.query.filter_by(
-            user_id=user.id,
-            is_used=False
-        ).order_by(OTP.created_at.desc()).first()
+        # Check and consume the user's current code
+        status = otp_service.verify(user.id, data['otp_code'])
         
-        if not otp or not otp.is_valid():
+        if status == OTP_MISSING:
             print(f"Invalid or expired OTP for user: {user.username}")
             return jsonify({"error": "Invalid or expired OTP code"}), 400
         
-        if otp.code != data['otp_code']:
-            # Print debug information
-            print(f"OTP mismatch: Expected {otp.code}, Got {data['otp_code']}")
+        if status == OTP_MISMATCH:
+            print(f"OTP mismatch for user: {user.username}")
             return jsonify({"error": "Incorrect OTP code"}), 400
         
-        # Mark OTP as used
-        otp.use()
-        
         # Mark user as verified
         user.is_verified = True
         db.session.commit()
@@ -271,6 +285,9 @@ def change_password():
         
         print(f"Password updated successfully for user: {user.username}")
         return jsonify({"message": "Password updated successfully"}), 200
+    except PasswordHashingBusy as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 503, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         db.session.rollback()
         import traceback
@@ -279,6 +296,7 @@ def change_password():
         return jsonify({"error": str(e)}), 500
 
 @auth_bp.route('/resend-otp', methods=['POST'])
+@rate_limit('resend-otp', per_ip='AUTH_RATE_LIMIT_PER_IP', per_user='OTP_RESEND_RATE_LIMIT_PER_USER', user_field='user_id')
 def resend_otp():
     """Resend OTP to user's email"""
     try:
@@ -294,11 +312,11 @@ def resend_otp():
             return jsonify({"error": "User not found"}), 404
         
         # Generate new OTP and send it
-        otp = OTP.generate_otp(user.id)
-        send_otp_email(user, otp.code)
+        otp_code = otp_service.issue(user.id)
+        send_otp_email(user, otp_code)
         
         # Print OTP for development purposes
-        print(f"DEBUG - OTP for {user.username}: {otp.code}")
+        _print_debug_otp(user, otp_code)
         
         return jsonify({
             "message": "Verification code sent to your email"
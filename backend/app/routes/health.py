@@ -0,0 +1,33 @@
+# app/routes/health.py
+from flask import Blueprint, jsonify
+from ..models import db
+from ..services.db_pool import check_database, pool_stats
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/db', methods=['GET'])
+def database_health():
+    """Readiness probe: 200 when the primary database answers, 503 otherwise
+
+    A configured read replica is checked too but doesn't fail the probe, since
+    reads fall back to the primary.
+    """
+    ok, latency_ms, error = check_database(db.engine)
+    body = {
+        "status": "ok" if ok else "unavailable",
+        "database": {"ok": ok, "latency_ms": latency_ms, "dialect": db.engine.dialect.name}
+    }
+    if error:
+        body["database"]["error"] = error
+    
+    pool = pool_stats(db.engine)
+    body["pool"] = {key: pool[key] for key in ('checked_out', 'saturation', 'timeouts') if key in pool}
+    
+    replica = db.engines.get('replica')
+    if replica is not None:
+        replica_ok, replica_latency_ms, replica_error = check_database(replica)
+        body["replica"] = {"ok": replica_ok, "latency_ms": replica_latency_ms}
+        if replica_error:
+            body["replica"]["error"] = replica_error
+    
+    return jsonify(body), 200 if ok else 503
@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import db
 from ..models.user import User
 from ..models.loan import Loan
+from ..utils.decorators import conditional_get
 import traceback
 
 loan_bp = Blueprint('loan', __name__)
@@ -82,9 +83,15 @@ def apply_for_loan():
 
 @loan_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional_get('member')
 def get_user_loans():
-    """Get all loans for the current user"""
+    """Get all loans for the current user, optionally only the ?fields= listed"""
     try:
+        try:
+            fields = Loan.serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         current_user_id = get_jwt_identity()
         
         # Convert to integer if it's a string
@@ -95,10 +102,10 @@ def get_user_loans():
             return jsonify({"error": "User not found"}), 404
         
         # Get all loans for the user
-        loans = user.loans.all()
+        loans = user.loans.options(*Loan.serializer.load_options(Loan, fields)).all()
         
         return jsonify({
-            "loans": [loan.to_dict() for loan in loans]
+            "loans": [loan.to_dict(fields) for loan in loans]
         }), 200
     except Exception as e:
         print(f"Error getting user loans: {str(e)}")
@@ -108,8 +115,13 @@ def get_user_loans():
 @loan_bp.route('/<int:loan_id>', methods=['GET'])
 @jwt_required()
 def get_loan_details(loan_id):
-    """Get details for a specific loan"""
+    """Get details for a specific loan, optionally only the ?fields= listed"""
     try:
+        try:
+            fields = Loan.serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         current_user_id = get_jwt_identity()
         
         # Convert to integer if it's a string
@@ -131,7 +143,7 @@ def get_loan_details(loan_id):
         payments = [payment.to_dict() for payment in loan.payments]
         
         return jsonify({
-            "loan": loan.to_dict(),
+            "loan": loan.to_dict(fields),
             "payments": payments
         }), 200
     except Exception as e:
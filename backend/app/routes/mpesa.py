@@ -4,9 +4,13 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import db
 from ..models.user import User
 from ..models.contribution import Contribution
-from ..models.loan import Loan, LoanPayment
+from ..models.loan import Loan
 from ..models.payment_status import PaymentStatus
 from ..services.daraja_service import initiate_stk_push, process_callback, validate_callback_security, simulate_callback_response
+from ..services.c2b import C2BError, CallbackRejected, authenticate_callback, c2b_processor, store_confirmation
+from ..services.loan_ledger import apply_loan_payment
+from ..services import ledger
+from ..utils.decorators import rate_limit
 from datetime import datetime, date
 import traceback
 import logging
@@ -19,6 +23,7 @@ mpesa_bp = Blueprint('mpesa', __name__)
 
 @mpesa_bp.route('/initiate-contribution', methods=['POST'])
 @jwt_required()
+@rate_limit('stk-push', per_ip='PAYMENT_RATE_LIMIT_PER_IP', per_user='PAYMENT_RATE_LIMIT_PER_USER')
 def initiate_contribution():
     """Initiate M-PESA STK push for monthly contribution - ENHANCED"""
     try:
@@ -133,6 +138,7 @@ def initiate_contribution_v2():
 
 @mpesa_bp.route('/initiate-loan-repayment', methods=['POST'])
 @jwt_required()
+@rate_limit('stk-push', per_ip='PAYMENT_RATE_LIMIT_PER_IP', per_user='PAYMENT_RATE_LIMIT_PER_USER')
 def initiate_loan_repayment():
     """Initiate M-PESA STK push for loan repayment - ENHANCED"""
     try:
@@ -255,6 +261,7 @@ def initiate_loan_repayment_v2():
 # ============= CALLBACK ENDPOINTS =============
 
 @mpesa_bp.route('/callback', methods=['POST'])
+@rate_limit('mpesa-callback', per_ip='MPESA_CALLBACK_RATE_LIMIT_PER_IP')
 def mpesa_callback():
     """Enhanced callback endpoint for M-PESA payment notifications"""
     try:
@@ -300,12 +307,14 @@ def mpesa_callback():
         }), 200
 
 @mpesa_bp.route('/validation', methods=['POST'])
+@rate_limit('mpesa-callback', per_ip='MPESA_CALLBACK_RATE_LIMIT_PER_IP')
 def mpesa_validation():
     """M-PESA validation endpoint - validates incoming transactions"""
     try:
         logger.info("🔍 M-PESA validation request received")
-        validation_data = request.get_json()
+        validation_data = request.get_json(silent=True) or {}
         logger.info(f"📥 Validation data: {json.dumps(validation_data, indent=2)}")
+        authenticate_callback(request, validation_data)
         
         # Extract validation data
         trans_type = validation_data.get('TransType')
@@ -352,6 +361,13 @@ def mpesa_validation():
             "ResultDesc": "Accepted"
         }), 200
         
+    except CallbackRejected as e:
+        logger.warning(f"🚫 Validation request rejected: {str(e)}")
+        return jsonify({
+            "ResultCode": "C2B00012",
+            "ResultDesc": "Rejected"
+        }), 403
+        
     except Exception as e:
         logger.error(f"❌ Validation error: {str(e)}")
         logger.error(traceback.format_exc())
@@ -361,22 +377,46 @@ def mpesa_validation():
         }), 200
 
 @mpesa_bp.route('/confirmation', methods=['POST'])
+@rate_limit('mpesa-callback', per_ip='MPESA_CALLBACK_RATE_LIMIT_PER_IP')
 def mpesa_confirmation():
     """M-PESA confirmation endpoint - confirms successful transactions"""
     try:
         logger.info("✅ M-PESA confirmation request received")
-        confirmation_data = request.get_json()
+        confirmation_data = request.get_json(silent=True) or {}
         logger.info(f"📥 Confirmation data: {json.dumps(confirmation_data, indent=2)}")
         
-        # Process C2B confirmation (similar to callback but for direct payments)
-        # This would be used for PayBill/BuyGoods transactions
+        # Nothing is stored, let alone posted, unless M-PESA sent it for our shortcode
+        authenticate_callback(request, confirmation_data)
+        
+        # Store the PayBill payment and answer straight away; the C2B processor
+        # matches it to a member and posts it in the background
+        txn = store_confirmation(confirmation_data)
+        if txn is None:
+            logger.info(f"🔁 Duplicate confirmation for {confirmation_data.get('TransID')} ignored")
+        else:
+            c2b_processor.request_processing()
         
         return jsonify({
             "ResultCode": "0",
             "ResultDesc": "Accepted"
         }), 200
         
+    except CallbackRejected as e:
+        logger.warning(f"🚫 Confirmation rejected: {str(e)}")
+        return jsonify({
+            "ResultCode": "C2B00012",
+            "ResultDesc": "Rejected"
+        }), 403
+        
+    except C2BError as e:
+        logger.error(f"❌ Invalid confirmation: {str(e)}")
+        return jsonify({
+            "ResultCode": "C2B00012",
+            "ResultDesc": "Invalid request"
+        }), 200
+        
     except Exception as e:
+        db.session.rollback()
         logger.error(f"❌ Confirmation error: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({
@@ -836,6 +876,11 @@ def process_contribution_payment(user, amount, receipt_number, transaction_detai
         )
         
         db.session.add(contribution)
+        
+        ledger.record_contribution(contribution)
+        if amount > expected_amount:
+            ledger.record_overpayment(overpayment)
+        
         db.session.commit()
         
         logger.info(f"✅ Contribution processed: User={user.username}, Amount={contribution_amount}")
@@ -860,54 +905,23 @@ def process_loan_payment(user, loan_id, amount, receipt_number, transaction_deta
             logger.error(f"❌ Invalid loan: {loan_id} for user {user.id}")
             return False, None
         
-        # Calculate remaining balance
-        remaining_balance = loan.unpaid_balance or (loan.amount_due - loan.paid_amount)
-        
-        # Check for overpayment
-        if amount > remaining_balance:
-            overpayment_amount = amount - remaining_balance
-            
-            # Create overpayment record
-            from ..models.overpayment import Overpayment
-            overpayment = Overpayment(
-                user_id=user.id,
-                original_payment_type='loan_payment',
-                expected_amount=remaining_balance,
-                actual_amount=amount,
-                overpayment_amount=overpayment_amount,
-                remaining_amount=overpayment_amount
-            )
-            db.session.add(overpayment)
-            
-            # Use only remaining balance for loan payment
-            payment_amount = remaining_balance
-            logger.info(f"⚠️ Loan overpayment detected: {overpayment_amount} KES")
-        else:
-            payment_amount = amount
-        
-        # Create loan payment record
-        loan_payment = LoanPayment(
-            loan_id=loan.id,
-            amount=payment_amount,
+        # Lock the loan, apply the payment and post it (and any overpayment) to the ledger
+        result = apply_loan_payment(
+            loan.id, amount,
             payment_method='mpesa',
-            transaction_id=receipt_number
+            transaction_id=receipt_number,
+            require_status=None
         )
-        
-        db.session.add(loan_payment)
-        
-        # Update loan
-        loan.paid_amount += payment_amount
-        loan.unpaid_balance = max(0, loan.unpaid_balance - payment_amount)
-        
-        if loan.unpaid_balance <= 0:
-            loan.status = 'paid'
-            loan.paid_date = datetime.utcnow()
+        payment_amount = result.applied_amount
+        loan_payment = result.payment
+        if result.overpayment_amount > 0:
+            logger.info(f"⚠️ Loan overpayment detected: {result.overpayment_amount} KES")
         
         db.session.commit()
         
         logger.info(f"✅ Loan payment processed: User={user.username}, Loan={loan.id}, Amount={payment_amount}")
         
-        return True, loan_payment.id
+        return True, loan_payment.id if loan_payment else None
         
     except Exception as e:
         db.session.rollback()
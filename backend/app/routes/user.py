@@ -1,8 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import db
 from ..models.user import User
 from ..models.contribution import Contribution
+from ..utils.decorators import conditional_get
+from ..services.statements import STATEMENT_FORMATS, parse_month, pdf_available, get_member_statement
 from datetime import datetime
 
 user_bp = Blueprint('user', __name__)
@@ -10,8 +12,13 @@ user_bp = Blueprint('user', __name__)
 @user_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
-    """Get current user information"""
+    """Get current user information, optionally only the ?fields= listed"""
     try:
+        try:
+            fields = User.serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         current_user_id = get_jwt_identity()
         
         # Convert to integer if it's a string
@@ -24,7 +31,7 @@ def get_current_user():
         if not user:
             return jsonify({"error": "User not found"}), 404
         
-        return jsonify(user.to_dict()), 200
+        return jsonify(user.to_dict(fields)), 200
     except Exception as e:
         import traceback
         print(f"Error getting user info: {str(e)}")
@@ -78,9 +85,15 @@ def update_user():
 
 @user_bp.route('/me/contributions', methods=['GET'])
 @jwt_required()
+@conditional_get('member')
 def get_user_contributions():
-    """Get all contributions for the current user"""
+    """Get all contributions for the current user, optionally only the ?fields= listed"""
     try:
+        try:
+            fields = Contribution.serializer.parse_fields(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         current_user_id = get_jwt_identity()
         
         # Convert to integer if it's a string
@@ -93,10 +106,12 @@ def get_user_contributions():
         if not user:
             return jsonify({"error": "User not found"}), 404
         
-        contributions = user.contributions.order_by(Contribution.month.desc()).all()
+        contributions = user.contributions.options(
+            *Contribution.serializer.load_options(Contribution, fields)
+        ).order_by(Contribution.month.desc()).all()
         
         return jsonify({
-            "contributions": [contribution.to_dict() for contribution in contributions],
+            "contributions": [contribution.to_dict(fields) for contribution in contributions],
             "total_contribution": user.total_contribution()
         }), 200
     except Exception as e:
@@ -136,6 +151,7 @@ def get_loan_limit():
 
 @user_bp.route('/me/dashboard', methods=['GET'])
 @jwt_required()
+@conditional_get('member', 'contributions', 'external_investments')
 def get_user_dashboard():
     """Get user's dashboard data with all relevant information"""
     try:
@@ -221,6 +237,49 @@ def get_user_dashboard():
         print(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+@user_bp.route('/me/statements/<month>', methods=['GET'])
+@jwt_required()
+def get_user_statement(month):
+    """Download the current user's statement for a month (YYYY-MM) as html, csv or pdf"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Convert to integer if it's a string
+        if isinstance(current_user_id, str) and current_user_id.isdigit():
+            user_id = int(current_user_id)
+        else:
+            user_id = current_user_id
+        
+        try:
+            month_start = parse_month(month)
+        except ValueError:
+            return jsonify({"error": "Invalid month format. Use YYYY-MM"}), 400
+        
+        if month_start > datetime.utcnow().date():
+            return jsonify({"error": "Statements are not available for future months"}), 400
+        
+        fmt = request.args.get('format', 'html')
+        if fmt not in STATEMENT_FORMATS:
+            return jsonify({"error": "format must be one of: html, csv, pdf"}), 400
+        
+        if fmt == 'pdf' and not pdf_available():
+            return jsonify({"error": "PDF statements are not available on this server"}), 501
+        
+        content = get_member_statement(user_id, month_start, fmt)
+        if content is None:
+            return jsonify({"error": "User not found"}), 404
+        
+        headers = {}
+        if fmt != 'html':
+            headers['Content-Disposition'] = f"attachment; filename=ninefund-statement-{month}.{fmt}"
+        
+        return Response(content, mimetype=STATEMENT_FORMATS[fmt], headers=headers)
+    except Exception as e:
+        import traceback
+        print(f"Error getting statement: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
 @user_bp.route('/me/dashboard-public', methods=['GET'])
 def get_user_dashboard_public():
     """Temporary dashboard endpoint without auth for testing"""
@@ -0,0 +1,191 @@
+# app/services/audit_archive.py
+import glob
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, date
+
+from dateutil.relativedelta import relativedelta
+from flask import current_app
+
+from ..models import db
+from ..models.user import User
+from ..models.admin_log import AdminActivityLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PREFIX = 'admin_activity_logs-'
+ARCHIVE_SUFFIX = '.ndjson.gz'
+
+def get_archive_dir():
+    """Directory holding the monthly activity log archives"""
+    return current_app.config.get('AUDIT_LOG_ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'archives')
+
+def get_retention_cutoff(retention_months=None):
+    """First instant that stays in the hot table: the start of the month N months ago"""
+    if retention_months is None:
+        retention_months = current_app.config.get('AUDIT_LOG_RETENTION_MONTHS', 12)
+    month_start = date.today().replace(day=1) - relativedelta(months=retention_months)
+    return datetime.combine(month_start, datetime.min.time())
+
+def archive_path(month):
+    """Archive file for the month containing `month`"""
+    return os.path.join(get_archive_dir(), f"{ARCHIVE_PREFIX}{month.strftime('%Y-%m')}{ARCHIVE_SUFFIX}")
+
+def archive_activity_logs(retention_months=None, chunk_size=1000):
+    """
+    Move activity logs older than the retention window into monthly archives
+
+    Rows are streamed out of the hot table in created_at order and appended, as
+    gzipped NDJSON, to one file per month. Rows are deleted only after every file
+    has been written and synced, and only up to the highest archived ID, so logs
+    inserted while the job runs are never lost. If the job dies between writing
+    and deleting, the next run archives those rows again; readers drop duplicates.
+
+    Returns:
+        dict: Number of rows archived per month ('YYYY-MM')
+    """
+    cutoff = get_retention_cutoff(retention_months)
+    os.makedirs(get_archive_dir(), exist_ok=True)
+
+    query = (
+        db.select(AdminActivityLog, User.first_name, User.last_name)
+        .outerjoin(User, User.id == AdminActivityLog.admin_id)
+        .where(AdminActivityLog.created_at < cutoff)
+        .order_by(AdminActivityLog.created_at, AdminActivityLog.id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    counts = {}
+    max_id = None
+    current_month = None
+    archive = None
+
+    try:
+        for log, first_name, last_name in db.session.execute(query):
+            month = log.created_at.strftime('%Y-%m')
+            if month != current_month:
+                if archive:
+                    _close_archive(archive)
+                archive = _open_archive(archive_path(log.created_at))
+                current_month = month
+
+            record = _archive_record(log, first_name, last_name)
+            archive[1].write((json.dumps(record) + '\n').encode('utf-8'))
+            counts[month] = counts.get(month, 0) + 1
+            max_id = log.id if max_id is None else max(max_id, log.id)
+    finally:
+        if archive:
+            _close_archive(archive)
+
+    if max_id is not None:
+        db.session.execute(
+            db.delete(AdminActivityLog)
+            .where(AdminActivityLog.created_at < cutoff, AdminActivityLog.id <= max_id)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        logger.info(f"📦 Archived {sum(counts.values())} admin activity logs older than {cutoff.date()}")
+
+    return counts
+
+def _archive_record(log, first_name, last_name):
+    record = {column.name: getattr(log, column.name) for column in AdminActivityLog.__table__.columns}
+    record['admin_name'] = f"{first_name} {last_name}" if first_name is not None else "Unknown Admin"
+    record['created_at'] = log.created_at.isoformat() if log.created_at else None
+    return record
+
+def _open_archive(path):
+    # Appending adds a new gzip member; readers see one continuous stream
+    raw = open(path, 'ab')
+    return raw, gzip.GzipFile(fileobj=raw, mode='ab')
+
+def _close_archive(archive):
+    raw, compressed = archive
+    compressed.close()
+    raw.flush()
+    os.fsync(raw.fileno())
+    raw.close()
+
+def archived_months():
+    """Months ('YYYY-MM') that have an archive file, oldest first"""
+    pattern = os.path.join(get_archive_dir(), f"{ARCHIVE_PREFIX}*{ARCHIVE_SUFFIX}")
+    return sorted(
+        os.path.basename(path)[len(ARCHIVE_PREFIX):-len(ARCHIVE_SUFFIX)]
+        for path in glob.glob(pattern)
+    )
+
+def iter_archived_logs(start=None, end=None):
+    """Yield archived log dicts whose created_at falls within [start, end]"""
+    first_month = start.strftime('%Y-%m') if start else None
+    last_month = end.strftime('%Y-%m') if end else None
+    seen_ids = set()
+
+    for month in archived_months():
+        if (first_month and month < first_month) or (last_month and month > last_month):
+            continue
+
+        path = os.path.join(get_archive_dir(), f"{ARCHIVE_PREFIX}{month}{ARCHIVE_SUFFIX}")
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                record = json.loads(line)
+                if record['id'] in seen_ids:
+                    continue
+                seen_ids.add(record['id'])
+
+                created_at = datetime.fromisoformat(record['created_at'])
+                if (start and created_at < start) or (end and created_at > end):
+                    continue
+                yield record
+
+def query_activity_logs(admin_id=None, action=None, target_type=None, start=None, end=None,
+                        page=1, per_page=20, include_archived=None):
+    """
+    Query activity logs across the hot table and the monthly archives
+
+    Results are ordered newest first. Hot rows are always newer than archived
+    ones, so the page is served from the table and only continues into the
+    archives once the table's matches are exhausted. Archives are consulted when
+    `start` reaches back past the retention cutoff, or when include_archived=True.
+
+    Returns:
+        tuple: (list of log dicts, total number of matches)
+    """
+    query = AdminActivityLog.query.options(db.joinedload(AdminActivityLog.admin))
+    if admin_id:
+        query = query.filter_by(admin_id=admin_id)
+    if action:
+        query = query.filter_by(action=action)
+    if target_type:
+        query = query.filter_by(target_type=target_type)
+    if start:
+        query = query.filter(AdminActivityLog.created_at >= start)
+    if end:
+        query = query.filter(AdminActivityLog.created_at <= end)
+
+    offset = (page - 1) * per_page
+    hot_total = query.order_by(None).count()
+    logs = [
+        log.to_dict() for log in
+        query.order_by(AdminActivityLog.created_at.desc(), AdminActivityLog.id.desc())
+        .offset(offset).limit(per_page).all()
+    ]
+
+    if include_archived is None:
+        include_archived = start is not None and start < get_retention_cutoff()
+    if not include_archived:
+        return logs, hot_total
+
+    archived = [
+        record for record in iter_archived_logs(start, end)
+        if (not admin_id or record['admin_id'] == admin_id)
+        and (not action or record['action'] == action)
+        and (not target_type or record['target_type'] == target_type)
+    ]
+    archived.sort(key=lambda record: (record['created_at'], record['id']), reverse=True)
+
+    archive_offset = max(0, offset - hot_total)
+    logs.extend(archived[archive_offset:archive_offset + per_page - len(logs)])
+
+    return logs, hot_total + len(archived)
@@ -0,0 +1,244 @@
+# app/services/audit_writer.py
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+
+from ..models import db
+from ..models.admin_log import AdminActivityLog
+from ..utils.serializers import json_default
+from .background import BackgroundWorker
+from .cache_versions import bump_versions, table_scope
+
+logger = logging.getLogger(__name__)
+
+# Suffix of a claimed spool file: <spool>.<pid> or <spool>.<pid>-<id>
+CLAIM_SUFFIX = re.compile(r'^(\d+)(?:-[0-9a-f]+)?$')
+
+def _pid_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # Exists but isn't ours to signal
+    return True
+
+class AuditLogWriter(BackgroundWorker):
+    """Buffered writer for admin activity logs
+
+    Entries are kept in memory and written with one bulk INSERT per batch, on a
+    background thread, when the buffer reaches AUDIT_LOG_BATCH_SIZE entries, when
+    AUDIT_LOG_FLUSH_INTERVAL seconds have passed, or at the end of each request.
+
+    Delivery is at-least-once: a batch that cannot be inserted is appended to an
+    NDJSON spool file and replayed before the next batch. Spool lines that can't
+    be decoded are moved to <spool>.rejected for a person to look at.
+    """
+
+    thread_name = 'audit-log-writer'
+    interval_config = 'AUDIT_LOG_FLUSH_INTERVAL'
+
+    def __init__(self, app=None):
+        super().__init__()
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUDIT_LOG_ASYNC', True)
+        app.config.setdefault('AUDIT_LOG_BATCH_SIZE', 50)
+        app.config.setdefault('AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+        app.config.setdefault('AUDIT_LOG_SPOOL_PATH', os.path.join(app.instance_path, 'audit_spool.ndjson'))
+
+        self.app = app
+        app.extensions['audit_writer'] = self
+
+        @app.teardown_request
+        def flush_audit_log(exc):
+            if self._buffer:
+                self.request_flush()
+
+        atexit.register(self.flush)
+
+    @property
+    def asynchronous(self):
+        return self.app.config['AUDIT_LOG_ASYNC']
+
+    def write(self, **entry):
+        """
+        Queue an activity log entry
+
+        old_values/new_values dicts are encoded here, so a value JSON can't hold
+        raises TypeError to the caller instead of failing a later batch.
+        """
+        row = self._serialize(entry)
+        row.setdefault('created_at', datetime.utcnow())
+
+        with self._lock:
+            self._buffer.append(row)
+            pending = len(self._buffer)
+
+        if not self.asynchronous:
+            self.flush()
+        elif pending >= self.app.config['AUDIT_LOG_BATCH_SIZE']:
+            self.request_flush()
+        else:
+            self._ensure_thread()
+
+        return True
+
+    def request_flush(self):
+        """Ask the background thread to flush without blocking the caller"""
+        if not self.asynchronous:
+            self.flush()
+            return
+
+        self._wake()
+
+    def flush(self):
+        """Write all buffered entries (and any spooled ones) to the database"""
+        with self._flush_lock:
+            # Claim first, so a spool that can't be read leaves the buffer alone
+            spooled, claimed = self._claim_spool()
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+
+            try:
+                rows = spooled + batch
+                if not rows:
+                    return 0
+
+                try:
+                    with self.app.app_context():
+                        with db.engine.begin() as conn:
+                            conn.execute(db.insert(AdminActivityLog.__table__), rows)
+                            bump_versions(conn, {table_scope(AdminActivityLog.__tablename__)})
+                    written = len(rows)
+                except Exception as e:
+                    logger.error(f"❌ Error writing {len(rows)} admin activity logs: {str(e)}")
+                    self._spool(rows)
+                    written = 0
+            except Exception:
+                # Neither written nor spooled: the batch waits for the next flush, the claims for the next claim
+                with self._lock:
+                    self._buffer[:0] = batch
+                raise
+
+            for claim_path in claimed:
+                try:
+                    os.remove(claim_path)
+                except OSError as e:
+                    logger.error(f"❌ Could not remove replayed audit spool {claim_path}: {str(e)}")
+
+            return written
+
+    def run_once(self):
+        self.flush()
+
+    @staticmethod
+    def _serialize(entry):
+        row = dict(entry)
+        for key in ('old_values', 'new_values'):
+            if isinstance(row.get(key), dict):
+                row[key] = json.dumps(row[key], default=json_default)
+        return row
+
+    def _spool(self, rows):
+        """Append rows to the spool file, or keep them in memory if that fails too"""
+        if not rows:
+            return
+
+        path = self.app.config['AUDIT_LOG_SPOOL_PATH']
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as spool:
+                for row in rows:
+                    record = dict(row, created_at=row['created_at'].isoformat())
+                    spool.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logger.error(f"❌ Could not spool admin activity logs: {str(e)}")
+            with self._lock:
+                self._buffer[:0] = rows
+
+    def _claim_spool(self):
+        """
+        Take ownership of spooled rows so concurrent workers never replay them twice
+
+        The spool is renamed to a claim file of our own. Claim files left behind
+        by a process that is gone (or by an earlier process with our PID; ours
+        are removed before flush returns) are taken over as well.
+
+        Returns:
+            tuple: (rows, claim file paths to remove once the rows are safe)
+        """
+        path = self.app.config['AUDIT_LOG_SPOOL_PATH']
+        pid = os.getpid()
+        claimed = []
+
+        sources = [path]
+        directory, prefix = os.path.dirname(path) or '.', os.path.basename(path) + '.'
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            match = CLAIM_SUFFIX.match(name[len(prefix):]) if name.startswith(prefix) else None
+            if not match:
+                continue
+            owner = int(match.group(1))
+            if owner == pid:
+                claimed.append(os.path.join(directory, name))
+            elif not _pid_running(owner):
+                sources.append(os.path.join(directory, name))
+
+        for source in sources:
+            claim_path = f"{path}.{pid}-{uuid.uuid4().hex[:12]}"
+            try:
+                os.replace(source, claim_path)
+            except FileNotFoundError:
+                continue  # Nothing spooled, or another worker took it over first
+            claimed.append(claim_path)
+
+        rows = []
+        for claim_path in claimed:
+            rows += self._read_spool(claim_path)
+        return rows, claimed
+
+    def _read_spool(self, claim_path):
+        rows, rejected = [], []
+        with open(claim_path, encoding='utf-8', errors='replace') as spool:
+            for line in spool:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    row['created_at'] = datetime.fromisoformat(row['created_at'])
+                except (ValueError, TypeError, KeyError):
+                    rejected.append(line.rstrip('\n'))  # Truncated by a crash or a full disk
+                    continue
+                rows.append(row)
+
+        if rejected:
+            self._reject(rejected)
+        return rows
+
+    def _reject(self, lines):
+        """Quarantine spool lines that can't be replayed; log them if even that fails"""
+        path = f"{self.app.config['AUDIT_LOG_SPOOL_PATH']}.rejected"
+        logger.error(f"❌ {len(lines)} admin activity log spool lines could not be read; moved to {path}")
+        try:
+            with open(path, 'a', encoding='utf-8') as rejects:
+                rejects.writelines(line + '\n' for line in lines)
+        except OSError as e:
+            logger.error(f"❌ Could not quarantine spool lines ({str(e)}): {lines}")
+
+
+audit_writer = AuditLogWriter()
@@ -0,0 +1,73 @@
+# app/services/background.py
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+class BackgroundWorker:
+    """
+    Base for extensions that do periodic work on a daemon thread of their own
+
+    Subclasses set `thread_name` and `interval_config` (the app config key
+    holding the seconds between runs; 0 disables the thread) and implement
+    run_once(). The thread is started lazily by _ensure_thread() and calls
+    run_once() every interval, or as soon as _wake() is called; with
+    `run_on_start` it runs once before the first wait. Errors are logged and
+    the thread carries on.
+
+    Threads don't survive fork, so a forked worker (gunicorn preload) starts
+    its own on first use.
+    """
+
+    thread_name = 'background-worker'
+    interval_config = None
+    run_on_start = False
+
+    def __init__(self):
+        self.app = None
+        self._thread_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def run_once(self):
+        raise NotImplementedError
+
+    @property
+    def interval(self):
+        return self.app.config[self.interval_config]
+
+    def _running(self):
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def _ensure_thread(self):
+        if not self.interval or self._running():
+            return
+
+        with self._thread_lock:
+            if self._running():
+                return
+
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def _wake(self):
+        """Run soon on the background thread, starting it if needed"""
+        self._ensure_thread()
+        self._wakeup.set()
+
+    def _run(self):
+        if not self.run_on_start:
+            self._wait()
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"❌ {self.thread_name} error: {str(e)}")
+            self._wait()
+
+    def _wait(self):
+        self._wakeup.wait(self.interval)
+        self._wakeup.clear()
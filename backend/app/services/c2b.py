@@ -0,0 +1,420 @@
+# app/services/c2b.py
+import hmac
+import ipaddress
+import json
+import logging
+import re
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from ..models import db
+from ..models.c2b_transaction import C2BTransaction
+from ..models.contribution import Contribution
+from ..models.loan import Loan
+from ..models.overpayment import Overpayment
+from ..models.user import User
+from .background import BackgroundWorker
+from .loan_ledger import LoanPaymentError, apply_loan_payment, lock_row, run_in_transaction
+from . import ledger
+
+logger = logging.getLogger(__name__)
+
+# Account references routes/mpesa.py generates for STK pushes; members type the same ones at the PayBill
+CONTRIBUTION_REF = re.compile(r'^CONTRIB-(\d+)-(\d{4})-(\d{1,2})$')
+LOAN_REF = re.compile(r'^LOAN-(\d+)-(\d+)$')
+
+# Same expected amount as STK contributions; anything above becomes an overpayment
+EXPECTED_CONTRIBUTION = 3000
+
+Match = namedtuple('Match', ['user', 'transaction_type', 'method', 'loan', 'month'])
+
+class C2BError(ValueError):
+    """Raised when a C2B payment can't be stored or assigned"""
+
+class UnmatchedPayment(C2BError):
+    """Raised when a payment can't be attributed to a member; it waits for an admin"""
+
+class CallbackRejected(C2BError):
+    """Raised when a C2B callback doesn't come from M-PESA for our shortcode"""
+
+def _address_allowed(remote_addr, allowed):
+    try:
+        address = ipaddress.ip_address(remote_addr or '')
+    except ValueError:
+        return False
+    for network in allowed.split(','):
+        network = network.strip()
+        if not network:
+            continue
+        try:
+            if address in ipaddress.ip_network(network, strict=False):
+                return True
+        except ValueError:
+            logger.error(f"❌ Bad MPESA_CALLBACK_ALLOWED_IPS entry: {network}")
+    return False
+
+def authenticate_callback(request, data):
+    """
+    Check a C2B validation/confirmation request before anything is stored
+
+    The registered URL carries ?token=<MPESA_C2B_TOKEN>, the caller must be one
+    of MPESA_CALLBACK_ALLOWED_IPS (when set) and BusinessShortCode must be
+    MPESA_SHORTCODE. With no token configured every callback is refused.
+
+    Raises:
+        CallbackRejected: If any check fails
+    """
+    config = current_app.config
+    expected_token = config.get('MPESA_C2B_TOKEN')
+    if not expected_token:
+        raise CallbackRejected("MPESA_C2B_TOKEN is not configured")
+    if not hmac.compare_digest(request.args.get('token', '').encode(), expected_token.encode()):
+        raise CallbackRejected(f"Bad callback token from {request.remote_addr}")
+
+    allowed = config.get('MPESA_CALLBACK_ALLOWED_IPS') or ''
+    if allowed.strip() and not _address_allowed(request.remote_addr, allowed):
+        raise CallbackRejected(f"Callback from unexpected address {request.remote_addr}")
+
+    shortcode = str(data.get('BusinessShortCode') or '').strip()
+    if shortcode != str(config.get('MPESA_SHORTCODE') or ''):
+        raise CallbackRejected(f"Callback for another shortcode: {shortcode or 'none'}")
+
+def parse_bill_ref(bill_ref_number):
+    """
+    Read a CONTRIB-<user>-<YYYY-MM> or LOAN-<loan>-<user> account reference
+
+    Returns ('contribution', user_id, month), ('loan_repayment', loan_id, user_id)
+    or None for anything else.
+    """
+    reference = re.sub(r'\s+', '', bill_ref_number or '').upper()
+
+    match = LOAN_REF.match(reference)
+    if match:
+        return 'loan_repayment', int(match.group(1)), int(match.group(2))
+
+    match = CONTRIBUTION_REF.match(reference)
+    if match:
+        try:
+            month = date(int(match.group(2)), int(match.group(3)), 1)
+        except ValueError:
+            return None
+        return 'contribution', int(match.group(1)), month
+
+    return None
+
+def _parse_trans_time(value):
+    try:
+        return datetime.strptime(str(value), '%Y%m%d%H%M%S')
+    except (TypeError, ValueError):
+        return None
+
+def _payment_month(txn):
+    return (txn.trans_time or txn.created_at or datetime.utcnow()).date().replace(day=1)
+
+def store_confirmation(data):
+    """
+    Store a C2B confirmation body for the processor
+
+    Returns the new C2BTransaction, or None when M-PESA already sent this
+    TransID (the unique trans_id makes redelivery harmless).
+
+    Raises:
+        C2BError: If the body has no TransID or no valid amount
+    """
+    trans_id = str(data.get('TransID') or '').strip()
+    if not trans_id:
+        raise C2BError("Missing TransID")
+    try:
+        amount = float(data.get('TransAmount'))
+    except (TypeError, ValueError):
+        raise C2BError(f"Invalid TransAmount: {data.get('TransAmount')}")
+
+    names = (data.get('FirstName'), data.get('MiddleName'), data.get('LastName'))
+    txn = C2BTransaction(
+        trans_id=trans_id,
+        trans_type=data.get('TransType'),
+        trans_time=_parse_trans_time(data.get('TransTime')),
+        amount=amount,
+        business_short_code=str(data.get('BusinessShortCode') or '') or None,
+        bill_ref_number=(data.get('BillRefNumber') or '').strip() or None,
+        msisdn=str(data.get('MSISDN') or '') or None,
+        payer_name=' '.join(name for name in names if name) or None,
+        payload=json.dumps(data, default=str),
+        status='received'
+    )
+    db.session.add(txn)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return txn
+
+def match_payment(txn):
+    """
+    Work out whose payment this is and what it pays for
+
+    A CONTRIB-/LOAN- reference names the member (and loan) directly. Any other
+    reference is looked up by the payer's MSISDN and taken as that member's
+    contribution for the month it was paid in.
+
+    Raises:
+        UnmatchedPayment: If neither finds a member
+    """
+    reference = parse_bill_ref(txn.bill_ref_number)
+
+    if reference and reference[0] == 'loan_repayment':
+        _, loan_id, user_id = reference
+        loan = db.session.get(Loan, loan_id)
+        if not loan or loan.user_id != user_id:
+            raise UnmatchedPayment(f"Reference {txn.bill_ref_number} does not match a member's loan")
+        return Match(loan.user, 'loan_repayment', 'reference', loan, None)
+
+    if reference:
+        _, user_id, month = reference
+        user = db.session.get(User, user_id)
+        if not user:
+            raise UnmatchedPayment(f"Reference {txn.bill_ref_number} does not match a member")
+        return Match(user, 'contribution', 'reference', None, month)
+
+    user = User.find_by_msisdn(txn.msisdn) if txn.msisdn else None
+    if user is None:
+        raise UnmatchedPayment(f"No member for reference '{txn.bill_ref_number or ''}' or phone number {txn.msisdn}")
+    return Match(user, 'contribution', 'msisdn', None, _payment_month(txn))
+
+def _post_contribution(txn, user_id, month, created_by=None):
+    overpayment = None
+    if txn.amount > EXPECTED_CONTRIBUTION:
+        overpayment_amount = txn.amount - EXPECTED_CONTRIBUTION
+        overpayment = Overpayment(
+            user_id=user_id,
+            original_payment_type='contribution',
+            expected_amount=EXPECTED_CONTRIBUTION,
+            actual_amount=txn.amount,
+            overpayment_amount=overpayment_amount,
+            remaining_amount=overpayment_amount
+        )
+        db.session.add(overpayment)
+
+    contribution = Contribution(
+        user_id=user_id,
+        amount=min(txn.amount, EXPECTED_CONTRIBUTION),
+        month=month,
+        payment_method='mpesa',
+        transaction_id=txn.trans_id
+    )
+    db.session.add(contribution)
+
+    ledger.record_contribution(contribution, created_by=created_by)
+    if overpayment is not None:
+        overpayment.original_payment_id = contribution.id
+        ledger.record_overpayment(overpayment, created_by=created_by)
+
+    return contribution, overpayment
+
+def post_payment(txn, match, resolved_by=None):
+    """Post a matched payment as a contribution or loan payment and mark it posted; nothing is committed"""
+    if match.transaction_type == 'loan_repayment':
+        result = apply_loan_payment(
+            match.loan.id, txn.amount,
+            payment_method='mpesa',
+            transaction_id=txn.trans_id,
+            require_status='approved',
+            created_by=resolved_by
+        )
+        txn.loan_id = match.loan.id
+        txn.loan_payment_id = result.payment.id if result.payment else None
+        txn.overpayment_amount = result.overpayment_amount or None
+    else:
+        contribution, overpayment = _post_contribution(txn, match.user.id, match.month, created_by=resolved_by)
+        txn.contribution_id = contribution.id
+        txn.overpayment_amount = overpayment.overpayment_amount if overpayment else None
+
+    txn.user_id = match.user.id
+    txn.match_method = match.method
+    txn.transaction_type = match.transaction_type
+    txn.resolved_by = resolved_by
+    txn.status = 'posted'
+    txn.failure_reason = None
+    txn.processed_at = datetime.utcnow()
+    db.session.flush()
+
+    logger.info(f"✅ C2B {txn.trans_id} posted as {match.transaction_type} for user {match.user.id} (by {match.method})")
+    return txn
+
+def _mark_unmatched(txn, reason):
+    txn.status = 'unmatched'
+    txn.failure_reason = reason[:255]
+    txn.processed_at = datetime.utcnow()
+    logger.warning(f"⚠️ C2B {txn.trans_id} needs admin review: {reason}")
+
+def _claim(txn_id):
+    """Take a received payment for this processor; False if another one got it first"""
+    claimed = db.session.execute(
+        db.update(C2BTransaction)
+        .where(C2BTransaction.id == txn_id, C2BTransaction.status == 'received')
+        .values(status='processing', claimed_at=datetime.utcnow(), attempts=C2BTransaction.attempts + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return claimed == 1
+
+def _release(txn_id, reason):
+    db.session.execute(
+        db.update(C2BTransaction)
+        .where(C2BTransaction.id == txn_id, C2BTransaction.status == 'processing')
+        .values(status='received', claimed_at=None, failure_reason=reason[:255])
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+def release_stale_claims(timeout):
+    """Hand payments claimed more than `timeout` seconds ago (by a processor that died) back to the queue"""
+    released = db.session.execute(
+        db.update(C2BTransaction)
+        .where(C2BTransaction.status == 'processing',
+               C2BTransaction.claimed_at < datetime.utcnow() - timedelta(seconds=timeout))
+        .values(status='received', claimed_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return released
+
+def process_transaction(txn_id, max_attempts=5):
+    """
+    Claim one received payment and post it, or leave it unmatched for an admin
+
+    Each payment is claimed and posted in its own transaction. A payment that
+    fails with an unexpected error goes back to the queue, and after
+    `max_attempts` tries to admin review.
+
+    Returns:
+        str: 'posted' or 'unmatched', or None if it wasn't processed
+    """
+    if not _claim(txn_id):
+        return None
+
+    def work():
+        txn = db.session.get(C2BTransaction, txn_id, populate_existing=True)
+        if txn.attempts > max_attempts:
+            _mark_unmatched(txn, f"Gave up after {max_attempts} attempts: {txn.failure_reason}")
+            return txn.status
+        try:
+            with db.session.begin_nested():
+                post_payment(txn, match_payment(txn))
+        except (UnmatchedPayment, LoanPaymentError) as e:
+            _mark_unmatched(txn, str(e))
+        return txn.status
+
+    try:
+        return run_in_transaction(work)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"❌ Error processing C2B payment {txn_id}: {str(e)}")
+        _release(txn_id, str(e))
+        return None
+
+def process_pending(limit=100, claim_timeout=300, max_attempts=5):
+    """Match and post up to `limit` received payments, oldest first; returns counts by outcome"""
+    release_stale_claims(claim_timeout)
+    txn_ids = db.session.execute(
+        db.select(C2BTransaction.id)
+        .where(C2BTransaction.status == 'received')
+        .order_by(C2BTransaction.id)
+        .limit(limit)
+    ).scalars().all()
+    db.session.commit()
+
+    counts = {'posted': 0, 'unmatched': 0, 'skipped': 0}
+    for txn_id in txn_ids:
+        counts[process_transaction(txn_id, max_attempts) or 'skipped'] += 1
+    return counts
+
+def resolve_unmatched(txn_id, admin_id, user_id, loan_id=None, month=None):
+    """
+    Post an unmatched payment to the member (and loan) an admin picked
+
+    Without a loan it becomes the member's contribution for `month`, by
+    default the month it was paid in. Nothing is committed.
+
+    Raises:
+        C2BError: If the payment isn't awaiting review or the member/loan is wrong
+        LoanPaymentError: If the loan can't take the payment
+    """
+    txn = lock_row(C2BTransaction, txn_id)
+    if not txn:
+        raise C2BError("C2B payment not found")
+    if txn.status != 'unmatched':
+        raise C2BError(f"C2B payment is {txn.status}, not awaiting review")
+
+    user = db.session.get(User, user_id)
+    if not user:
+        raise C2BError("User not found")
+
+    if loan_id:
+        loan = db.session.get(Loan, loan_id)
+        if not loan or loan.user_id != user.id:
+            raise C2BError("Invalid loan or loan doesn't belong to this user")
+        match = Match(user, 'loan_repayment', 'admin', loan, None)
+    else:
+        match = Match(user, 'contribution', 'admin', None, month or _payment_month(txn))
+
+    return post_payment(txn, match, resolved_by=admin_id)
+
+class C2BProcessor(BackgroundWorker):
+    """Background matcher/poster for stored C2B confirmations
+
+    The confirmation endpoint stores the payment and calls request_processing(),
+    which wakes a background thread; the thread also sweeps the queue every
+    C2B_POLL_INTERVAL seconds once started, picking up anything missed. With
+    C2B_ASYNC off, payments are processed in the calling request instead.
+    `flask process-c2b` drains the queue from the command line.
+    """
+
+    thread_name = 'c2b-processor'
+    interval_config = 'C2B_POLL_INTERVAL'
+
+    def __init__(self, app=None):
+        super().__init__()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('C2B_ASYNC', True)
+        app.config.setdefault('C2B_POLL_INTERVAL', 30.0)
+        app.config.setdefault('C2B_BATCH_SIZE', 100)
+        app.config.setdefault('C2B_CLAIM_TIMEOUT', 300)
+        app.config.setdefault('C2B_MAX_ATTEMPTS', 5)
+
+        self.app = app
+        app.extensions['c2b_processor'] = self
+
+    def request_processing(self):
+        """Process received payments soon, without blocking the caller when asynchronous"""
+        if not self.app.config['C2B_ASYNC']:
+            return self.process()
+
+        self._wake()
+
+    def process(self):
+        """Process received payments until the queue is empty; returns counts by outcome"""
+        config = self.app.config
+        totals = {'posted': 0, 'unmatched': 0, 'skipped': 0}
+        with self.app.app_context():
+            while True:
+                counts = process_pending(config['C2B_BATCH_SIZE'], config['C2B_CLAIM_TIMEOUT'], config['C2B_MAX_ATTEMPTS'])
+                for outcome, count in counts.items():
+                    totals[outcome] += count
+                # Skipped rows belong to another processor or go back to the queue; leave them to the next sweep
+                if counts['posted'] + counts['unmatched'] == 0:
+                    return totals
+
+    def run_once(self):
+        self.process()
+
+
+c2b_processor = C2BProcessor()
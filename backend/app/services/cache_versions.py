@@ -0,0 +1,229 @@
+# app/services/cache_versions.py
+import hashlib
+import importlib
+import logging
+from datetime import datetime
+from functools import lru_cache
+from itertools import chain
+
+from flask import has_request_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+
+from ..models import db
+from ..models.cache_version import CacheVersion
+from ..models.loan import Loan
+
+logger = logging.getLogger(__name__)
+
+# Tables whose rows belong to one member, and the column holding the member id.
+# Loan payments are attributed through their loan.
+MEMBER_COLUMNS = {
+    'users': 'id',
+    'contributions': 'user_id',
+    'loans': 'user_id',
+    'overpayments': 'user_id',
+    'payment_status': 'user_id',
+    'ledger_entries': 'user_id',
+}
+
+# Bumped when a bulk statement changes member rows it can't attribute to a member
+ALL_MEMBERS_SCOPE = 'members'
+
+# Writes to these tables never change a cached response
+UNTRACKED_TABLES = {'cache_versions', 'otps', 'ledger_snapshots'}
+
+_PENDING_SCOPES = 'cache_version_scopes'
+_PENDING_LOAN_IDS = 'cache_version_loan_ids'
+
+def table_scope(table_name):
+    return f"table:{table_name}"
+
+def writer_scope(user_id):
+    """Bumped whenever this user commits a write; drives read-replica stickiness"""
+    return f"writer:{user_id}"
+
+def member_scope(user_id):
+    return f"member:{user_id}"
+
+@lru_cache(maxsize=None)
+def _cascade_tables(table_name):
+    """Tables whose rows the database deletes along with rows of `table_name` (ON DELETE CASCADE)"""
+    tables = set()
+    for table in db.metadata.sorted_tables:
+        for fk in table.foreign_keys:
+            if fk.column.table.name == table_name and (fk.ondelete or '').upper() == 'CASCADE':
+                tables.add(table.name)
+                tables |= _cascade_tables(table.name)
+    return frozenset(tables - UNTRACKED_TABLES)
+
+def _record(session, scopes=(), loan_ids=()):
+    session.info.setdefault(_PENDING_SCOPES, set()).update(scopes)
+    session.info.setdefault(_PENDING_LOAN_IDS, set()).update(loan_ids)
+
+def _after_flush(session, flush_context):
+    """Collect the scopes touched by the objects just flushed"""
+    scopes = set()
+    loan_ids = set()
+    dirty = session.dirty
+    deleted = session.deleted
+
+    for obj in chain(session.new, dirty, deleted):
+        table_name = getattr(obj, '__tablename__', None)
+        if not table_name or table_name in UNTRACKED_TABLES:
+            continue
+        if obj in dirty and not session.is_modified(obj, include_collections=False):
+            continue
+
+        scopes.add(table_scope(table_name))
+        if obj in deleted:
+            scopes.update(table_scope(name) for name in _cascade_tables(table_name))
+
+        if table_name == 'loan_payments':
+            loan_ids.add(obj.loan_id)
+        elif table_name in MEMBER_COLUMNS:
+            scopes.add(member_scope(getattr(obj, MEMBER_COLUMNS[table_name])))
+
+    if scopes or loan_ids:
+        _record(session, scopes, loan_ids)
+
+def _do_orm_execute(orm_execute_state):
+    """Collect the scopes touched by bulk INSERT/UPDATE/DELETE statements"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+
+    table = getattr(orm_execute_state.statement, 'table', None)
+    table_name = getattr(table, 'name', None)
+    if not table_name or table_name in UNTRACKED_TABLES:
+        return
+
+    scopes = {table_scope(table_name)}
+    affected = {table_name}
+    if orm_execute_state.is_delete:
+        affected |= _cascade_tables(table_name)
+        scopes.update(table_scope(name) for name in affected)
+    if affected & (set(MEMBER_COLUMNS) | {'loan_payments'}):
+        scopes.add(ALL_MEMBERS_SCOPE)
+
+    _record(orm_execute_state.session, scopes)
+
+def _before_commit(session):
+    """Bump the collected version counters in the transaction being committed"""
+    # Commit flushes after this hook runs, so flush now to collect everything
+    session.flush()
+    if not session.info.get(_PENDING_SCOPES) and not session.info.get(_PENDING_LOAN_IDS):
+        return
+
+    scopes = session.info.pop(_PENDING_SCOPES, set())
+    loan_ids = session.info.pop(_PENDING_LOAN_IDS, set())
+    conn = session.connection()
+
+    if loan_ids:
+        user_ids = conn.execute(
+            db.select(Loan.user_id).where(Loan.id.in_(loan_ids))
+        ).scalars()
+        scopes.update(member_scope(user_id) for user_id in user_ids)
+
+    identity = _request_identity()
+    if identity is not None:
+        scopes.add(writer_scope(identity))
+
+    bump_versions(conn, scopes)
+
+def _request_identity():
+    if not has_request_context():
+        return None
+    try:
+        return get_jwt_identity()
+    except RuntimeError:  # Unauthenticated route
+        return None
+
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_PENDING_SCOPES, None)
+        session.info.pop(_PENDING_LOAN_IDS, None)
+
+def bump_versions(conn, scopes):
+    """
+    Increment the version counters for `scopes` on the given connection
+
+    Scopes are written in sorted order so concurrent transactions take the
+    row locks in the same order and can't deadlock on each other.
+    """
+    if not scopes:
+        return
+
+    table = CacheVersion.__table__
+    now = datetime.utcnow()
+    scopes = sorted(scopes)
+    dialect = conn.dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        # The connection's dialect module is already loaded; importing the other one costs ~40ms at startup
+        insert = importlib.import_module(f"sqlalchemy.dialects.{dialect}").insert
+        statement = insert(table).values([
+            {'scope': scope, 'version': 1, 'updated_at': now} for scope in scopes
+        ])
+        conn.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.scope],
+            set_={'version': table.c.version + 1, 'updated_at': now}
+        ))
+        return
+
+    conn.execute(
+        db.update(table).where(table.c.scope.in_(scopes))
+        .values(version=table.c.version + 1, updated_at=now)
+    )
+    existing = set(conn.execute(db.select(table.c.scope).where(table.c.scope.in_(scopes))).scalars())
+    missing = [scope for scope in scopes if scope not in existing]
+    if missing:
+        conn.execute(db.insert(table), [
+            {'scope': scope, 'version': 1, 'updated_at': now} for scope in missing
+        ])
+
+def get_versions(scopes):
+    """Current (version, updated_at) for each scope; unknown scopes are at version 0"""
+    rows = db.session.execute(
+        db.select(CacheVersion.scope, CacheVersion.version, CacheVersion.updated_at)
+        .where(CacheVersion.scope.in_(scopes))
+    ).all()
+    versions = {scope: (0, None) for scope in scopes}
+    versions.update({scope: (version, updated_at) for scope, version, updated_at in rows})
+    return versions
+
+def last_write_at(user_id):
+    """When `user_id` last committed a write, or None"""
+    return db.session.scalar(
+        db.select(CacheVersion.updated_at).where(CacheVersion.scope == writer_scope(user_id))
+    )
+
+def compute_validators(scopes, *vary):
+    """
+    Build an ETag and Last-Modified value from the scopes' version counters
+
+    `vary` holds anything else the response depends on (path, query string,
+    identity). The current UTC date is always mixed in because some fields,
+    such as a loan's days_remaining, change with the calendar alone.
+    """
+    versions = get_versions(scopes)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    parts = [str(part) for part in vary]
+    parts.append(today.date().isoformat())
+    parts.extend(f"{scope}={versions[scope][0]}" for scope in sorted(versions))
+    etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:32]
+
+    last_modified = max([today] + [updated_at for _, updated_at in versions.values() if updated_at])
+    return etag, last_modified.replace(microsecond=0)
+
+def register_version_hooks():
+    """Listen for session writes so version counters are bumped on every commit"""
+    session = db.session
+    if event.contains(session, 'before_commit', _before_commit):
+        return
+
+    event.listen(session, 'after_flush', _after_flush)
+    event.listen(session, 'do_orm_execute', _do_orm_execute)
+    event.listen(session, 'before_commit', _before_commit)
+    event.listen(session, 'after_transaction_end', _after_transaction_end)
+    logger.info("🏷️ Cache version hooks registered")
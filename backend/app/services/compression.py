@@ -0,0 +1,167 @@
+# app/services/compression.py
+import logging
+import threading
+import time
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIMETYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'text/csv',
+    'text/html',
+    'text/plain',
+    'text/css',
+    'application/javascript',
+)
+
+class _Compressor:
+    """Incremental gzip or brotli compressor with the same interface for both"""
+
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+
+    def compress(self, data, flush=False):
+        if self.encoding == 'br':
+            out = self._compressor.process(data)
+            return out + self._compressor.flush() if flush else out
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+class ResponseCompressor:
+    """Compress responses in an after_request hook
+
+    Picks brotli when the client accepts it and the module is installed, gzip
+    otherwise. Only allowlisted content types above a minimum size are
+    compressed; streamed responses (exports) are compressed chunk by chunk.
+    The compression ratio and CPU time of every response are logged and added
+    to running totals in `stats`.
+
+    Configuration:
+        COMPRESSION_ENABLED: Turn compression on or off
+        COMPRESSION_MIN_SIZE: Smallest body (bytes) worth compressing
+        COMPRESSION_MIMETYPES: Content types that may be compressed
+        COMPRESSION_GZIP_LEVEL: zlib level 1-9
+        COMPRESSION_BROTLI_QUALITY: brotli quality 0-11
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.stats = {'responses': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_seconds': 0.0}
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESSION_ENABLED', True)
+        app.config.setdefault('COMPRESSION_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESSION_MIMETYPES', DEFAULT_MIMETYPES)
+        app.config.setdefault('COMPRESSION_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESSION_BROTLI_QUALITY', 4)
+
+        self.app = app
+        app.extensions['response_compressor'] = self
+
+        if app.config['COMPRESSION_ENABLED']:
+            app.after_request(self.after_request)
+            logger.info(f"🗜️ Response compression enabled ({'brotli, gzip' if brotli else 'gzip'})")
+
+    def choose_encoding(self):
+        """Best encoding the client accepts, or None"""
+        options = ['br', 'gzip'] if brotli else ['gzip']
+        return request.accept_encodings.best_match(options)
+
+    def after_request(self, response):
+        config = self.app.config
+
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or request.method == 'HEAD'
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in config['COMPRESSION_MIMETYPES']):
+            return response
+
+        if response.direct_passthrough and not response.is_streamed:
+            return response
+
+        encoding = self.choose_encoding()
+        response.vary.add('Accept-Encoding')
+        if not encoding:
+            return response
+
+        compressor = _Compressor(encoding, config['COMPRESSION_GZIP_LEVEL'], config['COMPRESSION_BROTLI_QUALITY'])
+
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, compressor, request.path)
+            response.direct_passthrough = False
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = encoding
+            return response
+
+        body = response.get_data()
+        if len(body) < config['COMPRESSION_MIN_SIZE']:
+            return response
+
+        started = time.thread_time()
+        compressed = compressor.compress(body) + compressor.finish()
+        self._record(request.path, encoding, len(body), len(compressed), time.thread_time() - started)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _compress_stream(self, chunks, compressor, path):
+        bytes_in = bytes_out = 0
+        cpu_seconds = 0.0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                started = time.thread_time()
+                # Sync-flush every chunk so the client keeps receiving data as rows are produced
+                compressed = compressor.compress(chunk, flush=True)
+                cpu_seconds += time.thread_time() - started
+                bytes_in += len(chunk)
+                bytes_out += len(compressed)
+                if compressed:
+                    yield compressed
+
+            started = time.thread_time()
+            tail = compressor.finish()
+            cpu_seconds += time.thread_time() - started
+            bytes_out += len(tail)
+            yield tail
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            self._record(path, compressor.encoding, bytes_in, bytes_out, cpu_seconds)
+
+    def _record(self, path, encoding, bytes_in, bytes_out, cpu_seconds):
+        with self._stats_lock:
+            self.stats['responses'] += 1
+            self.stats['bytes_in'] += bytes_in
+            self.stats['bytes_out'] += bytes_out
+            self.stats['cpu_seconds'] += cpu_seconds
+        ratio = bytes_in / bytes_out if bytes_out else 0
+        logger.debug(
+            f"🗜️ {path}: {encoding} {bytes_in} -> {bytes_out} bytes "
+            f"(ratio {ratio:.1f}x, {cpu_seconds * 1000:.2f} ms CPU)"
+        )
+
+response_compressor = ResponseCompressor()
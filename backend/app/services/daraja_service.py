@@ -1,5 +1,4 @@
 # app/services/daraja_service.py - ENHANCED VERSION (Replace your existing file)
-import requests
 import base64
 import json
 from datetime import datetime
@@ -8,12 +7,16 @@ import logging
 import traceback
 import time
 import hashlib
+import os
 from ..models import db
 from ..models.user import User
 from ..models.contribution import Contribution
 from ..models.loan import Loan, LoanPayment
 from ..models.payment_status import PaymentStatus
 from ..models.overpayment import Overpayment
+from ..utils.phone import is_safaricom, to_msisdn
+from .loan_ledger import apply_loan_payment
+from . import ledger
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +26,26 @@ _token_cache = {
     'expires_at': None
 }
 
+# Keep-alive HTTP session for Daraja calls, one per process
+_http = {
+    'session': None,
+    'pid': None
+}
+
+def get_http_session():
+    """Shared requests session, so Daraja calls reuse their TLS connection (tests mount a fake transport on it)"""
+    import requests  # Slow to import and only needed for Daraja calls, so loaded on first use
+    
+    # Sockets don't survive fork, so a forked worker opens its own session
+    if _http['pid'] != os.getpid():
+        _http['session'] = requests.Session()
+        _http['pid'] = os.getpid()
+    return _http['session']
+
 def get_auth_token():
     """Get OAuth token from Safaricom with caching"""
+    import requests
+    
     try:
         # Check if we have a valid cached token
         if (_token_cache['token'] and 
@@ -59,12 +80,12 @@ def get_auth_token():
             _token_cache['expires_at'] = datetime.now().timestamp() + 3600
             return _token_cache['token']
         
-        response = requests.get(url, headers=headers, timeout=30)
+        response = get_http_session().get(url, headers=headers, timeout=current_app.config['MPESA_REQUEST_TIMEOUT'])
         response.raise_for_status()
         
         result = response.json()
         token = result.get('access_token')
-        expires_in = result.get('expires_in', 3599)
+        expires_in = int(result.get('expires_in', 3599))  # Daraja sends it as a string
         
         if not token:
             logger.error(f"❌ Invalid token response: {result}")
@@ -87,38 +108,14 @@ def get_auth_token():
 def format_phone_number(phone_number):
     """Format phone number to 254XXXXXXXXX format"""
     try:
-        # Remove any non-digit characters
-        phone = ''.join(filter(str.isdigit, str(phone_number)))
-        
-        # Handle different input formats
-        if phone.startswith('254'):
-            phone = phone
-        elif phone.startswith('0'):
-            phone = '254' + phone[1:]
-        elif phone.startswith('7') or phone.startswith('1'):
-            phone = '254' + phone
-        else:
-            raise ValueError(f"Invalid phone number format: {phone_number}")
-        
-        # Validate length (should be 12 digits for Kenyan numbers)
-        if len(phone) != 12:
-            raise ValueError(f"Invalid phone number length: {phone}")
-        
-        # Validate Kenyan mobile prefixes
-        valid_prefixes = ['254701', '254702', '254703', '254704', '254705', '254706', '254707', '254708', '254709',
-                         '254710', '254711', '254712', '254713', '254714', '254715', '254716', '254717', '254718', '254719',
-                         '254720', '254721', '254722', '254723', '254724', '254725', '254726', '254727', '254728', '254729',
-                         '254730', '254731', '254732', '254733', '254734', '254735', '254736', '254737', '254738', '254739',
-                         '254740', '254741', '254742', '254743', '254744', '254745', '254746', '254747', '254748', '254749',
-                         '254750', '254751', '254752', '254753', '254754', '254755', '254756', '254757', '254758', '254759',
-                         '254768', '254769', '254790', '254791', '254792', '254793', '254794', '254795', '254796', '254797', '254798', '254799']
-        
-        if not any(phone.startswith(prefix) for prefix in valid_prefixes):
+        phone = to_msisdn(phone_number)
+
+        if not is_safaricom(phone):
             logger.warning(f"⚠️ Phone number may not be a valid Kenyan mobile: {phone}")
-        
-        logger.info(f"📱 Formatted phone number: {phone}")
+
+        logger.debug(f"📱 Formatted phone number: {phone}")
         return phone
-        
+
     except Exception as e:
         logger.error(f"❌ Error formatting phone number {phone_number}: {str(e)}")
         raise ValueError(f"Invalid phone number: {phone_number}")
@@ -148,6 +145,8 @@ def initiate_stk_push(phone_number, amount, account_reference, transaction_desc,
     Returns:
         dict: Response from M-Pesa API
     """
+    import requests
+    
     try:
         logger.info(f"🚀 Initiating STK push: Phone={phone_number}, Amount={amount}, Type={transaction_type}")
         
@@ -246,7 +245,7 @@ def initiate_stk_push(phone_number, amount, account_reference, transaction_desc,
         
         logger.info(f"📤 STK push payload: {json.dumps(payload, indent=2)}")
         
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
+        response = get_http_session().post(url, json=payload, headers=headers, timeout=current_app.config['MPESA_REQUEST_TIMEOUT'])
         response.raise_for_status()
         
         result = response.json()
@@ -425,6 +424,11 @@ def process_contribution_payment(payment_status, amount, mpesa_receipt):
         
         db.session.add(contribution)
         
+        # Post the money movements to the ledger
+        ledger.record_contribution(contribution)
+        if amount > expected_amount:
+            ledger.record_overpayment(overpayment)
+        
         # Link contribution to payment status
         payment_status.contribution_id = contribution.id
         
@@ -462,50 +466,22 @@ def process_loan_repayment_payment(payment_status, amount, mpesa_receipt):
             logger.error(f"❌ User not found: {payment_status.user_id}")
             return {"success": False, "error": "User not found"}
         
-        # Calculate remaining balance
-        remaining_balance = loan.unpaid_balance or (loan.amount_due - loan.paid_amount)
-        
-        # Check for overpayment
-        if amount > remaining_balance:
-            overpayment_amount = amount - remaining_balance
-            
-            # Create overpayment record
-            overpayment = Overpayment(
-                user_id=user.id,
-                original_payment_type='loan_payment',
-                expected_amount=remaining_balance,
-                actual_amount=amount,
-                overpayment_amount=overpayment_amount,
-                remaining_amount=overpayment_amount
-            )
-            db.session.add(overpayment)
-            
-            # Use only remaining balance for loan payment
-            payment_amount = remaining_balance
-            logger.info(f"⚠️ Loan overpayment detected: {overpayment_amount} KES")
-        else:
-            payment_amount = amount
-        
-        # Create loan payment record
-        loan_payment = LoanPayment(
-            loan_id=loan.id,
-            amount=payment_amount,
+        # Lock the loan and apply the payment with atomic balance updates
+        ledger_result = apply_loan_payment(
+            loan.id, amount,
             payment_method='mpesa',
-            transaction_id=mpesa_receipt
+            transaction_id=mpesa_receipt,
+            require_status=None
         )
+        payment_amount = ledger_result.applied_amount
+        overpayment_amount = ledger_result.overpayment_amount
+        loan_payment = ledger_result.payment
         
-        db.session.add(loan_payment)
-        
-        # Update loan
-        loan.paid_amount += payment_amount
-        loan.unpaid_balance = max(0, loan.unpaid_balance - payment_amount)
-        
-        if loan.unpaid_balance <= 0:
-            loan.status = 'paid'
-            loan.paid_date = datetime.utcnow()
+        if overpayment_amount > 0:
+            logger.info(f"⚠️ Loan overpayment detected: {overpayment_amount} KES")
         
         # Link payment to payment status
-        payment_status.loan_payment_id = loan_payment.id
+        payment_status.loan_payment_id = loan_payment.id if loan_payment else None
         
         db.session.commit()
         
@@ -514,12 +490,12 @@ def process_loan_repayment_payment(payment_status, amount, mpesa_receipt):
         result = {
             "success": True,
             "message": f"Loan payment of KES {payment_amount} processed successfully",
-            "loan_payment_id": loan_payment.id,
+            "loan_payment_id": loan_payment.id if loan_payment else None,
             "remaining_balance": loan.unpaid_balance,
             "loan_status": loan.status
         }
         
-        if amount > remaining_balance:
+        if overpayment_amount > 0:
             result["overpayment_amount"] = overpayment_amount
             result["message"] += f". Overpayment of KES {overpayment_amount} recorded."
         
@@ -0,0 +1,95 @@
+# app/services/db_pool.py
+import logging
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Checkouts that waited longer than this are counted as slow
+SLOW_CHECKOUT_SECONDS = 0.1
+
+class MonitoredQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a connection
+
+    The numbers are per process; with several workers, each reports its own pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.wait_stats = {'checkouts': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'slow_checkouts': 0, 'timeouts': 0}
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.wait_stats['timeouts'] += 1
+            logger.warning(f"⏳ Database pool exhausted: no connection within {self._timeout}s ({self.status()})")
+            raise
+
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            stats = self.wait_stats
+            stats['checkouts'] += 1
+            stats['wait_seconds'] += waited
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+            if waited >= SLOW_CHECKOUT_SECONDS:
+                stats['slow_checkouts'] += 1
+        return connection
+
+    def recreate(self):
+        # Called on engine.dispose(); keep the same subclass and settings
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+def pool_stats(engine):
+    """Current size, usage and checkout wait times of an engine's pool"""
+    pool = engine.pool
+    stats = {'pool_class': type(pool).__name__, 'status': pool.status()}
+
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        stats.update({
+            'size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': pool.overflow(),
+            'saturation': round(pool.checkedout() / capacity, 3) if capacity else None
+        })
+
+    wait_stats = getattr(pool, 'wait_stats', None)
+    if wait_stats is not None:
+        checkouts = wait_stats['checkouts']
+        stats.update({
+            'checkouts': checkouts,
+            'avg_wait_ms': round(wait_stats['wait_seconds'] / checkouts * 1000, 3) if checkouts else 0.0,
+            'max_wait_ms': round(wait_stats['max_wait_seconds'] * 1000, 3),
+            'slow_checkouts': wait_stats['slow_checkouts'],
+            'timeouts': wait_stats['timeouts']
+        })
+
+    return stats
+
+def check_database(engine):
+    """
+    Run a trivial query and time it
+
+    Returns:
+        tuple: (ok, latency in ms, error message or None)
+    """
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql('SELECT 1')
+        return True, round((time.perf_counter() - started) * 1000, 2), None
+    except exc.SQLAlchemyError as e:
+        logger.error(f"❌ Database health check failed: {str(e)}")
+        return False, round((time.perf_counter() - started) * 1000, 2), str(getattr(e, 'orig', e))
@@ -0,0 +1,133 @@
+# app/services/exports.py
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from ..models import db
+from ..models.user import User
+from ..models.contribution import Contribution
+from ..models.loan import Loan, LoanPayment
+from ..models.payment_status import PaymentStatus
+from ..models.admin_log import AdminActivityLog
+
+# Rows fetched per server-side cursor round trip, and rows encoded per chunk
+EXPORT_BATCH_SIZE = 1000
+
+def _export_datasets():
+    """Column selection, joins and date column for each exportable dataset"""
+    return {
+        'contributions': {
+            'columns': [
+                Contribution.id, Contribution.user_id, User.username, Contribution.amount,
+                Contribution.month, Contribution.payment_method, Contribution.transaction_id,
+                Contribution.created_at
+            ],
+            'joins': [(User, User.id == Contribution.user_id)],
+            'date_column': Contribution.created_at,
+            'order_by': Contribution.id,
+        },
+        'loans': {
+            'columns': [
+                Loan.id, Loan.user_id, User.username, Loan.amount, Loan.interest_rate, Loan.status,
+                Loan.amount_due, Loan.paid_amount, Loan.unpaid_balance, Loan.borrowed_date,
+                Loan.due_date, Loan.paid_date, Loan.created_at
+            ],
+            'joins': [(User, User.id == Loan.user_id)],
+            'date_column': Loan.created_at,
+            'order_by': Loan.id,
+        },
+        'loan-payments': {
+            'columns': [
+                LoanPayment.id, LoanPayment.loan_id, Loan.user_id, LoanPayment.amount,
+                LoanPayment.payment_date, LoanPayment.payment_method, LoanPayment.transaction_id,
+                LoanPayment.created_at
+            ],
+            'joins': [(Loan, Loan.id == LoanPayment.loan_id)],
+            'date_column': LoanPayment.payment_date,
+            'order_by': LoanPayment.id,
+        },
+        'payments': {
+            'columns': [
+                PaymentStatus.id, PaymentStatus.checkout_request_id, PaymentStatus.merchant_request_id,
+                PaymentStatus.user_id, PaymentStatus.transaction_type, PaymentStatus.amount,
+                PaymentStatus.phone_number, PaymentStatus.status, PaymentStatus.mpesa_receipt_number,
+                PaymentStatus.failure_reason, PaymentStatus.contribution_id, PaymentStatus.loan_payment_id,
+                PaymentStatus.loan_id, PaymentStatus.created_at, PaymentStatus.completed_at
+            ],
+            'joins': [],
+            'date_column': PaymentStatus.created_at,
+            'order_by': PaymentStatus.id,
+        },
+        'activity-logs': {
+            'columns': [
+                AdminActivityLog.id, AdminActivityLog.admin_id, AdminActivityLog.action,
+                AdminActivityLog.target_type, AdminActivityLog.target_id, AdminActivityLog.target_name,
+                AdminActivityLog.description, AdminActivityLog.old_values, AdminActivityLog.new_values,
+                AdminActivityLog.ip_address, AdminActivityLog.created_at
+            ],
+            'joins': [],
+            'date_column': AdminActivityLog.created_at,
+            'order_by': AdminActivityLog.id,
+        },
+    }
+
+EXPORT_DATASETS = tuple(_export_datasets())
+
+def export_columns(dataset):
+    """Header names for a dataset"""
+    return [column.key for column in _export_datasets()[dataset]['columns']]
+
+def iter_export_rows(dataset, start=None, end=None):
+    """
+    Yield export rows as tuples, streamed from a server-side cursor
+
+    Only plain columns are selected, so no ORM objects accumulate in the session
+    and memory stays flat however large the table is.
+    """
+    spec = _export_datasets()[dataset]
+    query = db.select(*spec['columns'])
+    for target, condition in spec['joins']:
+        query = query.outerjoin(target, condition)
+    if start:
+        query = query.where(spec['date_column'] >= start)
+    if end:
+        query = query.where(spec['date_column'] < end)
+    query = query.order_by(spec['order_by']).execution_options(
+        stream_results=True, yield_per=EXPORT_BATCH_SIZE
+    )
+
+    for row in db.session.execute(query):
+        yield tuple(row)
+
+def _format_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def encode_csv(columns, rows):
+    """Encode rows as CSV, one chunk per EXPORT_BATCH_SIZE rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_format_value(value) for value in row])
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode('utf-8')
+
+def encode_ndjson(columns, rows):
+    """Encode rows as newline-delimited JSON objects"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, (_format_value(value) for value in row)))))
+        if len(lines) == EXPORT_BATCH_SIZE:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
@@ -0,0 +1,397 @@
+# app/services/ledger.py
+import logging
+import uuid
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from ..models import db
+from ..models.contribution import Contribution
+from ..models.investment import ExternalInvestment
+from ..models.ledger import LedgerEntry, LedgerSnapshot
+from ..models.loan import Loan, LoanPayment
+from ..models.overpayment import Overpayment
+
+logger = logging.getLogger(__name__)
+
+# Fund-wide accounts
+FUND_CASH = 'fund_cash'
+INTEREST_INCOME = 'interest_income'
+EXTERNAL_INVESTMENTS = 'external_investments'
+
+# Account kinds whose natural balance is a credit (what the fund owes or has earned)
+CREDIT_NORMAL = {'member_savings', 'overpayment_suspense', 'interest_income'}
+
+# A month is snapshotted only once it has been over for this long, so postings
+# still in flight at the month boundary land before the snapshot is taken
+SNAPSHOT_DELAY = timedelta(hours=1)
+
+class LedgerError(ValueError):
+    """Raised when a posting doesn't balance"""
+
+def member_savings(user_id):
+    return f"member_savings:{user_id}"
+
+def loan_receivable(loan_id):
+    return f"loan_receivable:{loan_id}"
+
+def overpayment_suspense(user_id):
+    return f"overpayment_suspense:{user_id}"
+
+def account_kind(account):
+    return account.split(':', 1)[0]
+
+def _natural(account, amount):
+    """Debit-positive amount in the account's natural sign"""
+    return -amount if account_kind(account) in CREDIT_NORMAL else amount
+
+def post(entry_type, legs, user_id=None, source=None, description=None, created_by=None, created_at=None):
+    """
+    Add a balanced posting to the current transaction
+
+    Args:
+        entry_type: What kind of money movement this is ('contribution', 'loan_payment', ...)
+        legs: (account, amount) pairs; debits positive, credits negative
+        source: Optional (source_type, source_id) of the row that caused the posting
+
+    Returns:
+        str: The posting's transaction_ref, or None if every leg was zero
+
+    Raises:
+        LedgerError: If the legs don't add up to zero
+    """
+    legs = [(account, round(amount, 2)) for account, amount in legs if round(amount or 0, 2) != 0]
+    if not legs:
+        return None
+    if abs(sum(amount for _, amount in legs)) >= 0.005:
+        raise LedgerError(f"Unbalanced {entry_type} posting: {legs}")
+
+    transaction_ref = uuid.uuid4().hex
+    source_type, source_id = source or (None, None)
+    created_at = created_at or datetime.utcnow()
+    db.session.add_all([
+        LedgerEntry(
+            transaction_ref=transaction_ref,
+            account=account,
+            amount=amount,
+            entry_type=entry_type,
+            user_id=user_id,
+            source_type=source_type,
+            source_id=source_id,
+            description=description,
+            created_by=created_by,
+            created_at=created_at
+        )
+        for account, amount in legs
+    ])
+    return transaction_ref
+
+# ============= POSTINGS FOR EACH MONEY PATH =============
+
+def _flushed_id(obj):
+    if obj.id is None:
+        db.session.flush()
+    return obj.id
+
+def record_contribution(contribution, created_by=None, created_at=None):
+    """Member paid a contribution into the fund"""
+    return post(
+        'contribution',
+        [(FUND_CASH, contribution.amount), (member_savings(contribution.user_id), -contribution.amount)],
+        user_id=contribution.user_id,
+        source=('contribution', _flushed_id(contribution)),
+        description=f"Contribution for {contribution.month:%Y-%m}" if contribution.month else None,
+        created_by=created_by,
+        created_at=created_at
+    )
+
+def record_overpayment(overpayment, created_by=None, created_at=None):
+    """Money received above what was due, held until an admin allocates it"""
+    return post(
+        'overpayment',
+        [(FUND_CASH, overpayment.overpayment_amount),
+         (overpayment_suspense(overpayment.user_id), -overpayment.overpayment_amount)],
+        user_id=overpayment.user_id,
+        source=('overpayment', _flushed_id(overpayment)),
+        description=f"Overpayment on {overpayment.original_payment_type}",
+        created_by=created_by,
+        created_at=created_at
+    )
+
+def record_loan_disbursement(loan_id, user_id, principal, amount_due, created_by=None, created_at=None):
+    """Loan approved: principal leaves the fund and the interest is booked as income"""
+    return post(
+        'loan_disbursement',
+        [(loan_receivable(loan_id), amount_due), (FUND_CASH, -principal), (INTEREST_INCOME, principal - amount_due)],
+        user_id=user_id,
+        source=('loan', loan_id),
+        description=f"Loan #{loan_id} disbursed",
+        created_by=created_by,
+        created_at=created_at
+    )
+
+def record_loan_payment(payment, user_id, from_account=FUND_CASH, created_by=None, created_at=None):
+    """Repayment against a loan, in cash or out of the member's overpayment suspense"""
+    return post(
+        'loan_payment',
+        [(from_account, payment.amount), (loan_receivable(payment.loan_id), -payment.amount)],
+        user_id=user_id,
+        source=('loan_payment', _flushed_id(payment)),
+        description=f"Payment on loan #{payment.loan_id}",
+        created_by=created_by,
+        created_at=created_at
+    )
+
+def record_loan_adjustment(loan_id, user_id, delta, created_by=None, created_at=None):
+    """Admin changed what a member owes; the difference is booked against interest income"""
+    return post(
+        'loan_adjustment',
+        [(loan_receivable(loan_id), delta), (INTEREST_INCOME, -delta)],
+        user_id=user_id,
+        source=('loan', loan_id),
+        description=f"Loan #{loan_id} balance adjusted by {delta}",
+        created_by=created_by,
+        created_at=created_at
+    )
+
+def record_overpayment_to_contribution(overpayment, amount, created_by=None, created_at=None):
+    """Overpayment moved into the member's savings as prepaid contributions"""
+    return post(
+        'overpayment_allocation',
+        [(overpayment_suspense(overpayment.user_id), amount), (member_savings(overpayment.user_id), -amount)],
+        user_id=overpayment.user_id,
+        source=('overpayment', _flushed_id(overpayment)),
+        description="Overpayment allocated to future contributions",
+        created_by=created_by,
+        created_at=created_at
+    )
+
+def record_investment(investment, created_by=None, created_at=None):
+    """Fund cash placed in an external investment"""
+    return post(
+        'investment',
+        [(EXTERNAL_INVESTMENTS, investment.amount), (FUND_CASH, -investment.amount)],
+        source=('investment', _flushed_id(investment)),
+        description=(investment.description or '')[:255] or None,
+        created_by=created_by,
+        created_at=created_at
+    )
+
+# ============= BALANCES =============
+
+def _month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0) if isinstance(value, datetime) \
+        else datetime(value.year, value.month, 1)
+
+def _latest_snapshot_period():
+    return db.session.scalar(db.select(db.func.max(LedgerSnapshot.period)))
+
+def _tail_start(period):
+    """First instant not covered by the snapshot for `period`"""
+    return datetime(period.year, period.month, 1) + relativedelta(months=1)
+
+def account_balances(accounts=None, kind=None):
+    """
+    Current balances in each account's natural sign (savings and suspense positive)
+
+    Reads the latest month-end snapshot and adds only the entries created since,
+    instead of summing the account's whole history.
+
+    Args:
+        accounts: Only these accounts
+        kind: Only accounts of this kind ('member_savings', 'loan_receivable', ...)
+
+    Returns:
+        dict: account -> balance, omitting accounts that are at zero
+    """
+    def scoped(query, column):
+        if accounts is not None:
+            query = query.where(column.in_(list(accounts)))
+        if kind is not None:
+            query = query.where(db.or_(column == kind, column.like(f"{kind}:%")))
+        return query
+
+    balances = {}
+    period = _latest_snapshot_period()
+    tail = scoped(
+        db.select(LedgerEntry.account, db.func.sum(LedgerEntry.amount)).group_by(LedgerEntry.account),
+        LedgerEntry.account
+    )
+
+    if period is not None:
+        snapshot_rows = db.session.execute(scoped(
+            db.select(LedgerSnapshot.account, LedgerSnapshot.balance).where(LedgerSnapshot.period == period),
+            LedgerSnapshot.account
+        ))
+        balances.update(snapshot_rows.all())
+        tail = tail.where(LedgerEntry.created_at >= _tail_start(period))
+
+    for account, amount in db.session.execute(tail).tuples():
+        balances[account] = balances.get(account, 0) + amount
+
+    return {
+        account: round(_natural(account, amount), 2) + 0.0
+        for account, amount in balances.items() if round(amount, 2) != 0
+    }
+
+def account_balance(account):
+    """Current balance of one account in its natural sign"""
+    return account_balances(accounts=[account]).get(account, 0.0)
+
+def trial_balance():
+    """
+    Total balance per account kind
+
+    Cash, loans receivable and investments together always equal member
+    savings, overpayment suspense and interest income.
+    """
+    totals = {}
+    for account, balance in account_balances().items():
+        kind = account_kind(account)
+        totals[kind] = round(totals.get(kind, 0) + balance, 2) + 0.0
+    return totals
+
+# ============= MONTHLY SNAPSHOTS =============
+
+def snapshot_month(period):
+    """
+    Write closing balances for the month starting at `period`
+
+    Each balance is the previous month's snapshot plus this month's entries.
+    Accounts closing at zero with no activity are left out; a missing row means
+    a zero balance.
+
+    Returns:
+        int: Number of snapshot rows written
+    """
+    period = _month_start(period).date()
+    start = datetime(period.year, period.month, 1)
+    end = _tail_start(period)
+    previous = (start - relativedelta(months=1)).date()
+
+    balances = dict(db.session.execute(
+        db.select(LedgerSnapshot.account, LedgerSnapshot.balance).where(LedgerSnapshot.period == previous)
+    ).all())
+    counts = {}
+
+    month_totals = db.session.execute(
+        db.select(LedgerEntry.account, db.func.sum(LedgerEntry.amount), db.func.count())
+        .where(LedgerEntry.created_at >= start, LedgerEntry.created_at < end)
+        .group_by(LedgerEntry.account)
+    )
+    for account, amount, count in month_totals:
+        balances[account] = balances.get(account, 0) + amount
+        counts[account] = count
+
+    rows = [
+        {'account': account, 'period': period, 'balance': round(balance, 2),
+         'entry_count': counts.get(account, 0), 'created_at': datetime.utcnow()}
+        for account, balance in balances.items()
+        if round(balance, 2) != 0 or counts.get(account)
+    ]
+    db.session.execute(db.delete(LedgerSnapshot).where(LedgerSnapshot.period == period))
+    if rows:
+        db.session.execute(db.insert(LedgerSnapshot), rows)
+    return len(rows)
+
+def close_months(now=None):
+    """
+    Snapshot every finished month that doesn't have a snapshot yet, then commit
+
+    Safe to run as often as you like (e.g. daily from cron); it does nothing
+    until a month has ended.
+
+    Returns:
+        list: Periods (first day of month) that were snapshotted
+    """
+    now = now or datetime.utcnow()
+    open_month = _month_start(now - SNAPSHOT_DELAY).date()
+
+    last = _latest_snapshot_period()
+    if last is not None:
+        period = (datetime(last.year, last.month, 1) + relativedelta(months=1)).date()
+    else:
+        first_entry = db.session.scalar(db.select(db.func.min(LedgerEntry.created_at)))
+        if first_entry is None:
+            return []
+        period = _month_start(first_entry).date()
+
+    closed = []
+    while period < open_month:
+        rows = snapshot_month(period)
+        closed.append(period)
+        logger.info(f"📒 Ledger snapshot for {period:%Y-%m}: {rows} accounts")
+        period = (datetime(period.year, period.month, 1) + relativedelta(months=1)).date()
+
+    db.session.commit()
+    return closed
+
+# ============= BACKFILL =============
+
+def backfill_ledger():
+    """
+    Post the existing history of contributions, loans, payments, overpayments and
+    investments into an empty ledger, dated when each of them happened
+
+    Loan balances that admins edited by hand are brought in line with a final
+    adjustment per loan. Does nothing if the ledger already has entries.
+
+    Returns:
+        int: Number of postings made
+    """
+    if db.session.scalar(db.select(LedgerEntry.id).limit(1)) is not None:
+        logger.info("📒 Ledger already has entries; skipping backfill")
+        return 0
+
+    postings = 0
+
+    for contribution in Contribution.query.order_by(Contribution.id).yield_per(500):
+        postings += bool(record_contribution(contribution, created_at=contribution.created_at))
+
+    for overpayment in Overpayment.query.order_by(Overpayment.id).yield_per(500):
+        postings += bool(record_overpayment(overpayment, created_at=overpayment.created_at))
+        if overpayment.allocation_type == 'future_contribution' and overpayment.allocated_amount:
+            postings += bool(record_overpayment_to_contribution(
+                overpayment, overpayment.allocated_amount,
+                created_by=overpayment.admin_id, created_at=overpayment.allocated_at
+            ))
+
+    for investment in ExternalInvestment.query.order_by(ExternalInvestment.id).yield_per(500):
+        postings += bool(record_investment(investment, created_by=investment.admin_id, created_at=investment.created_at))
+
+    loans = Loan.query.filter(Loan.status.in_(['approved', 'paid'])).order_by(Loan.id).all()
+    for loan in loans:
+        postings += bool(record_loan_disbursement(
+            loan.id, loan.user_id, loan.amount, loan.amount_due or loan.amount,
+            created_at=loan.borrowed_date or loan.created_at
+        ))
+
+        paid = 0
+        for payment in loan.payments.order_by(LoanPayment.id):
+            from_account = overpayment_suspense(loan.user_id) if payment.payment_method == 'overpayment' else FUND_CASH
+            postings += bool(record_loan_payment(payment, loan.user_id, from_account, created_at=payment.payment_date))
+            paid += payment.amount
+
+        # Allocations made before they were recorded as loan payments
+        allocations = Overpayment.query.filter_by(allocation_type='loan_payment', allocation_target_id=loan.id).all()
+        for overpayment in allocations:
+            if not loan.payments.filter_by(transaction_id=f"OVERPAYMENT-{overpayment.id}").count():
+                postings += bool(post(
+                    'loan_payment',
+                    [(overpayment_suspense(loan.user_id), overpayment.allocated_amount),
+                     (loan_receivable(loan.id), -overpayment.allocated_amount)],
+                    user_id=loan.user_id,
+                    source=('overpayment', overpayment.id),
+                    description=f"Overpayment allocated to loan #{loan.id}",
+                    created_by=overpayment.admin_id,
+                    created_at=overpayment.allocated_at
+                ))
+                paid += overpayment.allocated_amount or 0
+
+        unpaid = loan.unpaid_balance if loan.unpaid_balance is not None else (loan.amount_due or 0) - (loan.paid_amount or 0)
+        delta = round(unpaid - ((loan.amount_due or loan.amount) - paid), 2)
+        postings += bool(record_loan_adjustment(loan.id, loan.user_id, delta))
+
+    db.session.commit()
+    logger.info(f"📒 Ledger backfilled with {postings} postings")
+    return postings
@@ -0,0 +1,199 @@
+# app/services/loan_ledger.py
+import logging
+import random
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy.exc import DBAPIError
+
+from ..models import db
+from ..models.loan import Loan, LoanPayment
+from ..models.overpayment import Overpayment
+from . import ledger
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL: serialization failure, deadlock detected, lock not available
+RETRYABLE_PGCODES = {'40001', '40P01', '55P03'}
+
+LoanPaymentResult = namedtuple(
+    'LoanPaymentResult', ['loan', 'payment', 'applied_amount', 'overpayment_amount', 'overpayment']
+)
+
+class LoanPaymentError(ValueError):
+    """Raised when a payment can't be applied to a loan"""
+
+def lock_row(model, pk):
+    """
+    Load a row and keep it locked against other writers until the transaction ends
+
+    PostgreSQL takes a row lock with SELECT ... FOR UPDATE. SQLite has no row
+    locks, so a no-op UPDATE takes the database write lock first; other writers
+    then wait for our commit, and the read below sees the latest committed row.
+    """
+    conn = db.session.connection()
+    if conn.dialect.name == 'sqlite':
+        table = model.__table__
+        conn.execute(db.update(table).where(table.c.id == pk).values(id=table.c.id))
+
+    return db.session.execute(
+        db.select(model).where(model.id == pk).with_for_update()
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+
+def outstanding_balance(loan):
+    if loan.unpaid_balance is not None:
+        return loan.unpaid_balance
+    return (loan.amount_due or 0) - (loan.paid_amount or 0)
+
+def apply_loan_payment(loan_id, amount, payment_method='mpesa', transaction_id=None,
+                       record_overpayment=True, require_status='approved',
+                       source_account=ledger.FUND_CASH, created_by=None):
+    """
+    Apply a payment to a loan in the current transaction
+
+    The loan row is locked before its balance is read, and paid_amount and
+    unpaid_balance are updated with SQL increments rather than values computed
+    in Python, so concurrent payments can't overwrite each other. Anything above
+    the outstanding balance becomes an Overpayment when record_overpayment=True.
+    Both are posted to the ledger, the payment as coming from source_account.
+    Nothing is committed: the caller commits or rolls back the whole unit.
+
+    Returns:
+        LoanPaymentResult
+
+    Raises:
+        LoanPaymentError: If the amount isn't positive or the loan can't take payments
+    """
+    if amount is None or amount <= 0:
+        raise LoanPaymentError("Payment amount must be greater than zero")
+
+    loan = lock_row(Loan, loan_id)
+    if not loan:
+        raise LoanPaymentError("Loan not found")
+    if require_status and loan.status != require_status:
+        raise LoanPaymentError(f"Can only add payments to {require_status} loans")
+
+    now = datetime.utcnow()
+    balance = outstanding_balance(loan)
+    applied_amount = min(amount, max(balance, 0))
+    overpayment_amount = amount - applied_amount
+
+    payment = None
+    if applied_amount > 0:
+        payment = LoanPayment(
+            loan_id=loan.id,
+            amount=applied_amount,
+            payment_date=now,
+            payment_method=payment_method,
+            transaction_id=transaction_id
+        )
+        db.session.add(payment)
+
+        loan.paid_amount = db.func.coalesce(Loan.paid_amount, 0) + applied_amount
+        loan.unpaid_balance = db.func.coalesce(
+            Loan.unpaid_balance, Loan.amount_due - db.func.coalesce(Loan.paid_amount, 0)
+        ) - applied_amount
+        if applied_amount >= balance:
+            loan.status = 'paid'
+            loan.paid_date = now
+
+    overpayment = None
+    if overpayment_amount > 0 and record_overpayment:
+        overpayment = Overpayment(
+            user_id=loan.user_id,
+            original_payment_type='loan_payment',
+            expected_amount=max(balance, 0),
+            actual_amount=amount,
+            overpayment_amount=overpayment_amount,
+            remaining_amount=overpayment_amount
+        )
+        db.session.add(overpayment)
+
+    db.session.flush()
+    if overpayment is not None and payment is not None:
+        overpayment.original_payment_id = payment.id
+
+    if payment is not None:
+        ledger.record_loan_payment(payment, loan.user_id, source_account, created_by=created_by)
+    if overpayment is not None:
+        ledger.record_overpayment(overpayment, created_by=created_by)
+
+    return LoanPaymentResult(loan, payment, applied_amount, overpayment_amount, overpayment)
+
+def allocate_overpayment_to_loan(overpayment_id, loan_id, admin_id, notes=None):
+    """
+    Move an overpayment's remaining amount onto one of the member's loans
+
+    The overpayment is locked before the loan (payments only ever lock the
+    loan), so concurrent allocations can't spend the same remaining amount twice.
+
+    Returns:
+        float: Amount allocated
+
+    Raises:
+        LoanPaymentError: If the allocation isn't possible
+    """
+    overpayment = lock_row(Overpayment, overpayment_id)
+    if not overpayment or not overpayment.remaining_amount or overpayment.remaining_amount <= 0:
+        raise LoanPaymentError("No amount to allocate or loan is already fully paid")
+
+    loan = lock_row(Loan, loan_id)
+    if not loan or loan.user_id != overpayment.user_id:
+        raise LoanPaymentError("Invalid loan or loan doesn't belong to this user")
+    if loan.status != 'approved':
+        raise LoanPaymentError("Loan must be approved to receive payments")
+
+    allocation_amount = min(overpayment.remaining_amount, outstanding_balance(loan))
+    if allocation_amount <= 0:
+        raise LoanPaymentError("No amount to allocate or loan is already fully paid")
+
+    apply_loan_payment(
+        loan.id, allocation_amount,
+        payment_method='overpayment',
+        transaction_id=f"OVERPAYMENT-{overpayment.id}",
+        record_overpayment=False,
+        source_account=ledger.overpayment_suspense(overpayment.user_id),
+        created_by=admin_id
+    )
+
+    # The overpayment row is locked, so plain assignments are safe here
+    overpayment.allocation_type = 'loan_payment'
+    overpayment.allocation_target_id = loan.id
+    overpayment.allocated_amount = (overpayment.allocated_amount or 0) + allocation_amount
+    overpayment.remaining_amount -= allocation_amount
+    if overpayment.remaining_amount <= 0:
+        overpayment.status = 'allocated'
+    overpayment.admin_id = admin_id
+    overpayment.admin_notes = notes
+    overpayment.allocated_at = datetime.utcnow()
+    db.session.flush()
+
+    return allocation_amount
+
+def _is_retryable(error):
+    pgcode = getattr(error.orig, 'pgcode', None)
+    if pgcode in RETRYABLE_PGCODES:
+        return True
+    message = str(error.orig).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+def run_in_transaction(work, attempts=5):
+    """
+    Run work() and commit, retrying on lock timeouts, deadlocks and serialization failures
+
+    work() must do all of its reads and writes itself, since a retry starts
+    from a rolled-back session.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except DBAPIError as e:
+            db.session.rollback()
+            if attempt == attempts or not _is_retryable(e):
+                raise
+            logger.warning(f"🔁 Retrying transaction after conflict (attempt {attempt}): {str(e.orig)}")
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
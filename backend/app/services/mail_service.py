@@ -1,6 +1,12 @@
 from flask import current_app, render_template
-from flask_mail import Message
-from .. import mail
+
+def get_mail():
+    """The app's Flask-Mail state, set up on first use so processes that never send mail don't import it"""
+    state = current_app.extensions.get('mail')
+    if state is None:
+        from flask_mail import Mail
+        state = Mail().init_app(current_app)
+    return state
 
 def send_email(to, subject, template, **kwargs):
     """
@@ -12,13 +18,15 @@ def send_email(to, subject, template, **kwargs):
         template: Path to the email template
         **kwargs: Variables to pass to the template
     """
+    from flask_mail import Message
+    
     msg = Message(
         subject,
         recipients=[to],
         sender=current_app.config['MAIL_DEFAULT_SENDER']
     )
     msg.html = render_template(template, **kwargs)
-    mail.send(msg)
+    get_mail().send(msg)
 
 def send_otp_email(user, otp):
     """
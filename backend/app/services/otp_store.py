@@ -0,0 +1,165 @@
+# app/services/otp_store.py
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime
+
+from ..models import db
+from ..models.otp import OTP
+from .background import BackgroundWorker
+from .local_store import LocalSQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Results of OTPService.verify
+OTP_VALID = 'valid'
+OTP_MISSING = 'missing'      # Never issued, expired, used, or locked after too many attempts
+OTP_MISMATCH = 'mismatch'
+
+class MemoryOTPStore:
+    """OTP digests in this process's memory; only for a single worker"""
+
+    def __init__(self):
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    def put(self, user_id, digest, expires_at):
+        with self._lock:
+            self._codes[user_id] = [digest, expires_at, 0]
+
+    def check(self, user_id, digest, now, max_attempts):
+        with self._lock:
+            entry = self._codes.get(user_id)
+            if entry is None or entry[1] <= now:
+                self._codes.pop(user_id, None)
+                return OTP_MISSING
+            if hmac.compare_digest(entry[0], digest):
+                del self._codes[user_id]
+                return OTP_VALID
+            entry[2] += 1
+            if entry[2] >= max_attempts:
+                del self._codes[user_id]
+            return OTP_MISMATCH
+
+    def purge(self, now):
+        with self._lock:
+            for user_id in [user_id for user_id, entry in self._codes.items() if entry[1] <= now]:
+                del self._codes[user_id]
+
+class SQLiteOTPStore(LocalSQLiteStore):
+    """OTP digests in a SQLite file shared by the workers on one host"""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS otp_codes ("
+        "user_id INTEGER PRIMARY KEY, digest TEXT NOT NULL, expires_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0)",
+    )
+
+    def put(self, user_id, digest, expires_at):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO otp_codes (user_id, digest, expires_at, attempts) VALUES (?, ?, ?, 0)",
+                (user_id, digest, expires_at)
+            )
+
+    def check(self, user_id, digest, now, max_attempts):
+        with self.transaction() as conn:
+            row = conn.execute("SELECT digest, expires_at, attempts FROM otp_codes WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None or row[1] <= now:
+                conn.execute("DELETE FROM otp_codes WHERE user_id = ?", (user_id,))
+                return OTP_MISSING
+            if hmac.compare_digest(row[0], digest):
+                conn.execute("DELETE FROM otp_codes WHERE user_id = ?", (user_id,))
+                return OTP_VALID
+            if row[2] + 1 >= max_attempts:
+                conn.execute("DELETE FROM otp_codes WHERE user_id = ?", (user_id,))
+            else:
+                conn.execute("UPDATE otp_codes SET attempts = attempts + 1 WHERE user_id = ?", (user_id,))
+            return OTP_MISMATCH
+
+    def purge(self, now):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM otp_codes WHERE expires_at <= ?", (now,))
+
+class OTPService(BackgroundWorker):
+    """
+    Issue and verify one-time login codes without touching the main database
+
+    Only an HMAC of each code is stored, keyed with SECRET_KEY and bound to the
+    user, and it is compared in constant time. A code works once, expires after
+    OTP_TTL_SECONDS, and is discarded after OTP_MAX_ATTEMPTS wrong guesses.
+
+    A background thread purges expired codes and old rows left in the legacy
+    `otps` table every OTP_PURGE_INTERVAL seconds.
+
+    Configuration:
+        OTP_STORE: 'memory' (single worker) or 'sqlite' (shared by the workers on one host)
+        OTP_STORE_PATH: SQLite file for the shared store
+        OTP_TTL_SECONDS: How long a code stays valid
+        OTP_MAX_ATTEMPTS: Wrong guesses allowed per code
+        OTP_PURGE_INTERVAL: Seconds between purges; 0 disables the background thread
+    """
+
+    thread_name = 'otp-purge'
+    interval_config = 'OTP_PURGE_INTERVAL'
+    run_on_start = True
+
+    def __init__(self, app=None):
+        super().__init__()
+        self.store = MemoryOTPStore()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('OTP_STORE', 'memory')
+        app.config.setdefault('OTP_STORE_PATH', os.path.join(app.instance_path, 'otp_store.db'))
+        app.config.setdefault('OTP_TTL_SECONDS', 600)
+        app.config.setdefault('OTP_MAX_ATTEMPTS', 5)
+        app.config.setdefault('OTP_PURGE_INTERVAL', 3600)
+
+        self.app = app
+        store = app.config['OTP_STORE']
+        if store == 'sqlite':
+            self.store = SQLiteOTPStore(app.config['OTP_STORE_PATH'])
+        elif store == 'memory':
+            self.store = MemoryOTPStore()
+        else:
+            raise ValueError(f"Unknown OTP_STORE: {store}")
+        app.extensions['otp_service'] = self
+
+    def _digest(self, user_id, code):
+        key = self.app.config['SECRET_KEY'].encode('utf-8')
+        return hmac.new(key, f"{user_id}:{code}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def issue(self, user_id):
+        """Create a new code for a user, replacing any earlier one, and return it"""
+        self._ensure_thread()
+        code = f"{secrets.randbelow(10 ** 6):06d}"
+        self.store.put(user_id, self._digest(user_id, code), time.time() + self.app.config['OTP_TTL_SECONDS'])
+        return code
+
+    def verify(self, user_id, code):
+        """Check and consume a user's code; returns OTP_VALID, OTP_MISSING or OTP_MISMATCH"""
+        return self.store.check(
+            user_id, self._digest(user_id, str(code).strip()), time.time(), self.app.config['OTP_MAX_ATTEMPTS']
+        )
+
+    def purge(self):
+        """Drop expired codes and used or expired rows from the legacy otps table"""
+        self.store.purge(time.time())
+        with self.app.app_context():
+            deleted = OTP.query.filter(
+                db.or_(OTP.is_used.is_(True), OTP.expires_at < datetime.utcnow())
+            ).delete(synchronize_session=False)
+            db.session.commit()
+        if deleted:
+            logger.info(f"🧹 Purged {deleted} old rows from the otps table")
+        return deleted
+
+    def run_once(self):
+        self.purge()
+
+otp_service = OTPService()
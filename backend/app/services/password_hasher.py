@@ -0,0 +1,168 @@
+# app/services/password_hasher.py
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash, generate_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METHOD = f"pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}"
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool is full; the client should retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__("Too many sign-in attempts are being processed. Please try again shortly.")
+        self.retry_after = retry_after
+
+def normalize_method(method):
+    """Spell out default parameters so stored hashes can be compared with the configured method"""
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        digest = parts[1] if len(parts) > 1 and parts[1] else 'sha256'
+        iterations = int(parts[2]) if len(parts) > 2 and parts[2] else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{digest}:{iterations}"
+    if parts[0] == 'scrypt':
+        n, r, p = (int(value) if value else default for value, default in zip(parts[1:] + [''] * 3, (2 ** 15, 8, 1)))
+        return f"scrypt:{n}:{r}:{p}"
+    raise ValueError(f"Unsupported password hash method: {method}")
+
+def _scrypt(password, salt, method):
+    n, r, p = map(int, method.split(':')[1:4])
+    return hashlib.scrypt(
+        password.encode('utf-8'), salt=salt.encode('utf-8'), n=n, r=r, p=p, maxmem=132 * n * r * p, dklen=64
+    ).hex()
+
+def _generate(password, method):
+    if method.startswith('scrypt:'):
+        salt = secrets.token_urlsafe(12)[:16]
+        return f"{method}${salt}${_scrypt(password, salt, method)}"
+    return generate_password_hash(password, method=method)
+
+def _check(stored_hash, password):
+    method, _, rest = stored_hash.partition('$')
+    if method.startswith('scrypt:'):
+        salt, _, expected = rest.partition('$')
+        return hmac.compare_digest(_scrypt(password, salt, method), expected)
+    return check_password_hash(stored_hash, password)
+
+class PasswordHasher:
+    """
+    Hash and verify passwords on a bounded worker pool
+
+    PBKDF2 and scrypt release the GIL, so hashing runs in parallel on the pool
+    threads while request threads wait. Admission control caps the work in
+    flight at PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE; beyond that, or when
+    a result takes longer than PASSWORD_HASH_MAX_WAIT, PasswordHashingBusy is
+    raised so the route can answer 503 with Retry-After instead of piling up.
+
+    Configuration:
+        PASSWORD_HASH_METHOD: 'pbkdf2:sha256:<iterations>' or 'scrypt:<n>:<r>:<p>'
+        PASSWORD_HASH_WORKERS: Hashing threads (defaults to the CPU count)
+        PASSWORD_HASH_QUEUE: Hashes allowed to wait for a free thread
+        PASSWORD_HASH_MAX_WAIT: Seconds a request waits for its hash
+        PASSWORD_HASH_RETRY_AFTER: Retry-After seconds sent with 503s
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.method = DEFAULT_METHOD
+        self._executor = None
+        self._slots = None
+        self.stats = {'hashed': 0, 'rejected': 0, 'rehashed': 0}
+        self._stats_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 0)
+        app.config.setdefault('PASSWORD_HASH_QUEUE', None)
+        app.config.setdefault('PASSWORD_HASH_MAX_WAIT', 5.0)
+        app.config.setdefault('PASSWORD_HASH_RETRY_AFTER', 2)
+
+        self.app = app
+        self.method = normalize_method(app.config['PASSWORD_HASH_METHOD'])
+        workers = app.config['PASSWORD_HASH_WORKERS'] or os.cpu_count() or 1
+        queue = app.config['PASSWORD_HASH_QUEUE']
+        queue = workers * 8 if queue is None else queue
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        app.extensions['password_hasher'] = self
+        logger.info(f"🔑 Password hashing: {self.method} on {workers} threads (queue {queue})")
+
+    def _run(self, fn, *args):
+        if self._executor is None:  # No app configured (scripts, shell)
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            self._reject()
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            result = future.result(timeout=self.app.config['PASSWORD_HASH_MAX_WAIT'])
+        except FutureTimeout:
+            future.cancel()
+            self._reject()
+
+        with self._stats_lock:
+            self.stats['hashed'] += 1
+        return result
+
+    def _reject(self):
+        with self._stats_lock:
+            self.stats['rejected'] += 1
+        retry_after = self.app.config['PASSWORD_HASH_RETRY_AFTER']
+        logger.warning(f"🔑 Password hashing pool full; asking client to retry in {retry_after}s")
+        raise PasswordHashingBusy(retry_after)
+
+    def hash(self, password):
+        """Hash with the configured method"""
+        return self._run(_generate, password, self.method)
+
+    def verify(self, stored_hash, password):
+        """Check a password against a stored hash of any supported method"""
+        if not stored_hash:
+            return False
+        return self._run(_check, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """Whether a stored hash was made with a different method or cost than configured"""
+        method = stored_hash.partition('$')[0] if stored_hash else ''
+        try:
+            return normalize_method(method) != self.method
+        except (ValueError, IndexError):
+            return True
+
+    def verify_and_rehash(self, stored_hash, password):
+        """
+        Check a password and, if it matches an outdated hash, hash it again with the configured method
+
+        Returns:
+            tuple: (matches, new hash to store or None)
+        """
+        if not self.verify(stored_hash, password):
+            return False, None
+        if not self.needs_rehash(stored_hash):
+            return True, None
+
+        new_hash = self.hash(password)
+        with self._stats_lock:
+            self.stats['rehashed'] += 1
+        return True, new_hash
+
+password_hasher = PasswordHasher()
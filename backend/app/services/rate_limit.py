@@ -0,0 +1,210 @@
+# app/services/rate_limit.py
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from flask import g
+
+from .local_store import LocalSQLiteStore
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_RATE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$')
+
+# reset: seconds until the bucket is full again; retry_after: seconds until the next token (refused hits only)
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'reset', 'retry_after'])
+
+def parse_rate(rate):
+    """
+    Parse a rate such as '5/minute' or '3/10minutes'
+
+    Returns:
+        tuple: (bucket capacity, tokens refilled per second)
+    """
+    match = _RATE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate limit: {rate!r}")
+    count, multiplier, unit = match.groups()
+    period = int(multiplier or 1) * _PERIODS[unit]
+    return int(count), int(count) / period
+
+def _refill(tokens, updated_at, capacity, refill_rate, now):
+    return min(capacity, tokens + max(now - updated_at, 0) * refill_rate)
+
+def _seconds(value):
+    return max(1, int(value + 0.999))
+
+def _result(tokens, capacity, refill_rate):
+    """Take one token if there is one"""
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    reset = _seconds((capacity - tokens) / refill_rate)
+    retry_after = 0 if allowed else _seconds((1 - tokens) / refill_rate)
+    return tokens, RateLimitResult(allowed, capacity, int(tokens), reset, retry_after)
+
+class MemoryBuckets:
+    """Token buckets in this process's memory; limits apply per worker"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate, now):
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens, result = _result(_refill(tokens, updated_at, capacity, refill_rate, now), capacity, refill_rate)
+            self._buckets[key] = (tokens, now)
+        return result
+
+    def purge(self, now, max_idle):
+        """Forget buckets untouched for max_idle seconds (they would be full again)"""
+        with self._lock:
+            for key in [key for key, (_, updated_at) in self._buckets.items() if now - updated_at > max_idle]:
+                del self._buckets[key]
+
+class SQLiteBuckets(LocalSQLiteStore):
+    """Token buckets in a SQLite file, so limits hold across all workers on the host"""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_buckets_updated_at ON buckets (updated_at)",
+    )
+
+    def take(self, key, capacity, refill_rate, now):
+        with self.transaction() as conn:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated_at = row or (capacity, now)
+            tokens, result = _result(_refill(tokens, updated_at, capacity, refill_rate, now), capacity, refill_rate)
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now)
+            )
+        return result
+
+    def purge(self, now, max_idle):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM buckets WHERE updated_at < ?", (now - max_idle,))
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter
+
+    A bucket holds up to N tokens and refills at N per period; each hit takes
+    a token and is refused when none are left, so short bursts are allowed
+    but the sustained rate is capped. Views are limited per route group with
+    the @rate_limit decorator; routes in the same group share their buckets.
+
+    Allowed and refused requests are counted per group and per process.
+
+    Configuration:
+        RATE_LIMIT_ENABLED: Turn all limits off when False
+        RATE_LIMIT_STORAGE: 'memory' (per worker) or 'sqlite' (shared by the workers on one host)
+        RATE_LIMIT_STORAGE_PATH: SQLite file for the shared buckets
+    """
+
+    # Buckets idle this long are full again and can be dropped
+    MAX_IDLE_SECONDS = 86400
+
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = MemoryBuckets()
+        self._hits = 0
+        self._metrics = defaultdict(lambda: defaultdict(int))
+        self._metrics_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMIT_STORAGE', 'memory')
+        app.config.setdefault('RATE_LIMIT_STORAGE_PATH', os.path.join(app.instance_path, 'rate_limits.db'))
+
+        self.app = app
+        storage = app.config['RATE_LIMIT_STORAGE']
+        if storage == 'sqlite':
+            self.backend = SQLiteBuckets(app.config['RATE_LIMIT_STORAGE_PATH'])
+        elif storage == 'memory':
+            self.backend = MemoryBuckets()
+        else:
+            raise ValueError(f"Unknown RATE_LIMIT_STORAGE: {storage}")
+        app.extensions['rate_limiter'] = self
+
+        @app.after_request
+        def add_rate_limit_headers(response):
+            result = g.get('rate_limit')
+            if result is not None:
+                response.headers.update(self.headers(result))
+            return response
+
+    def hit(self, scope, identity, rate):
+        """Take a token from the `scope` bucket of `identity` (an IP address, user ID, ...)"""
+        capacity, refill_rate = parse_rate(rate)
+        if self.app is not None and not self.app.config['RATE_LIMIT_ENABLED']:
+            return RateLimitResult(True, capacity, capacity, 0, 0)
+
+        now = time.time()
+        result = self.backend.take(f"{scope}:{identity}", capacity, refill_rate, now)
+        if not result.allowed:
+            logger.warning(f"🚦 Rate limit {rate} hit for {scope} by {identity}")
+
+        self._hits += 1
+        if self._hits % 10000 == 0:
+            self.backend.purge(now, self.MAX_IDLE_SECONDS)
+        return result
+
+    def check(self, group, limits):
+        """
+        Take a token from each of a route group's buckets
+
+        Args:
+            group: Route group name
+            limits: (kind, identity, rate) tuples, e.g. ('ip', '10.0.0.1', '30/minute');
+                entries without an identity are skipped
+
+        Returns:
+            RateLimitResult: The refusal, or the allowed result with the fewest tokens left
+        """
+        tightest = None
+        for kind, identity, rate in limits:
+            if identity is None or not rate:
+                continue
+            result = self.hit(f"{group}:{kind}", identity, rate)
+            if not result.allowed:
+                self._count(group, f"rejected_{kind}")
+                return result
+            if tightest is None or result.remaining < tightest.remaining:
+                tightest = result
+
+        self._count(group, 'allowed')
+        return tightest
+
+    def _count(self, group, outcome):
+        with self._metrics_lock:
+            self._metrics[group][outcome] += 1
+
+    def stats(self):
+        """Allowed and refused requests per route group in this process"""
+        with self._metrics_lock:
+            return {
+                'storage': self.app.config['RATE_LIMIT_STORAGE'] if self.app else 'memory',
+                'groups': {group: dict(counts) for group, counts in self._metrics.items()}
+            }
+
+    @staticmethod
+    def headers(result):
+        headers = {
+            'X-RateLimit-Limit': str(result.limit),
+            'X-RateLimit-Remaining': str(result.remaining),
+            'X-RateLimit-Reset': str(result.reset)
+        }
+        if not result.allowed:
+            headers['Retry-After'] = str(result.retry_after)
+        return headers
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,341 @@
+# app/services/reconciliation.py
+import csv
+import logging
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from ..models import db
+from ..models.c2b_transaction import C2BTransaction
+from ..models.contribution import Contribution
+from ..models.loan import LoanPayment
+from ..models.overpayment import Overpayment
+from ..models.payment_status import PaymentStatus
+
+logger = logging.getLogger(__name__)
+
+# Statement column names (lower-case, without dots) for each field we read, in order of preference
+STATEMENT_COLUMNS = {
+    'receipt': ('receipt no', 'receipt', 'transaction id', 'transid'),
+    'paid_in': ('paid in', 'amount', 'transamount'),
+    'status': ('transaction status', 'status'),
+    'completed_at': ('completion time', 'transaction time', 'transtime', 'date'),
+    'details': ('details', 'other party info'),
+}
+
+STATEMENT_TIME_FORMATS = ('%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%Y%m%d%H%M%S')
+
+# The portal's fixed-width formats are sliced instead; strptime alone would be half the run time
+SLICED_TIME_FORMATS = {'%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S'}
+
+# Amounts closer than this are equal (floats hold the recorded amounts)
+AMOUNT_TOLERANCE = 0.005
+
+# Statement rows scanned for the header line before giving up
+MAX_PREAMBLE_LINES = 50
+
+# Statement times and C2B TransTime are East Africa Time; everything we record is naive UTC
+MPESA_UTC_OFFSET = timedelta(hours=3)
+
+Recorded = namedtuple('Recorded', ['amount', 'source', 'record_id', 'recorded_at'])
+StatementEntry = namedtuple('StatementEntry', ['receipt', 'amount', 'completed_at', 'details'])
+
+class StatementError(ValueError):
+    """Raised when a statement file can't be read"""
+
+def _normalize_header(name):
+    return name.strip().lstrip('\ufeff').lower().replace('.', '').strip()
+
+def _find_columns(header):
+    names = [_normalize_header(name) for name in header]
+    columns = {}
+    for field, aliases in STATEMENT_COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names.index(alias)
+                break
+    if 'receipt' in columns and 'paid_in' in columns:
+        return columns
+    return None
+
+def _slice_day_first(value):
+    return datetime(int(value[6:10]), int(value[3:5]), int(value[:2]),
+                    int(value[11:13]), int(value[14:16]), int(value[17:19]))
+
+def _mpesa_time_to_utc(value):
+    """Naive UTC for an M-PESA timestamp: naive values are EAT, aware ones are converted"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value - MPESA_UTC_OFFSET
+
+def _parse_amount(value):
+    value = value.replace(',', '').strip()
+    return float(value) if value else 0.0
+
+class _TimeParser:
+    """Statement timestamps; remembers the first format that works so each row costs one parse"""
+
+    def __init__(self):
+        self.format = None
+
+    def __call__(self, value):
+        value = value.strip()
+        if not value:
+            return None
+        if self.format:
+            try:
+                if self.format in SLICED_TIME_FORMATS and len(value) == 19:
+                    return _slice_day_first(value)
+                return datetime.strptime(value, self.format)
+            except ValueError:
+                pass
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+        for time_format in STATEMENT_TIME_FORMATS:
+            try:
+                parsed = datetime.strptime(value, time_format)
+            except ValueError:
+                continue
+            self.format = time_format
+            return parsed
+        return None
+
+def iter_statement(lines, counts=None):
+    """
+    Stream the money-in entries of an M-PESA settlement statement CSV
+
+    `lines` is any iterable of text lines (an open file, an upload stream), read
+    one at a time. Lines before the header row (the portal's title block) are
+    skipped. Rows that aren't completed credits (withdrawals, charges, failed
+    transactions) are counted in counts['skipped'] but not yielded.
+
+    Raises:
+        StatementError: If no header row with a receipt and a paid-in column is found
+    """
+    counts = counts if counts is not None else {}
+    counts.setdefault('rows', 0)
+    counts.setdefault('skipped', 0)
+    reader = csv.reader(lines)
+
+    columns = None
+    for line_number, header in enumerate(reader, 1):
+        columns = _find_columns(header)
+        if columns or line_number >= MAX_PREAMBLE_LINES:
+            break
+    if not columns:
+        raise StatementError("No header row with a receipt number and a paid-in column found")
+
+    receipt_col, amount_col = columns['receipt'], columns['paid_in']
+    status_col = columns.get('status')
+    time_col = columns.get('completed_at')
+    details_col = columns.get('details')
+    width = max(columns.values()) + 1
+    parse_time = _TimeParser()
+
+    for row in reader:
+        counts['rows'] += 1
+        if len(row) < width:
+            counts['skipped'] += 1
+            continue
+        if status_col is not None and row[status_col].strip().lower() not in ('completed', 'success', ''):
+            counts['skipped'] += 1
+            continue
+        try:
+            amount = _parse_amount(row[amount_col])
+        except ValueError:
+            counts['skipped'] += 1
+            continue
+        receipt = row[receipt_col].strip().upper()
+        if amount <= 0 or not receipt:
+            counts['skipped'] += 1
+            continue
+
+        yield StatementEntry(
+            receipt,
+            amount,
+            parse_time(row[time_col]) if time_col is not None else None,
+            row[details_col].strip() if details_col is not None else None
+        )
+
+def _gross_sources():
+    """
+    What M-PESA told us it received per receipt: C2B confirmations and settled STK payments
+
+    Each row ends with our UTC record time and M-PESA's own (EAT) time, which wins when present.
+    """
+    return [
+        ('c2b_transaction', db.select(
+            C2BTransaction.trans_id, C2BTransaction.amount, C2BTransaction.id,
+            C2BTransaction.created_at, C2BTransaction.trans_time
+        )),
+        ('payment_status', db.select(
+            PaymentStatus.mpesa_receipt_number, PaymentStatus.amount, PaymentStatus.id,
+            db.func.coalesce(PaymentStatus.completed_at, PaymentStatus.created_at), db.null()
+        ).where(PaymentStatus.status == 'success', PaymentStatus.mpesa_receipt_number.isnot(None))),
+    ]
+
+def _posted_sources():
+    """What we posted per receipt, for receipts without a gross record: the rows plus their overpayments"""
+    return [
+        ('contribution', db.select(
+            Contribution.transaction_id, Contribution.amount, Contribution.id, Contribution.created_at
+        ).where(Contribution.payment_method == 'mpesa', Contribution.transaction_id.isnot(None))),
+        ('loan_payment', db.select(
+            LoanPayment.transaction_id, LoanPayment.amount, LoanPayment.id, LoanPayment.created_at
+        ).where(LoanPayment.payment_method == 'mpesa', LoanPayment.transaction_id.isnot(None))),
+        ('contribution', db.select(
+            Contribution.transaction_id, Overpayment.overpayment_amount, Contribution.id, Contribution.created_at
+        ).join(Overpayment, db.and_(
+            Overpayment.original_payment_type == 'contribution', Overpayment.original_payment_id == Contribution.id
+        )).where(Contribution.payment_method == 'mpesa', Contribution.transaction_id.isnot(None))),
+        ('loan_payment', db.select(
+            LoanPayment.transaction_id, Overpayment.overpayment_amount, LoanPayment.id, LoanPayment.created_at
+        ).join(Overpayment, db.and_(
+            Overpayment.original_payment_type == 'loan_payment', Overpayment.original_payment_id == LoanPayment.id
+        )).where(LoanPayment.payment_method == 'mpesa', LoanPayment.transaction_id.isnot(None))),
+    ]
+
+def load_recorded_receipts(chunk_size=5000):
+    """
+    Build the receipt -> Recorded hash table the statement is joined against
+
+    Every source is streamed `chunk_size` rows at a time. A receipt's amount is
+    the gross amount from its C2B confirmation or STK payment when we have one,
+    otherwise the sum of the contributions, loan payments and overpayments
+    posted under it. recorded_at is naive UTC.
+    """
+    recorded = {}
+    for source, query in _gross_sources():
+        for receipt, amount, record_id, recorded_at, mpesa_time in db.session.execute(query.execution_options(yield_per=chunk_size)):
+            if mpesa_time is not None:
+                recorded_at = _mpesa_time_to_utc(mpesa_time)
+            recorded.setdefault(receipt.strip().upper(), Recorded(amount or 0.0, source, record_id, recorded_at))
+
+    posted = {}
+    for source, query in _posted_sources():
+        for receipt, amount, record_id, recorded_at in db.session.execute(query.execution_options(yield_per=chunk_size)):
+            receipt = receipt.strip().upper()
+            if receipt in recorded:
+                continue
+            entry = posted.get(receipt)
+            if entry is None:
+                posted[receipt] = Recorded(amount or 0.0, source, record_id, recorded_at)
+            else:
+                posted[receipt] = entry._replace(amount=entry.amount + (amount or 0.0))
+
+    recorded.update(posted)
+    return recorded
+
+def reconcile_statement(lines, chunk_size=5000, max_items=1000):
+    """
+    Reconcile an M-PESA settlement statement against our payment records
+
+    Hash join in one pass over the statement: our receipts are loaded into a
+    dict first (see load_recorded_receipts), then each statement credit is
+    looked up as it is read, so time is linear in statement size plus the
+    number of our records, and memory grows only with our records. Credits
+    sharing a receipt are added together before amounts are compared.
+
+    The report counts every entry as matched, amount mismatch, missing in
+    system (on the statement, not recorded by us) or missing in statement
+    (recorded by us between the statement's first and last entry, absent from
+    it). Each list holds at most `max_items` entries; the counts are exact.
+    Statement times are reported as printed (EAT); the window is compared in
+    UTC, like recorded_at.
+
+    Raises:
+        StatementError: If the file isn't a statement CSV
+    """
+    recorded = load_recorded_receipts(chunk_size)
+    logger.info(f"🧾 Reconciling statement against {len(recorded)} recorded receipts")
+
+    counts = {}
+    statement_amounts = {}
+    missing_in_system = []
+    missing_in_system_count = 0
+    credits = 0
+    total = 0.0
+    first_at = last_at = None
+
+    for entry in iter_statement(lines, counts):
+        credits += 1
+        total += entry.amount
+        if entry.completed_at is not None:
+            if first_at is None or entry.completed_at < first_at:
+                first_at = entry.completed_at
+            if last_at is None or entry.completed_at > last_at:
+                last_at = entry.completed_at
+
+        if entry.receipt in recorded:
+            statement_amounts[entry.receipt] = statement_amounts.get(entry.receipt, 0.0) + entry.amount
+        else:
+            missing_in_system_count += 1
+            if len(missing_in_system) < max_items:
+                missing_in_system.append({
+                    'receipt': entry.receipt,
+                    'amount': entry.amount,
+                    'completed_at': entry.completed_at,
+                    'details': entry.details
+                })
+
+    matched = 0
+    matched_amount = 0.0
+    mismatches = []
+    mismatch_count = 0
+    for receipt, statement_amount in statement_amounts.items():
+        ours = recorded[receipt]
+        if abs(statement_amount - ours.amount) < AMOUNT_TOLERANCE:
+            matched += 1
+            matched_amount += statement_amount
+            continue
+        mismatch_count += 1
+        if len(mismatches) < max_items:
+            mismatches.append({
+                'receipt': receipt,
+                'statement_amount': statement_amount,
+                'recorded_amount': ours.amount,
+                'source': ours.source,
+                'record_id': ours.record_id
+            })
+
+    missing_in_statement = []
+    missing_in_statement_count = 0
+    if first_at is not None:
+        window_start, window_end = _mpesa_time_to_utc(first_at), _mpesa_time_to_utc(last_at)
+        for receipt, ours in recorded.items():
+            if receipt in statement_amounts or ours.recorded_at is None or not window_start <= ours.recorded_at <= window_end:
+                continue
+            missing_in_statement_count += 1
+            if len(missing_in_statement) < max_items:
+                missing_in_statement.append({
+                    'receipt': receipt,
+                    'recorded_amount': ours.amount,
+                    'source': ours.source,
+                    'record_id': ours.record_id,
+                    'recorded_at': ours.recorded_at
+                })
+
+    logger.info(f"✅ Reconciled {credits} credits: {matched} matched, {mismatch_count} amount mismatches, "
+                f"{missing_in_system_count} missing in system, {missing_in_statement_count} missing in statement")
+
+    return {
+        'statement': {
+            'rows': counts['rows'],
+            'credits': credits,
+            'skipped': counts['skipped'],
+            'total_paid_in': round(total, 2),
+            'from': first_at,
+            'to': last_at
+        },
+        'summary': {
+            'matched': matched,
+            'matched_amount': round(matched_amount, 2),
+            'amount_mismatches': mismatch_count,
+            'missing_in_system': missing_in_system_count,
+            'missing_in_statement': missing_in_statement_count
+        },
+        'amount_mismatches': mismatches,
+        'missing_in_system': missing_in_system,
+        'missing_in_statement': missing_in_statement
+    }
@@ -0,0 +1,151 @@
+# app/services/search_index.py
+import logging
+import re
+
+from ..models import db
+from ..models.user import User
+from ..models.admin_log import AdminActivityLog
+
+logger = logging.getLogger(__name__)
+
+# Indexed text per searchable table
+SEARCH_SOURCES = {
+    'users': {
+        'model': User,
+        'columns': ['first_name', 'last_name', 'username', 'email', 'phone_number'],
+    },
+    'admin_activity_logs': {
+        'model': AdminActivityLog,
+        'columns': ['target_name', 'description'],
+    },
+}
+
+# Engines whose search structures have been checked this process
+_ready_engines = set()
+
+def ensure_search_index(rebuild=False):
+    """
+    Create the full-text structures for the current database if missing
+
+    SQLite: an external-content FTS5 table per source, kept in step with the base
+    table by triggers, so every committed insert, update or delete (including
+    bulk Core inserts) updates the index in the same transaction.
+
+    PostgreSQL: a GIN index on a to_tsvector() expression per source, which the
+    database maintains itself.
+    """
+    engine = db.engine
+    if engine.url in _ready_engines and not rebuild:
+        return
+
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        for table, source in SEARCH_SOURCES.items():
+            if dialect == 'sqlite':
+                _ensure_sqlite_fts(conn, table, source['columns'], rebuild)
+            elif dialect == 'postgresql':
+                conn.execute(db.text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} "
+                    f"USING GIN ({_pg_document(source['columns'])})"
+                ))
+
+    _ready_engines.add(engine.url)
+    logger.info(f"🔎 Search index ready ({dialect})")
+
+def _ensure_sqlite_fts(conn, table, columns, rebuild):
+    fts_table = f"{table}_fts"
+    exists = conn.execute(
+        db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': fts_table}
+    ).first()
+
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"new.{column}" for column in columns)
+    old_values = ', '.join(f"old.{column}" for column in columns)
+
+    if not exists:
+        conn.execute(db.text(
+            f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+            f"{column_list}, content='{table}', content_rowid='id', tokenize='unicode61')"
+        ))
+        rebuild = True
+
+    conn.execute(db.text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+    ))
+    conn.execute(db.text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END"
+    ))
+    conn.execute(db.text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+    ))
+
+    if rebuild:
+        conn.execute(db.text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+
+def _pg_document(columns):
+    # Punctuation becomes whitespace so e-mail addresses and phone numbers split
+    # into the same terms the query tokenizer produces
+    text = " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+    return f"to_tsvector('simple', regexp_replace({text}, '[^[:alnum:]]+', ' ', 'g'))"
+
+def tokenize_query(query):
+    """Split a free-text query into lowercase word terms"""
+    return [term.lower() for term in re.findall(r'\w+', query or '')][:10]
+
+def search(table, query, limit=20):
+    """
+    Return IDs of rows in `table` matching every term of `query` as a prefix, best first
+
+    Falls back to LIKE matching on databases without a full-text engine.
+    """
+    terms = tokenize_query(query)
+    if not terms:
+        return []
+
+    source = SEARCH_SOURCES[table]
+    dialect = db.engine.dialect.name
+
+    if dialect == 'sqlite':
+        ensure_search_index()
+        match = ' '.join(f'"{term}"*' for term in terms)
+        statement = db.text(
+            f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH :match ORDER BY rank LIMIT :limit"
+        ).bindparams(match=match, limit=limit)
+    elif dialect == 'postgresql':
+        ensure_search_index()
+        document = _pg_document(source['columns'])
+        statement = db.text(
+            f"SELECT id FROM {table} WHERE {document} @@ to_tsquery('simple', :match) "
+            f"ORDER BY ts_rank({document}, to_tsquery('simple', :match)) DESC LIMIT :limit"
+        ).bindparams(match=' & '.join(f"{term}:*" for term in terms), limit=limit)
+    else:
+        model = source['model']
+        conditions = [
+            db.or_(*[getattr(model, column).ilike(f"%{term}%") for column in source['columns']])
+            for term in terms
+        ]
+        statement = db.select(model.id).where(*conditions).order_by(model.id.desc()).limit(limit)
+
+    return [row[0] for row in db.session.execute(statement)]
+
+def search_users(query, limit=20):
+    """Users matching the query, in relevance order"""
+    ids = search('users', query, limit)
+    users = {user.id: user for user in User.query.filter(User.id.in_(ids)).all()} if ids else {}
+    return [users[user_id] for user_id in ids if user_id in users]
+
+def search_activity_logs(query, limit=20):
+    """Activity logs matching the query, in relevance order"""
+    ids = search('admin_activity_logs', query, limit)
+    if not ids:
+        return []
+    logs = AdminActivityLog.query.options(
+        db.joinedload(AdminActivityLog.admin)
+    ).filter(AdminActivityLog.id.in_(ids)).all()
+    by_id = {log.id: log for log in logs}
+    return [by_id[log_id] for log_id in ids if log_id in by_id]
@@ -0,0 +1,162 @@
+# app/services/sqlite_tuning.py
+import logging
+import sqlite3
+import threading
+from collections import deque
+
+from sqlalchemy import create_engine, event
+
+from ..utils.db_routing import REPLICA_BIND
+
+logger = logging.getLogger(__name__)
+
+_WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+_HOLDS_WRITE_LOCK = 'sqlite_write_queue_held'
+
+class WriteQueue:
+    """
+    FIFO lock handing SQLite's single write slot to one transaction at a time
+
+    Waiting here wakes the next writer the moment the previous one commits,
+    instead of every thread polling SQLite's busy handler with growing sleeps.
+    """
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._held = False
+        self._waiters = deque()
+
+    def acquire(self, timeout):
+        with self._mutex:
+            if not self._held and not self._waiters:
+                self._held = True
+                return True
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+
+        if waiter.wait(timeout):
+            return True
+
+        with self._mutex:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                return False
+        return True  # Handed the lock just as we timed out
+
+    def release(self):
+        with self._mutex:
+            if self._waiters:
+                self._waiters.popleft().set()  # Ownership passes straight to the next writer
+            else:
+                self._held = False
+
+class SQLiteTuning:
+    """
+    Production profile for file-based SQLite databases
+
+    - Pragmas on every new connection: WAL journal, synchronous=NORMAL,
+      memory-mapped I/O, a larger page cache and a busy timeout
+    - A process-wide write queue: a connection joins it before its first
+      INSERT/UPDATE/DELETE and leaves when it goes back to the pool after its
+      commit or rollback, so threads never fight over the database lock
+    - A separate pool of read-only connections, used by @read_replica views
+      when no real replica is configured
+
+    Other databases are left untouched. Call after db.init_app(app).
+
+    Configuration:
+        SQLITE_TUNING: Turn the profile on or off
+        SQLITE_JOURNAL_MODE / SQLITE_SYNCHRONOUS: Journal and sync pragmas
+        SQLITE_BUSY_TIMEOUT_MS: How long a writer waits for the lock (queue and SQLite)
+        SQLITE_CACHE_SIZE_KB: Page cache per connection
+        SQLITE_MMAP_SIZE: Bytes of the database file to memory-map
+        SQLITE_WRITE_QUEUE: Serialize write transactions in-process
+        SQLITE_READ_POOL_SIZE: Read-only connections; 0 disables the read pool
+    """
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.write_queue = WriteQueue()
+        self.read_engine = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('SQLITE_TUNING', True)
+        app.config.setdefault('SQLITE_JOURNAL_MODE', 'WAL')
+        app.config.setdefault('SQLITE_SYNCHRONOUS', 'NORMAL')
+        app.config.setdefault('SQLITE_BUSY_TIMEOUT_MS', 10000)
+        app.config.setdefault('SQLITE_CACHE_SIZE_KB', 16384)
+        app.config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+        app.config.setdefault('SQLITE_WRITE_QUEUE', True)
+        app.config.setdefault('SQLITE_READ_POOL_SIZE', 4)
+
+        self.app = app
+        app.extensions['sqlite_tuning'] = self
+
+        with app.app_context():
+            engine = db.engine
+            database = engine.url.database
+            if not app.config['SQLITE_TUNING'] or engine.dialect.name != 'sqlite' \
+                    or not database or database == ':memory:' or database.startswith('file::memory:'):
+                return
+
+            event.listen(engine, 'connect', self._configure_connection)
+            if app.config['SQLITE_WRITE_QUEUE']:
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine.pool, 'checkin', self._release)
+
+            if app.config['SQLITE_READ_POOL_SIZE'] and REPLICA_BIND not in db.engines:
+                self.read_engine = create_engine(
+                    f"sqlite:///file:{database}?mode=ro&uri=true",
+                    pool_size=app.config['SQLITE_READ_POOL_SIZE'],
+                    max_overflow=app.config['SQLITE_READ_POOL_SIZE']
+                )
+                event.listen(self.read_engine, 'connect', self._configure_read_connection)
+                db.engines[REPLICA_BIND] = self.read_engine
+
+        logger.info(
+            f"🪶 SQLite tuning on for {database} "
+            f"({app.config['SQLITE_JOURNAL_MODE']}, write queue {'on' if app.config['SQLITE_WRITE_QUEUE'] else 'off'}, "
+            f"{app.config['SQLITE_READ_POOL_SIZE'] if self.read_engine else 0} read connections)"
+        )
+
+    def _common_pragmas(self, cursor):
+        config = self.app.config
+        cursor.execute(f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.execute(f"PRAGMA cache_size = -{int(config['SQLITE_CACHE_SIZE_KB'])}")
+        cursor.execute(f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}")
+
+    def _configure_connection(self, dbapi_connection, connection_record):
+        config = self.app.config
+        cursor = dbapi_connection.cursor()
+        try:
+            self._common_pragmas(cursor)
+            cursor.execute(f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+            cursor.execute(f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}")
+        finally:
+            cursor.close()
+
+    def _configure_read_connection(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            self._common_pragmas(cursor)
+            cursor.execute("PRAGMA query_only = ON")
+        finally:
+            cursor.close()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get(_HOLDS_WRITE_LOCK) or not statement.lstrip()[:7].upper().startswith(_WRITE_PREFIXES):
+            return
+        timeout = self.app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000
+        if not self.write_queue.acquire(timeout):
+            raise sqlite3.OperationalError("database is locked (timed out in the write queue)")
+        conn.info[_HOLDS_WRITE_LOCK] = True
+
+    def _release(self, dbapi_connection, connection_record):
+        # Released on return to the pool, which happens after the real COMMIT or
+        # ROLLBACK; the engine's commit event fires just before it
+        if connection_record is not None and connection_record.info.pop(_HOLDS_WRITE_LOCK, False):
+            self.write_queue.release()
+
+sqlite_tuning = SQLiteTuning()
@@ -0,0 +1,314 @@
+# app/services/statements.py
+import csv
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from itertools import groupby
+
+from dateutil.relativedelta import relativedelta
+from flask import current_app
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from ..models import db
+from ..models.user import User
+from ..models.contribution import Contribution
+from ..models.loan import Loan, LoanPayment
+from ..models.overpayment import Overpayment
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_FORMATS = {
+    'html': 'text/html',
+    'csv': 'text/csv',
+    'pdf': 'application/pdf',
+}
+
+_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
+_jinja_env = None
+
+def parse_month(value):
+    """Parse 'YYYY-MM' into the first day of that month"""
+    return datetime.strptime(value, '%Y-%m').date()
+
+def is_closed_month(month_start):
+    """A month is closed (and its statements immutable) once the next month has started"""
+    return month_start < date.today().replace(day=1)
+
+def pdf_available():
+    """PDF output needs WeasyPrint installed locally"""
+    try:
+        import weasyprint  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def compute_statements(month_start, user_ids=None):
+    """
+    Compute monthly statements for every member (or just `user_ids`) in one pass
+
+    Each source table is read once with a range query ordered by member, and the
+    rows are grouped into statements as they stream past. Transactions are
+    assigned to a month by their posting date, so a closed month never changes.
+
+    Returns:
+        dict: user_id -> statement dict (plain data, safe to send to worker processes)
+    """
+    start = datetime.combine(month_start, datetime.min.time())
+    end = datetime.combine(month_start + relativedelta(months=1), datetime.min.time())
+
+    def for_members(query, column):
+        return query.where(column.in_(user_ids)) if user_ids is not None else query
+
+    members = db.session.execute(for_members(
+        db.select(User.id, User.username, User.first_name, User.last_name, User.email, User.phone_number),
+        User.id
+    ).order_by(User.id)).all()
+
+    opening_balances = dict(db.session.execute(for_members(
+        db.select(Contribution.user_id, db.func.sum(Contribution.amount))
+        .where(Contribution.created_at < start)
+        .group_by(Contribution.user_id),
+        Contribution.user_id
+    )).all())
+
+    contributions = _group_by_member(db.session.execute(for_members(
+        db.select(
+            Contribution.user_id, Contribution.created_at, Contribution.month,
+            Contribution.payment_method, Contribution.transaction_id, Contribution.amount
+        )
+        .where(Contribution.created_at >= start, Contribution.created_at < end),
+        Contribution.user_id
+    ).order_by(Contribution.user_id, Contribution.created_at)))
+
+    loan_payments = _group_by_member(db.session.execute(for_members(
+        db.select(
+            Loan.user_id, LoanPayment.payment_date, LoanPayment.loan_id,
+            LoanPayment.payment_method, LoanPayment.transaction_id, LoanPayment.amount
+        )
+        .join(Loan, Loan.id == LoanPayment.loan_id)
+        .where(LoanPayment.payment_date >= start, LoanPayment.payment_date < end),
+        Loan.user_id
+    ).order_by(Loan.user_id, LoanPayment.payment_date)))
+
+    overpayments = _group_by_member(db.session.execute(for_members(
+        db.select(
+            Overpayment.user_id, Overpayment.created_at, Overpayment.original_payment_type,
+            Overpayment.status, Overpayment.overpayment_amount
+        )
+        .where(Overpayment.created_at >= start, Overpayment.created_at < end),
+        Overpayment.user_id
+    ).order_by(Overpayment.user_id, Overpayment.created_at)))
+
+    # Loan balances as at month end, from the payments posted before it
+    paid_to_date = (
+        db.select(LoanPayment.loan_id, db.func.sum(LoanPayment.amount).label('paid'))
+        .where(LoanPayment.payment_date < end)
+        .group_by(LoanPayment.loan_id)
+        .subquery()
+    )
+    loans = _group_by_member(db.session.execute(for_members(
+        db.select(
+            Loan.user_id, Loan.id, Loan.borrowed_date, Loan.amount_due,
+            db.func.coalesce(paid_to_date.c.paid, 0)
+        )
+        .outerjoin(paid_to_date, paid_to_date.c.loan_id == Loan.id)
+        .where(Loan.status.in_(['approved', 'paid']), Loan.borrowed_date < end),
+        Loan.user_id
+    ).order_by(Loan.user_id, Loan.id)))
+
+    generated_at = datetime.utcnow().isoformat(timespec='seconds')
+    statements = {}
+
+    for user_id, username, first_name, last_name, email, phone_number in members:
+        contribution_lines = [
+            {
+                'date': created_at.date().isoformat(),
+                'month': month.strftime('%Y-%m') if month else None,
+                'payment_method': payment_method,
+                'transaction_id': transaction_id,
+                'amount': amount
+            }
+            for created_at, month, payment_method, transaction_id, amount in contributions.get(user_id, [])
+        ]
+        payment_lines = [
+            {
+                'date': payment_date.date().isoformat(),
+                'loan_id': loan_id,
+                'payment_method': payment_method,
+                'transaction_id': transaction_id,
+                'amount': amount
+            }
+            for payment_date, loan_id, payment_method, transaction_id, amount in loan_payments.get(user_id, [])
+        ]
+        overpayment_lines = [
+            {
+                'date': created_at.date().isoformat(),
+                'original_payment_type': payment_type,
+                'status': status,
+                'amount': amount
+            }
+            for created_at, payment_type, status, amount in overpayments.get(user_id, [])
+        ]
+        loan_lines = [
+            {
+                'loan_id': loan_id,
+                'borrowed_date': borrowed_date.date().isoformat() if borrowed_date else None,
+                'amount_due': amount_due or 0,
+                'paid_to_date': paid,
+                'balance': max(0, (amount_due or 0) - paid)
+            }
+            for loan_id, borrowed_date, amount_due, paid in loans.get(user_id, [])
+        ]
+        loan_lines = [loan for loan in loan_lines if loan['balance'] > 0 or loan['paid_to_date'] > 0]
+
+        opening_balance = opening_balances.get(user_id) or 0
+        contributions_total = sum(line['amount'] for line in contribution_lines)
+
+        statements[user_id] = {
+            'month': month_start.strftime('%Y-%m'),
+            'period_start': start.date().isoformat(),
+            'period_end': (end.date() - relativedelta(days=1)).isoformat(),
+            'generated_at': generated_at,
+            'member': {
+                'id': user_id,
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name,
+                'email': email,
+                'phone_number': phone_number
+            },
+            'savings': {
+                'opening_balance': opening_balance,
+                'contributions_total': contributions_total,
+                'closing_balance': opening_balance + contributions_total
+            },
+            'contributions': contribution_lines,
+            'loan_payments': payment_lines,
+            'loan_payments_total': sum(line['amount'] for line in payment_lines),
+            'overpayments': overpayment_lines,
+            'loans': loan_lines,
+            'loan_balance_total': sum(loan['balance'] for loan in loan_lines)
+        }
+
+    return statements
+
+def _group_by_member(rows):
+    """Group (user_id, *values) rows, already ordered by user_id, into user_id -> [values]"""
+    return {
+        user_id: [tuple(row[1:]) for row in member_rows]
+        for user_id, member_rows in groupby(rows, key=lambda row: row[0])
+    }
+
+def render_statement(statement, fmt):
+    """Render a statement dict as html, csv or pdf bytes"""
+    if fmt == 'csv':
+        return _render_csv(statement).encode('utf-8')
+
+    global _jinja_env
+    if _jinja_env is None:
+        _jinja_env = Environment(loader=FileSystemLoader(_TEMPLATE_DIR), autoescape=select_autoescape(['html']))
+    html = _jinja_env.get_template('statements/statement.html').render(statement=statement)
+
+    if fmt == 'pdf':
+        from weasyprint import HTML
+        return HTML(string=html).write_pdf()
+    return html.encode('utf-8')
+
+def _render_csv(statement):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    member = statement['member']
+    savings = statement['savings']
+
+    writer.writerow(['member', f"{member['first_name']} {member['last_name']}", member['username']])
+    writer.writerow(['period', statement['period_start'], statement['period_end']])
+    writer.writerow(['opening_savings', savings['opening_balance']])
+    writer.writerow(['closing_savings', savings['closing_balance']])
+    writer.writerow(['outstanding_loan_balance', statement['loan_balance_total']])
+    writer.writerow([])
+    writer.writerow(['date', 'type', 'reference', 'loan_id', 'amount'])
+    for line in statement['contributions']:
+        writer.writerow([line['date'], 'contribution', line['transaction_id'], '', line['amount']])
+    for line in statement['loan_payments']:
+        writer.writerow([line['date'], 'loan_payment', line['transaction_id'], line['loan_id'], line['amount']])
+    for line in statement['overpayments']:
+        writer.writerow([line['date'], 'overpayment', '', '', line['amount']])
+
+    return buffer.getvalue()
+
+def get_statement_cache_dir():
+    return current_app.config.get('STATEMENT_CACHE_DIR') or os.path.join(current_app.instance_path, 'statements')
+
+def statement_cache_path(user_id, month_start, fmt):
+    """Cache file for a member's statement: <cache>/<YYYY-MM>/<user_id>.<fmt>"""
+    return os.path.join(get_statement_cache_dir(), month_start.strftime('%Y-%m'), f"{user_id}.{fmt}")
+
+def _write_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+def _render_to_cache(job):
+    """Process pool task: render one statement and write it to the cache"""
+    statement, fmt, path = job
+    _write_atomic(path, render_statement(statement, fmt))
+    return path
+
+def get_member_statement(user_id, month_start, fmt='html'):
+    """
+    Get one member's statement as bytes
+
+    Closed months are served from (and written to) the disk cache; the current
+    month is always computed fresh.
+    """
+    closed = is_closed_month(month_start)
+    path = statement_cache_path(user_id, month_start, fmt)
+
+    if closed and os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    statement = compute_statements(month_start, user_ids=[user_id]).get(user_id)
+    if statement is None:
+        return None
+
+    content = render_statement(statement, fmt)
+    if closed:
+        _write_atomic(path, content)
+    return content
+
+def build_statements(month_start, formats=('html', 'csv'), workers=None, force=False):
+    """
+    Build and cache every member's statement for a closed month
+
+    Statements are computed in one pass in this process, then rendered in
+    parallel by a process pool. Already-cached statements are skipped unless
+    force=True.
+
+    Returns:
+        int: Number of files written
+    """
+    if not is_closed_month(month_start):
+        raise ValueError("Statements can only be built for closed months")
+
+    statements = compute_statements(month_start)
+    jobs = [
+        (statement, fmt, statement_cache_path(user_id, month_start, fmt))
+        for user_id, statement in statements.items()
+        for fmt in formats
+    ]
+    if not force:
+        jobs = [job for job in jobs if not os.path.exists(job[2])]
+    if not jobs:
+        return 0
+
+    workers = workers or current_app.config.get('STATEMENT_RENDER_WORKERS') or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        written = sum(1 for _ in pool.map(_render_to_cache, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+    logger.info(f"🧾 Built {written} statement files for {month_start.strftime('%Y-%m')}")
+    return written
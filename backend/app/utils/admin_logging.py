@@ -1,13 +1,19 @@
 # app/utils/admin_logging.py
-from flask import request
+from flask import request, g
 from ..models.admin_log import AdminActivityLog
+from ..services.audit_writer import audit_writer
 import json
 
 def log_admin_activity(admin_id, action, target_type, target_id=None, target_name=None, 
-                      description=None, old_values=None, new_values=None):
+                      description=None, old_values=None, new_values=None, sync=False):
     """
     Helper function to log admin activities with request context
     
+    By default the entry goes to the buffered audit writer and is inserted in a
+    later batch. Compliance-critical actions pass sync=True and call this before
+    their own commit: the entry then joins the caller's transaction, so the change
+    and its audit row are committed (or rolled back) together.
+    
     Args:
         admin_id: ID of the admin performing the action
         action: Action type (e.g., 'user_created', 'loan_approved', 'contribution_added')
@@ -17,21 +23,27 @@ def log_admin_activity(admin_id, action, target_type, target_id=None, target_nam
         description: Detailed description of the action
         old_values: Dictionary of old values (for updates)
         new_values: Dictionary of new values (for updates)
+        sync: Add the entry to the current transaction instead of the buffer
     """
     
-    # Get request context information
-    ip_address = None
-    user_agent = None
+    ip_address, user_agent = get_request_client_info()
     
-    if request:
-        # Get real IP address (considering proxy headers)
-        ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
-        if ip_address and ',' in ip_address:
-            ip_address = ip_address.split(',')[0].strip()
-        
-        user_agent = request.headers.get('User-Agent', '')[:500]  # Limit user agent length
+    if sync:
+        return AdminActivityLog.log_activity(
+            admin_id=admin_id,
+            action=action,
+            target_type=target_type,
+            target_id=target_id,
+            target_name=target_name,
+            description=description,
+            old_values=old_values,
+            new_values=new_values,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            commit=False
+        )
     
-    return AdminActivityLog.log_activity(
+    return audit_writer.write(
         admin_id=admin_id,
         action=action,
         target_type=target_type,
@@ -44,6 +56,48 @@ def log_admin_activity(admin_id, action, target_type, target_id=None, target_nam
         user_agent=user_agent
     )
 
+def log_admin_activities(admin_id, entries, commit=False):
+    """
+    Log several admin activities in one batched INSERT
+    
+    The request context is read once for the whole batch. By default the rows join
+    the caller's transaction, so a bulk operation and its audit trail commit together.
+    
+    Args:
+        admin_id: ID of the admin performing the actions
+        entries: List of dicts with the keyword arguments of log_admin_activity
+        commit: Commit immediately instead of leaving it to the caller
+    """
+    ip_address, user_agent = get_request_client_info()
+    
+    rows = []
+    for entry in entries:
+        row = dict(entry)
+        row['admin_id'] = admin_id
+        row['ip_address'] = ip_address
+        row['user_agent'] = user_agent
+        rows.append(row)
+    
+    return AdminActivityLog.log_activities(rows, commit=commit)
+
+def get_request_client_info():
+    """Get (ip_address, user_agent) from the current request, or (None, None) outside one"""
+    ip_address = None
+    user_agent = None
+    
+    if request:
+        # Computed once per request, however many activities it logs
+        if 'admin_client_info' in g:
+            return g.admin_client_info
+        
+        # ProxyFix (PROXY_COUNT) resolves trusted proxy headers; X-Forwarded-For itself is client-supplied
+        ip_address = request.remote_addr
+        
+        user_agent = request.headers.get('User-Agent', '')[:500]  # Limit user agent length
+        g.admin_client_info = (ip_address, user_agent)
+    
+    return ip_address, user_agent
+
 # Predefined action types for consistency
 class AdminActions:
     # User management
@@ -74,9 +128,16 @@ class AdminActions:
     OVERPAYMENT_ALLOCATED = "overpayment_allocated"
     OVERPAYMENT_REFUNDED = "overpayment_refunded"
     
+    # PayBill payments
+    C2B_PAYMENT_ASSIGNED = "c2b_payment_assigned"
+    
     # Admin-to-admin operations
     ADMIN_CONTRIBUTION_ADDED = "admin_contribution_added"
     ADMIN_LOAN_MODIFIED = "admin_loan_modified"
+    
+    # Reporting
+    DATA_EXPORTED = "data_exported"
+    STATEMENT_RECONCILED = "statement_reconciled"
 
 def get_user_display_name(user):
     """Helper to get user display name for logging"""
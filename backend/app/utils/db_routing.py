@@ -0,0 +1,64 @@
+# app/utils/db_routing.py
+from flask_sqlalchemy.session import Session
+
+# Bind key of the read replica in SQLALCHEMY_BINDS
+REPLICA_BIND = 'replica'
+
+# session.info flags
+USE_REPLICA = 'use_replica'
+_WROTE = 'replica_session_wrote'
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to the read replica while `use_replica` is set in session.info
+
+    Flushes and DML statements always go to the primary, and once the session
+    has written anything, its later reads follow to the primary too so the
+    request sees its own writes. Without a configured replica every statement
+    goes to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get(USE_REPLICA):
+            if self._flushing or getattr(clause, 'is_dml', False):
+                self.info[_WROTE] = True
+            elif not self.info.get(_WROTE):
+                engine = self._db.engines.get(REPLICA_BIND)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def replica_configured(db):
+    """Whether a replica engine (a configured bind or SQLite's read pool) exists for the current app"""
+    return REPLICA_BIND in db.engines
+
+def init_replica(app, db):
+    """
+    Register the read replica as a bind and reset routing after every request
+
+    Call before db.init_app(app), which creates the engines.
+
+    Configuration:
+        SQLALCHEMY_REPLICA_URI: Read replica URL; reads stay on the primary when unset
+        SQLALCHEMY_REPLICA_STICKY_SECONDS: How long an admin's reads stay on the
+            primary after they write, so they don't read stale rows from a lagging replica
+    """
+    app.config.setdefault('SQLALCHEMY_REPLICA_URI', None)
+    app.config.setdefault('SQLALCHEMY_REPLICA_STICKY_SECONDS', 10)
+
+    if app.config['SQLALCHEMY_REPLICA_URI']:
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        # The replica gets the same pool and timeout settings as the primary
+        binds.setdefault(REPLICA_BIND, {
+            'url': app.config['SQLALCHEMY_REPLICA_URI'],
+            **(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        })
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.logger.info("📚 Read replica configured for reporting endpoints")
+
+    @app.teardown_request
+    def reset_routing(exc):
+        # Runs after streamed responses finish, so exports read the replica to the end
+        if db.session.registry.has():
+            db.session.info.pop(USE_REPLICA, None)
+            db.session.info.pop(_WROTE, None)
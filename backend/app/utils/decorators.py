@@ -1,7 +1,12 @@
+from datetime import datetime, timedelta
 from functools import wraps
-from flask import jsonify
+from flask import jsonify, request, make_response, current_app, g
 from flask_jwt_extended import get_jwt_identity
+from ..models import db
 from ..models.user import User
+from ..services.cache_versions import ALL_MEMBERS_SCOPE, member_scope, table_scope, compute_validators, last_write_at
+from ..services.rate_limit import rate_limiter
+from .db_routing import USE_REPLICA, replica_configured
 
 def admin_required(f):
     @wraps(f)
@@ -17,4 +22,98 @@ def admin_required(f):
             return jsonify({"error": "Admin privileges required"}), 403
         
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+def conditional_get(*scopes):
+    """
+    Answer GET requests with 304 Not Modified when nothing they depend on has changed
+
+    `scopes` are the table names the response is built from; 'member' stands for
+    the current user's own rows. The ETag is derived from the scopes' version
+    counters alone, so a revalidation never runs the view's entity queries.
+    Use below @jwt_required().
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user_id = get_jwt_identity()
+            version_scopes = []
+            for scope in scopes:
+                if scope == 'member':
+                    version_scopes += [member_scope(user_id), ALL_MEMBERS_SCOPE]
+                else:
+                    version_scopes.append(table_scope(scope))
+
+            etag, last_modified = compute_validators(version_scopes, request.full_path, user_id)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since.replace(tzinfo=None)
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
+
+def read_replica(f):
+    """
+    Run a read-only view against the read replica, when one is configured
+
+    Users who committed a write within SQLALCHEMY_REPLICA_STICKY_SECONDS stay on
+    the primary so a lagging replica can't hide their own changes. Anything the
+    view writes still goes to the primary. Use below @jwt_required().
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if replica_configured(db):
+            sticky_seconds = current_app.config['SQLALCHEMY_REPLICA_STICKY_SECONDS']
+            wrote_at = last_write_at(get_jwt_identity())
+            if wrote_at is None or wrote_at < datetime.utcnow() - timedelta(seconds=sticky_seconds):
+                db.session.info[USE_REPLICA] = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+def rate_limit(group, per_ip=None, per_user=None, user_field=None):
+    """
+    Limit a view with token buckets shared by its route group
+
+    `per_ip` and `per_user` name config settings holding '<count>/<period>'
+    rates. The user is the JWT identity, or the `user_field` of the JSON body
+    on unauthenticated views (e.g. the username being logged in). Refused
+    requests get 429 with Retry-After, and every response carries
+    X-RateLimit-* headers for the tightest bucket. Use below @jwt_required().
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if user_field:
+                user = (request.get_json(silent=True) or {}).get(user_field)
+                user = str(user).lower() if user is not None else None
+            else:
+                user = get_jwt_identity() if per_user else None
+
+            config = current_app.config
+            result = rate_limiter.check(group, [
+                ('ip', request.remote_addr, config.get(per_ip) if per_ip else None),
+                ('user', user, config.get(per_user) if per_user else None)
+            ])
+            if result is None:
+                return f(*args, **kwargs)
+
+            g.rate_limit = result
+            if not result.allowed:
+                return jsonify({"error": "Too many requests. Please try again later."}), 429
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,73 @@
+# app/utils/json_provider.py
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+def _default(o):
+    """Encode types the JSON encoders don't handle natively"""
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that encodes with orjson when it is installed
+
+    Dates and datetimes are always written as ISO 8601 strings (the format the
+    models' to_dict methods have always produced), Decimals as numbers. Output is
+    compact unless the app runs in debug mode or `compact` is set to False.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=_default, option=self._orjson_options()).decode('utf-8')
+
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is not None:
+            body = orjson.dumps(obj, default=_default, option=self._orjson_options())
+        else:
+            dump_args = {}
+            if self._pretty():
+                dump_args['indent'] = 2
+            else:
+                dump_args['separators'] = (',', ':')
+            body = f"{self.dumps(obj, **dump_args)}\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def _pretty(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def _orjson_options(self):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_SUBCLASS
+        if self._pretty():
+            options |= orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
@@ -0,0 +1,45 @@
+# app/utils/phone.py
+"""
+Kenyan phone number normalization
+
+Members type numbers as 0712345678, +254712345678, 712345678 or with spaces
+and dashes. Daraja sends and expects the 12-digit MSISDN (254712345678);
+users.phone_number stores the E.164 form (+254712345678) and users.msisdn the
+MSISDN, indexed, so a payment's MSISDN finds its member in one lookup.
+"""
+import re
+
+COUNTRY_CODE = '254'
+MSISDN_LENGTH = 12
+
+# Safaricom mobile network codes, the three digits after 254
+SAFARICOM_PREFIXES = frozenset(
+    [f"7{n:02d}" for n in range(1, 60)] + ['768', '769'] + [f"79{n}" for n in range(10)]
+)
+
+_NON_DIGITS = re.compile(r'\D')
+
+def to_msisdn(phone_number):
+    """Return `phone_number` as a 254XXXXXXXXX MSISDN; raises ValueError if it is not a Kenyan mobile number"""
+    phone = _NON_DIGITS.sub('', str(phone_number))
+
+    if phone.startswith(COUNTRY_CODE):
+        pass
+    elif phone.startswith('0'):
+        phone = COUNTRY_CODE + phone[1:]
+    elif phone[:1] in ('7', '1'):
+        phone = COUNTRY_CODE + phone
+    else:
+        raise ValueError(f"Invalid phone number format: {phone_number}")
+
+    if len(phone) != MSISDN_LENGTH:
+        raise ValueError(f"Invalid phone number length: {phone}")
+    return phone
+
+def to_e164(phone_number):
+    """Return `phone_number` as +254XXXXXXXXX; raises ValueError like to_msisdn"""
+    return '+' + to_msisdn(phone_number)
+
+def is_safaricom(msisdn):
+    """Whether a normalized MSISDN is on a Safaricom prefix (the only network STK push reaches)"""
+    return msisdn[3:6] in SAFARICOM_PREFIXES
@@ -0,0 +1,103 @@
+"""
+Benchmark JSON encoding of large API payloads
+
+Compares the old path (hand-written to_dict with isoformat() per field, encoded
+by Flask's default provider) with the Serializer + FastJSONProvider path, on
+10k loan and contribution rows.
+
+Usage:
+    python benchmarks/json_encoding.py [rows] [repeats]
+"""
+import os
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from app.models.loan import Loan
+from app.models.contribution import Contribution
+from app.utils.json_provider import FastJSONProvider, orjson
+
+def legacy_loan_dict(loan):
+    return {
+        'id': loan.id,
+        'user_id': loan.user_id,
+        'amount': loan.amount,
+        'interest_rate': loan.interest_rate,
+        'status': loan.status,
+        'amount_due': loan.amount_due,
+        'borrowed_date': loan.borrowed_date.isoformat() if loan.borrowed_date else None,
+        'due_date': loan.due_date.isoformat() if loan.due_date else None,
+        'paid_amount': loan.paid_amount,
+        'paid_date': loan.paid_date.isoformat() if loan.paid_date else None,
+        'unpaid_balance': loan.unpaid_balance,
+        'created_at': loan.created_at.isoformat() if loan.created_at else None,
+        'days_remaining': (loan.due_date - datetime.utcnow()).days if loan.due_date else None
+    }
+
+def legacy_contribution_dict(contribution):
+    return {
+        'id': contribution.id,
+        'user_id': contribution.user_id,
+        'amount': contribution.amount,
+        'month': contribution.month.isoformat() if contribution.month else None,
+        'payment_method': contribution.payment_method,
+        'transaction_id': contribution.transaction_id,
+        'created_at': contribution.created_at.isoformat() if contribution.created_at else None
+    }
+
+def make_rows(count):
+    now = datetime.utcnow()
+    loans = [
+        Loan(
+            id=i, user_id=i % 500, amount=1000.0 + i, interest_rate=10.0, status='approved',
+            amount_due=1100.0 + i, borrowed_date=now, due_date=now + timedelta(days=30),
+            paid_amount=0.0, unpaid_balance=1100.0 + i, created_at=now
+        )
+        for i in range(count)
+    ]
+    contributions = [
+        Contribution(
+            id=i, user_id=i % 500, amount=500.0, month=date(2024, 1, 1), payment_method='mpesa',
+            transaction_id=f"TX{i:08d}", created_at=now
+        )
+        for i in range(count)
+    ]
+    return loans, contributions
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    app = create_app(os.environ.get('FLASK_CONFIG', 'testing'))
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = FastJSONProvider(app)
+    loans, contributions = make_rows(rows)
+    payload_legacy = {'loans': [legacy_loan_dict(loan) for loan in loans]}
+    payload_fast = {'loans': Loan.serializer.dump_many(loans)}
+
+    cases = {
+        'legacy to_dict + stdlib json': lambda: default_provider.dumps({
+            'loans': [legacy_loan_dict(loan) for loan in loans],
+            'contributions': [legacy_contribution_dict(c) for c in contributions]
+        }),
+        'Serializer + FastJSONProvider': lambda: fast_provider.dumps({
+            'loans': Loan.serializer.dump_many(loans),
+            'contributions': Contribution.serializer.dump_many(contributions)
+        }),
+        'encode only, stdlib json': lambda: default_provider.dumps(payload_legacy),
+        'encode only, FastJSONProvider': lambda: fast_provider.dumps(payload_fast),
+    }
+
+    print(f"{rows} rows per table, best of {repeats} (orjson {'installed' if orjson else 'not installed'})")
+    with app.app_context():
+        for name, case in cases.items():
+            best = min(timeit.repeat(case, number=1, repeat=repeats))
+            print(f"  {name:<32} {best * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark login throughput under a burst of concurrent sign-ins
+
+Fires POST /api/auth/login from many threads at production hashing cost,
+first with an effectively unbounded hashing queue (every login waits its
+turn) and then with the default admission control (logins beyond the pool's
+capacity get 503 + Retry-After straight away). Each mode runs in its own
+process on a fresh database and reports throughput, 503s and latency of the
+logins that succeeded.
+
+Usage:
+    python benchmarks/login_throughput.py [logins] [threads] [method]
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run(logins, threads):
+    """Run one mode in this process and print its results as JSON"""
+    logging.disable(logging.WARNING)
+
+    from app import create_app
+    from app.models import db
+    from app.models.user import User
+    from app.services.password_hasher import password_hasher
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        user = User(username='member', email='member@example.com', first_name='Bench',
+                    last_name='Member', phone_number='254700000000', is_verified=True)
+        user.password = 'correct horse battery staple'
+        db.session.add(user)
+        db.session.commit()
+
+    def login(_):
+        started = time.perf_counter()
+        with app.test_client() as client:
+            response = client.post('/api/auth/login', json={
+                'username': 'member', 'password': 'correct horse battery staple'
+            })
+        return response.status_code, time.perf_counter() - started
+
+    # The route prints on every request; keep the output parseable
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(login, range(logins)))
+    finally:
+        sys.stdout = stdout
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for status, latency in results if status == 200)
+    print(json.dumps({
+        'ok': len(latencies),
+        'busy': sum(status == 503 for status, _ in results),
+        'elapsed': elapsed,
+        'p50': latencies[len(latencies) // 2] if latencies else 0.0,
+        'p99': latencies[max(int(len(latencies) * 0.99) - 1, 0)] if latencies else 0.0,
+        'method': password_hasher.method,
+    }))
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    method = sys.argv[3] if len(sys.argv) > 3 else 'pbkdf2:sha256:260000'
+
+    print(f"{logins} logins from {threads} threads")
+    modes = (
+        ('unbounded queue', {'PASSWORD_HASH_QUEUE': '1000000', 'PASSWORD_HASH_MAX_WAIT': '3600'}),
+        ('admission control', {}),
+    )
+    for label, settings in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ, PASSWORD_HASH_METHOD=method, RATE_LIMIT_ENABLED='false',
+                TEST_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'bench.db')}", **settings
+            )
+            output = subprocess.run(
+                [sys.executable, __file__, '--run', str(logins), str(threads)],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+            stats = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"  {label:<18} {stats['ok'] / stats['elapsed']:7.1f} logins/s  "
+            f"ok {stats['ok']:>5}  503 {stats['busy']:>4}  "
+            f"p50 {stats['p50'] * 1000:7.1f} ms  p99 {stats['p99'] * 1000:7.1f} ms  ({stats['method']})"
+        )
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run(int(sys.argv[2]), int(sys.argv[3]))
+    else:
+        main()
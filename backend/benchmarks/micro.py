@@ -0,0 +1,72 @@
+"""
+Run the micro-benchmarks and compare them with a pinned baseline
+
+Runs tests/benchmarks with pytest-benchmark and fails when the median time of
+any benchmark is more than --threshold percent slower than in the baseline
+for this kind of machine, benchmarks/baselines/<machine>.json. Ordinary runs
+never write the baseline, so slowdowns add up against the same reference
+instead of each build becoming the next one's yardstick.
+
+No baseline is shipped: numbers from one machine say nothing about another.
+Before the gate can pass on a new kind of machine (CI runner), bootstrap it
+once on that machine and commit the file it writes; refresh it the same way,
+on purpose, after an accepted slowdown or a runner change:
+
+    python benchmarks/micro.py --save-baseline
+    git add benchmarks/baselines/<machine>.json
+
+Exit status:
+    0  every benchmark within the threshold (or baseline saved)
+    1  a benchmark regressed past the threshold, or a test failed (pytest's status)
+    2  no baseline for this machine yet; bootstrap it as above
+
+Usage:
+    python benchmarks/micro.py [--threshold 20] [--save-baseline] [pytest args...]
+"""
+import argparse
+import os
+import platform
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES = os.path.join(BACKEND, 'benchmarks', 'baselines')
+
+EXIT_NO_BASELINE = 2
+
+def machine_id():
+    """Same id pytest-benchmark files saved runs under, e.g. Linux-CPython-3.11-64bit"""
+    python = '.'.join(platform.python_version_tuple()[:2])
+    bits = '64bit' if sys.maxsize > 2 ** 32 else '32bit'
+    return f"{platform.system()}-{platform.python_implementation()}-{python}-{bits}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the micro-benchmarks against the pinned baseline")
+    parser.add_argument('--threshold', type=float, default=20, help="Allowed slowdown of the median, in percent")
+    parser.add_argument('--save-baseline', action='store_true', help="Record this run as the new baseline")
+    args, pytest_args = parser.parse_known_args()
+
+    baseline = os.path.join(BASELINES, f"{machine_id()}.json")
+    command = [
+        sys.executable, '-m', 'pytest', 'tests/benchmarks', '--benchmark-only',
+        '--benchmark-columns=min,median,mean,stddev,rounds', '--benchmark-sort=name',
+        '-p', 'no:warnings', '-q'
+    ]
+
+    if args.save_baseline:
+        os.makedirs(BASELINES, exist_ok=True)
+        command.append(f"--benchmark-json={baseline}")
+    elif os.path.exists(baseline):
+        command += [f"--benchmark-compare={baseline}", f"--benchmark-compare-fail=median:{args.threshold:g}%"]
+    else:
+        print(f"No baseline for {machine_id()} ({os.path.relpath(baseline, BACKEND)}). Bootstrap it once on this "
+              f"machine with 'python benchmarks/micro.py --save-baseline' and commit the file.", file=sys.stderr)
+        return EXIT_NO_BASELINE
+
+    returncode = subprocess.run(command + pytest_args, cwd=BACKEND).returncode
+    if args.save_baseline and returncode == 0:
+        print(f"Baseline saved to {os.path.relpath(baseline, BACKEND)}")
+    return returncode
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark statement reconciliation at settlement-report scale
+
+Writes synthetic M-PESA statement CSVs of increasing size to a temp directory,
+records a share of their receipts (plus some the statement lacks) as C2B
+payments in an in-memory database, and times reconcile_statement on each.
+Time per row should stay flat as the statement grows: the join is one pass.
+
+Usage:
+    python benchmarks/reconciliation.py [rows] [recorded_share]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEADER = ('Receipt No.,Completion Time,Initiation Time,Details,Transaction Status,Paid In,Withdrawn,'
+          'Balance,Balance Confirmed,Reason Type,Other Party Info,Linked Transaction ID,A/C No.\n')
+
+START = datetime(2026, 3, 1)
+
+def write_statement(path, rows):
+    """Statement with `rows` lines: mostly Pay Bill credits, every tenth a charge"""
+    with open(path, 'w', encoding='utf-8', newline='') as statement:
+        statement.write('Organization Name:,NINEFUND\n\n' + HEADER)
+        for n in range(rows):
+            at = (START + timedelta(seconds=n)).strftime('%d-%m-%Y %H:%M:%S')
+            if n % 10 == 9:
+                statement.write(f"RBC{n:07d},{at},{at},Business charge,Completed,,15.00,0.00,true,Charge,,,\n")
+            else:
+                statement.write(f'RBP{n:07d},{at},{at},Pay Bill,Completed,"3,000.00",,0.00,true,Pay Bill,254712***678 - W K,,\n')
+
+def record_receipts(db, rows, share):
+    """Record `share` of the statement's credits as C2B payments, every 50th with a different amount"""
+    from app.models.c2b_transaction import C2BTransaction
+
+    table = C2BTransaction.__table__
+    step = max(1, round(1 / share))
+    batch = []
+    for n in range(0, rows, step):
+        if n % 10 == 9:
+            continue
+        batch.append({
+            'trans_id': f"RBP{n:07d}", 'amount': 2500.0 if n % 50 == 0 else 3000.0, 'status': 'posted',
+            'attempts': 1, 'trans_time': START + timedelta(seconds=n), 'created_at': START
+        })
+        if len(batch) == 10000:
+            db.session.execute(db.insert(table), batch)
+            batch = []
+    # Recorded by us but absent from the statement
+    batch += [{'trans_id': f"RBX{n:07d}", 'amount': 3000.0, 'status': 'posted', 'attempts': 1,
+               'trans_time': START + timedelta(seconds=n), 'created_at': START} for n in range(0, rows, 1000)]
+    db.session.execute(db.insert(table), batch)
+    db.session.commit()
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    share = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    logging.disable(logging.WARNING)
+
+    from app import create_app
+    from app.models import db
+    from app.services.reconciliation import reconcile_statement
+
+    app = create_app('testing', slim=True)
+    sizes = sorted({max(1, rows // 100), max(1, rows // 10), rows})
+    print(f"{'rows':>10} {'recorded':>10} {'seconds':>9} {'us/row':>8} {'matched':>9} {'mismatch':>9} {'not ours':>9} {'not on stmt':>11}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"statement-{size}.csv")
+            write_statement(path, size)
+            with app.app_context():
+                db.drop_all()
+                db.create_all()
+                record_receipts(db, size, share)
+                recorded = db.session.execute(db.text("SELECT count(*) FROM c2b_transactions")).scalar()
+
+                started = time.perf_counter()
+                with open(path, encoding='utf-8-sig', newline='') as lines:
+                    report = reconcile_statement(lines)
+                elapsed = time.perf_counter() - started
+
+            summary = report['summary']
+            print(f"{size:>10,} {recorded:>10,} {elapsed:>9.2f} {elapsed / size * 1e6:>8.2f} {summary['matched']:>9,} "
+                  f"{summary['amount_mismatches']:>9,} {summary['missing_in_system']:>9,} {summary['missing_in_statement']:>11,}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark gunicorn worker models on the payment and dashboard endpoints
+
+Starts gunicorn with gunicorn.conf.py once per worker model (sync, gthread,
+and gevent when installed) on a fresh SQLite database, with Daraja replaced
+by a local stand-in that answers STK pushes after a fixed delay. For each
+model it drives POST /api/mpesa/initiate-contribution (dominated by the
+outbound Daraja call) and GET /api/admin/dashboard (CPU and database bound)
+from many client threads, and reports throughput, errors and latency.
+
+The load generator runs on the same machine, so compare models with each
+other rather than reading the numbers as capacity.
+
+Usage:
+    python benchmarks/serving.py [seconds] [clients] [daraja_delay]
+"""
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+PORT = 5081
+USERS_PER_CLIENT = 4  # STK checkout IDs are per user per second
+
+def daraja_stand_in(delay):
+    """A local server answering Daraja's auth and STK push calls after `delay` seconds"""
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._reply({'access_token': 'bench-token', 'expires_in': '3599'})
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            self._reply({
+                'MerchantRequestID': f"MR-{time.time_ns()}", 'CheckoutRequestID': f"CO-{time.time_ns()}",
+                'ResponseCode': '0', 'ResponseDescription': 'Success. Request accepted for processing'
+            })
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def seed(clients):
+    """Create an admin and the paying members in this process and print their access tokens as JSON"""
+    logging.disable(logging.WARNING)
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from app.models import db
+    from app.models.user import User
+
+    app = create_app('development')
+    with app.app_context():
+        db.create_all()
+        users = [
+            User(username=f"member{i}", email=f"member{i}@example.com", first_name='Bench', last_name=str(i),
+                 phone_number=f"2547{i:08d}", password_hash='x', is_admin=(i == 0), is_verified=True)
+            for i in range(clients * USERS_PER_CLIENT + 1)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        tokens = [create_access_token(identity=str(user.id)) for user in users]
+    print(json.dumps(tokens))
+
+def drive(name, seconds, clients, request_for):
+    """Send requests from `clients` threads for `seconds`; `request_for(client, n)` gives (method, path, kwargs)"""
+    deadline = time.perf_counter() + seconds
+
+    def client_loop(client):
+        results = []
+        with requests.Session() as session:
+            n = 0
+            while time.perf_counter() < deadline:
+                method, path, kwargs = request_for(client, n)
+                started = time.perf_counter()
+                try:
+                    status = session.request(method, f"http://127.0.0.1:{PORT}{path}", timeout=120, **kwargs).status_code
+                except requests.RequestException:
+                    status = 0
+                results.append((status, time.perf_counter() - started))
+                n += 1
+        return results
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = [result for client_results in pool.map(client_loop, range(clients)) for result in client_results]
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for status, latency in results if status == 200)
+    ok = len(latencies)
+    p50 = latencies[ok // 2] if ok else 0.0
+    p99 = latencies[max(int(ok * 0.99) - 1, 0)] if ok else 0.0
+    print(
+        f"    {name:<10} {ok / elapsed:7.1f} req/s  ok {ok:>5}  errors {len(results) - ok:>4}  "
+        f"p50 {p50 * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms"
+    )
+
+def wait_ready(process):
+    for _ in range(120):
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{PORT}/api/health/db", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("gunicorn did not become ready")
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    delay = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+
+    daraja = daraja_stand_in(delay)
+    models = ['sync', 'gthread']
+    try:
+        import gevent  # noqa: F401
+        models.append('gevent')
+    except ImportError:
+        print("gevent not installed; skipping the gevent worker")
+
+    print(f"{clients} clients for {seconds:.0f}s per endpoint, Daraja answering in {delay * 1000:.0f} ms")
+    for model in models:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                FLASK_ENV='development',
+                SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                MPESA_BASE_URL=f"http://127.0.0.1:{daraja.server_port}",
+                MPESA_TEST_MODE='false', MPESA_CONSUMER_KEY='bench', MPESA_CONSUMER_SECRET='bench', MPESA_PASSKEY='bench',
+                RATE_LIMIT_ENABLED='false', OTP_STORE='memory',
+                GUNICORN_WORKER_CLASS=model, GUNICORN_BIND=f"127.0.0.1:{PORT}",
+                GUNICORN_ACCESS_LOG=os.devnull, GUNICORN_LOG_LEVEL='warning',
+            )
+            output = subprocess.run(
+                [sys.executable, __file__, '--seed', str(clients)], env=env, capture_output=True, text=True, check=True
+            ).stdout
+            admin_token, *member_tokens = json.loads(output.strip().splitlines()[-1])
+
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', 'wsgi:app'], cwd=BACKEND, env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_ready(process)
+                print(f"  {model}")
+
+                def payment(client, n):
+                    token = member_tokens[client * USERS_PER_CLIENT + n % USERS_PER_CLIENT]
+                    return 'POST', '/api/mpesa/initiate-contribution', {
+                        'json': {'amount': 3500, 'phone_number': '254700000000'},
+                        'headers': {'Authorization': f"Bearer {token}"}
+                    }
+
+                def dashboard(client, n):
+                    return 'GET', '/api/admin/dashboard', {'headers': {'Authorization': f"Bearer {admin_token}"}}
+
+                drive('payment', seconds, clients, payment)
+                drive('dashboard', seconds, clients, dashboard)
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(timeout=120)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--seed':
+        seed(int(sys.argv[2]))
+    else:
+        main()
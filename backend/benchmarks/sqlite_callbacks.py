@@ -0,0 +1,115 @@
+"""
+Benchmark concurrent M-PESA callbacks on a file-based SQLite database
+
+Replays successful STK contribution callbacks from many threads at once, first
+with SQLITE_TUNING off (rollback journal, default busy handling) and then on
+(WAL, pragmas, write queue). Each mode runs in its own process on a fresh
+database and reports throughput, latency and 'database is locked' failures.
+
+Usage:
+    python benchmarks/sqlite_callbacks.py [callbacks] [threads]
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def callback_payload(checkout_request_id, amount):
+    return {
+        "Body": {
+            "stkCallback": {
+                "MerchantRequestID": f"MR-{checkout_request_id}",
+                "CheckoutRequestID": checkout_request_id,
+                "ResultCode": 0,
+                "ResultDesc": "The service request is processed successfully.",
+                "CallbackMetadata": {
+                    "Item": [
+                        {"Name": "Amount", "Value": amount},
+                        {"Name": "MpesaReceiptNumber", "Value": f"R{checkout_request_id}"},
+                        {"Name": "TransactionDate", "Value": 20240101120000},
+                        {"Name": "PhoneNumber", "Value": 254700000000}
+                    ]
+                }
+            }
+        }
+    }
+
+def run(callbacks, threads):
+    """Run one mode in this process and print its results as JSON"""
+    logging.disable(logging.WARNING)
+
+    from app import create_app
+    from app.models import db
+    from app.models.payment_status import PaymentStatus
+    from app.models.user import User
+    from app.services.daraja_service import process_callback
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        users = [
+            User(username=f"member{i}", email=f"member{i}@example.com", first_name='Bench',
+                 last_name=str(i), phone_number=f"2547000{i:05d}", password_hash='x')
+            for i in range(threads)
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add_all([
+            PaymentStatus(
+                checkout_request_id=f"ws_CO_{n}", user_id=users[n % threads].id,
+                transaction_type='contribution', amount=3500, phone_number='254700000000'
+            )
+            for n in range(callbacks)
+        ])
+        db.session.commit()
+
+    def handle(n):
+        started = time.perf_counter()
+        with app.app_context():
+            result = process_callback(callback_payload(f"ws_CO_{n}", 3500))
+        return result.get('success', False), str(result.get('error', '')), time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(handle, range(callbacks)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, _, latency in results)
+    print(json.dumps({
+        'ok': sum(ok for ok, _, _ in results),
+        'locked': sum('locked' in error for _, error, _ in results),
+        'elapsed': elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p99': latencies[int(len(latencies) * 0.99) - 1],
+    }))
+
+def main():
+    callbacks = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    print(f"{callbacks} contribution callbacks from {threads} threads")
+    for label, tuning in (('default SQLite', 'false'), ('SQLITE_TUNING', 'true')):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, SQLITE_TUNING=tuning, TEST_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            output = subprocess.run(
+                [sys.executable, __file__, '--run', str(callbacks), str(threads)],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+            stats = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"  {label:<16} {stats['ok'] / stats['elapsed']:7.1f} callbacks/s  "
+            f"ok {stats['ok']:>5}  locked {stats['locked']:>4}  "
+            f"p50 {stats['p50'] * 1000:7.1f} ms  p99 {stats['p99'] * 1000:7.1f} ms"
+        )
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run(int(sys.argv[2]), int(sys.argv[3]))
+    else:
+        main()
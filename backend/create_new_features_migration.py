@@ -8,7 +8,7 @@ from app.models.overpayment import Overpayment
 from sqlalchemy import text
 import os
 
-app = create_app('development')
+app = create_app('development', slim=True)
 
 def add_new_tables():
     """Add new tables for admin logging and overpayment management"""
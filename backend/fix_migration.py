@@ -7,7 +7,7 @@ from app.seed import seed_database
 from sqlalchemy import text
 import os
 
-app = create_app('development')
+app = create_app('development', slim=True)
 
 def complete_database_fix():
     """Complete one-stop solution to fix all database issues"""
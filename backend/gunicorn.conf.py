@@ -0,0 +1,86 @@
+"""
+Gunicorn serving profile
+
+Gunicorn reads ./gunicorn.conf.py automatically:
+
+    gunicorn wsgi:app
+
+Every setting can be overridden from the environment (GUNICORN_*), or on the
+command line as usual.
+
+Worker models (GUNICORN_WORKER_CLASS):
+    gthread (default): a few processes with a thread pool each. Requests
+        waiting on Daraja or on password hashing only block one thread, and
+        no extra dependencies are needed.
+    gevent: one greenlet per request, for very many slow concurrent STK
+        pushes. Needs `pip install gevent` (and psycogreen with PostgreSQL).
+        The app is not preloaded by default with gevent, so that locks and
+        pools are created after gevent patches the standard library.
+    sync: one request per process; only for comparison.
+
+See benchmarks/serving.py for a comparison of the three on the payment and
+dashboard endpoints.
+"""
+import os
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))  # CPUs this container may use
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+cpus = _cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    workers = _env_int('GUNICORN_WORKERS', cpus + 1)
+    worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 200)
+elif worker_class == 'gthread':
+    workers = _env_int('GUNICORN_WORKERS', cpus * 2 + 1)
+    threads = _env_int('GUNICORN_THREADS', 8)
+else:
+    workers = _env_int('GUNICORN_WORKERS', cpus * 2 + 1)
+
+# Import the app once in the master and fork it, so workers share its memory
+# and start instantly; post_fork below gives each worker its own connections
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false' if worker_class == 'gevent' else 'true').lower() in ['true', 'on', '1']
+
+# Recycle workers now and then so slow leaks can't grow unbounded; the jitter
+# keeps them from all restarting at once
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 2000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 200)
+
+# An STK push makes up to two Daraja calls (auth token, then the push), each
+# allowed MPESA_REQUEST_TIMEOUT seconds. Give in-flight pushes time to finish
+# on reload/shutdown, and only kill a worker that has been silent for longer.
+_daraja_seconds = 2 * _env_int('MPESA_REQUEST_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', _daraja_seconds + 10)
+timeout = _env_int('GUNICORN_TIMEOUT', _daraja_seconds + 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+# Heartbeat files on tmpfs; a slow disk can otherwise get workers killed
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the master; the worker opens its own"""
+    if not server.cfg.preload_app:
+        return
+
+    from app.models import db
+    from wsgi import app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False leaves the master's sockets alone and just forgets them here
+            engine.dispose(close=False)
+    server.log.info(f"Worker {worker.pid} ready ({worker_class})")
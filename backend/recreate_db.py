@@ -7,7 +7,7 @@ from app.seed import seed_database
 import os
 import shutil
 
-app = create_app('development')
+app = create_app('development', slim=True)
 
 def recreate_database_completely():
     """Completely recreate database from scratch"""
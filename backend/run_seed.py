@@ -1,7 +1,7 @@
 from app import create_app
 from app.seed import seed_database
 
-app = create_app('development')
+app = create_app('development', slim=True)
 
 with app.app_context():
     seed_database()
\ No newline at end of file
@@ -0,0 +1,32 @@
+# setup_ledger.py
+# Run this script once to create the ledger tables and post the existing
+# payment history into them. Safe to re-run: the backfill is skipped once the
+# ledger has entries, and only missing month-end snapshots are written.
+
+from app import create_app
+from app.models import db
+from app.services.ledger import backfill_ledger, close_months, trial_balance
+import os
+
+app = create_app(os.environ.get('FLASK_CONFIG', 'development'), slim=True)
+
+def setup_ledger():
+    with app.app_context():
+        print("📒 SETTING UP LEDGER")
+        print("=" * 50)
+        
+        db.create_all()
+        print("✓ ledger_entries and ledger_snapshots tables ready")
+        
+        postings = backfill_ledger()
+        print(f"✓ Backfilled {postings} postings")
+        
+        closed = close_months()
+        print(f"✓ Snapshotted {len(closed)} months")
+        
+        print("\n📊 Balances by account kind:")
+        for kind, balance in sorted(trial_balance().items()):
+            print(f"   {kind:<25} {balance:>15,.2f}")
+
+if __name__ == '__main__':
+    setup_ledger()
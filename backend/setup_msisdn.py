@@ -0,0 +1,41 @@
+# setup_msisdn.py
+# Run this script once to add the indexed users.msisdn column to an existing
+# database and backfill it, normalizing stored phone numbers to +254... on the
+# way. Safe to re-run: the column and index are only added when missing and
+# the backfill skips members that already have an msisdn.
+
+from app import create_app
+from app.models import db
+from app.models.user import User
+import os
+import sys
+
+app = create_app(os.environ.get('FLASK_CONFIG', 'development'), slim=True)
+
+def setup_msisdn(chunk_size=1000):
+    with app.app_context():
+        print("📱 SETTING UP MSISDN LOOKUP")
+        print("=" * 50)
+
+        columns = {column['name'] for column in db.inspect(db.engine).get_columns('users')}
+        with db.engine.begin() as conn:
+            if 'msisdn' not in columns:
+                conn.exec_driver_sql("ALTER TABLE users ADD COLUMN msisdn VARCHAR(12)")
+                print("✓ users.msisdn column added")
+            else:
+                print("✓ users.msisdn column already exists")
+            for index in User.__table__.indexes:
+                index.create(bind=conn, checkfirst=True)
+        print("✓ users.msisdn index ready")
+
+        updated = User.backfill_msisdn(chunk_size=chunk_size)
+        print(f"✓ Backfilled {updated} members")
+
+        missing = User.query.filter(User.msisdn.is_(None)).all()
+        if missing:
+            print(f"\n⚠️ {len(missing)} members have a phone number that is not a Kenyan mobile:")
+            for user in missing:
+                print(f"   #{user.id} {user.username}: {user.phone_number}")
+
+if __name__ == '__main__':
+    setup_msisdn(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,137 @@
+# tests/benchmarks/test_hot_paths.py
+"""
+Micro-benchmarks for the model and service functions on the request hot paths
+
+Skipped in normal test runs; benchmarks/micro.py runs them and fails on
+regressions against the pinned per-machine baseline (bootstrapped once with
+micro.py --save-baseline; see its docstring). They use the same in-memory database
+and rolled-back transaction as the other tests.
+"""
+from datetime import date
+
+import pytest
+
+import factories
+from app.models import db
+from app.models.admin_log import AdminActivityLog
+from app.models.contribution import Contribution
+from app.models.loan import Loan
+from app.models.user import User
+from app.routes.admin import _list_loans
+from app.services.daraja_service import format_phone_number, process_callback
+
+ROUNDS = 50
+LISTING_ROUNDS = 10  # Each listing takes a few hundred ms
+
+@pytest.fixture
+def ctx(app, db_session):
+    with app.app_context():
+        yield
+
+def add_contributions(user_id, count):
+    db.session.add_all([
+        Contribution(user_id=user_id, amount=3000.0, month=date(2000 + i // 12, i % 12 + 1, 1),
+                     payment_method='mpesa', transaction_id=f"BENCH{i:06d}")
+        for i in range(count)
+    ])
+    db.session.flush()
+
+@pytest.mark.parametrize('contributions', [10, 100, 1000])
+def test_user_to_dict(benchmark, ctx, contributions):
+    user = factories.user()
+    add_contributions(user.id, contributions)
+    factories.loan(user_id=user.id, status='approved')
+    db.session.commit()
+
+    # Each request starts with nothing loaded, so reload the contributions every round
+    result = benchmark.pedantic(user.to_dict, setup=db.session.expire_all, rounds=ROUNDS)
+
+    assert result['total_contribution'] == 3000.0 * contributions
+
+def test_process_callback(benchmark, ctx):
+    user = factories.user()
+    db.session.commit()
+    receipts = iter(range(1_000_000))
+
+    def pending_payment():
+        # A callback settles its payment, so every round gets a fresh one
+        payment = factories.payment_status(user_id=user.id, amount=3500.0)
+        db.session.commit()
+        n = next(receipts)
+        return ({'Body': {'stkCallback': {
+            'MerchantRequestID': payment.merchant_request_id,
+            'CheckoutRequestID': payment.checkout_request_id,
+            'ResultCode': 0,
+            'ResultDesc': 'The service request is processed successfully.',
+            'CallbackMetadata': {'Item': [
+                {'Name': 'Amount', 'Value': 3500.0},
+                {'Name': 'MpesaReceiptNumber', 'Value': f"QBN{n:07d}"},
+                {'Name': 'TransactionDate', 'Value': 20260101120000},
+                {'Name': 'PhoneNumber', 'Value': 254712345678}
+            ]}
+        }}},), {}
+
+    result = benchmark.pedantic(process_callback, setup=pending_payment, rounds=ROUNDS)
+
+    assert result['success'] and result['overpayment_amount'] == 500.0
+
+@pytest.mark.parametrize('phone', ['0712345678', '+254 712 345 678', '712345678'])
+def test_format_phone_number(benchmark, phone):
+    assert benchmark(format_phone_number, phone) == '254712345678'
+
+def test_calculate_loan_details(benchmark):
+    loan = Loan(user_id=1, amount=25000.0, status='approved')
+
+    benchmark(loan.calculate_loan_details)
+
+    assert loan.amount_due == 26250.0
+
+def test_log_activity(benchmark, ctx):
+    admin = factories.admin()
+    db.session.commit()
+
+    result = benchmark.pedantic(AdminActivityLog.log_activity, kwargs={
+        'admin_id': admin.id, 'action': 'loan_approved', 'target_type': 'loan', 'target_id': 1,
+        'target_name': 'Loan #1', 'description': 'Approved loan application',
+        'old_values': {'status': 'pending'}, 'new_values': {'status': 'approved'},
+        'ip_address': '127.0.0.1', 'user_agent': 'benchmark'
+    }, rounds=ROUNDS)
+
+    assert result is True
+
+@pytest.fixture
+def listing(ctx):
+    """200 members with a loan and a handful of contributions each, and 500 activity log entries"""
+    admin = factories.admin()
+    for _ in range(200):
+        user = factories.user()
+        add_contributions(user.id, 5)
+        factories.loan(user_id=user.id, status='approved')
+    db.session.add_all([
+        AdminActivityLog(admin_id=admin.id, action='loan_approved', target_type='loan', target_id=i)
+        for i in range(500)
+    ])
+    db.session.commit()
+
+def test_list_users(benchmark, listing):
+    def list_users():
+        db.session.expire_all()
+        return User.serializer.dump_many(User.query.all())
+
+    assert len(benchmark.pedantic(list_users, rounds=LISTING_ROUNDS)) == 201
+
+def test_list_loans(benchmark, listing):
+    def list_loans():
+        db.session.expire_all()
+        return _list_loans('approved')
+
+    assert len(benchmark.pedantic(list_loans, rounds=LISTING_ROUNDS)) == 200
+
+def test_list_activity_logs(benchmark, listing):
+    def list_logs():
+        db.session.expire_all()
+        return AdminActivityLog.serializer.dump_many(
+            AdminActivityLog.query.order_by(AdminActivityLog.created_at.desc()).limit(100).all()
+        )
+
+    assert len(benchmark.pedantic(list_logs, rounds=LISTING_ROUNDS)) == 100
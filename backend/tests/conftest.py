@@ -0,0 +1,175 @@
+# tests/conftest.py
+"""
+Shared fixtures
+
+One app and one in-memory SQLite database per test process (so per
+pytest-xdist worker), with the schema created once. Every test that uses
+`db_session` runs inside a transaction that is rolled back afterwards: the
+app's commits only release SAVEPOINTs, so tests never see each other's rows
+and can run in any order or in parallel (`pytest -n auto`).
+"""
+from contextlib import contextmanager, nullcontext
+
+import email_validator
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import create_app
+from app.models import db
+from app.services import daraja_service
+from app.services.audit_writer import audit_writer
+from app.services.otp_store import MemoryOTPStore, otp_service
+from app.services.rate_limit import MemoryBuckets, rate_limiter
+from app.utils.db_routing import RoutingSession
+
+from mock_daraja import MockDaraja
+
+# session.info flag: flushed changes not yet committed or rolled back
+_UNCOMMITTED = 'test_uncommitted'
+
+class TransactionSession(RoutingSession):
+    """
+    Session on the test's connection
+
+    Flask-SQLAlchemy would pick the app's engine, so get_bind returns the
+    connection instead. Closing a session rolls back its SAVEPOINT, which on
+    the shared connection would also undo rows written through db.engine
+    meanwhile (they nest inside it); a session with nothing uncommitted
+    releases its SAVEPOINT instead, as if it had its own connection.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        return bind if bind is not None else self.bind
+
+    def close(self):
+        if self.in_transaction() and not self.info.get(_UNCOMMITTED) and not (self.new or self.dirty or self.deleted):
+            self.commit()
+        super().close()
+
+@event.listens_for(TransactionSession, 'after_flush')
+def _flushed(session, flush_context):
+    session.info[_UNCOMMITTED] = True
+
+@event.listens_for(TransactionSession, 'after_transaction_end')
+def _transaction_ended(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_UNCOMMITTED, None)
+
+class ConnectionEngine:
+    """
+    Stands in for db.engine during a test
+
+    Code that writes through the engine directly (the audit log writer, the
+    search index) gets the test's connection, inside a SAVEPOINT, so its rows
+    roll back with everything else.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.connection.engine, name)
+
+    def connect(self):
+        return nullcontext(self.connection)
+
+    @contextmanager
+    def begin(self):
+        with self.connection.begin_nested():
+            yield self.connection
+
+@pytest.fixture(scope='session')
+def app():
+    # Registration checks the email domain's MX records; tests stay off the network
+    email_validator.CHECK_DELIVERABILITY = False
+
+    app = create_app('testing')
+    with app.app_context():
+        engine = db.engine
+
+        # pysqlite runs its own BEGIN/COMMIT and breaks SAVEPOINTs; let SQLAlchemy emit them instead
+        @event.listens_for(engine, 'connect')
+        def disable_driver_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, 'begin')
+        def begin(connection):
+            connection.exec_driver_sql('BEGIN')
+
+        db.create_all()
+    return app
+
+@pytest.fixture
+def db_session(app):
+    """Route db.session and db.engine through one connection whose transaction is rolled back after the test"""
+    with app.app_context():
+        engines = db.engines
+        engine = engines[None]
+        connection = engine.connect()
+        transaction = connection.begin()
+
+    app_session = db.session
+    db.session = db._make_scoped_session({
+        'class_': TransactionSession,
+        'bind': connection,
+        'join_transaction_mode': 'create_savepoint'
+    })
+    engines[None] = ConnectionEngine(connection)
+    try:
+        yield db.session
+    finally:
+        # Each app context removes its own session on teardown
+        db.session = app_session
+        engines[None] = engine
+        transaction.rollback()
+        connection.close()
+
+@pytest.fixture
+def client(app, db_session):
+    # The module-level services keep the last app set up with them (test_loan_ledger builds its own)
+    audit_writer.app = app
+    rate_limiter.app, rate_limiter.backend = app, MemoryBuckets()
+    otp_service.app, otp_service.store = app, MemoryOTPStore()
+    return app.test_client()
+
+@pytest.fixture
+def create(app, db_session):
+    """
+    create(factory, **overrides): run a factory from tests/factories.py and commit
+
+    Returns the row with its columns loaded, usable outside an app context.
+    """
+    def create(factory, **overrides):
+        with app.app_context():
+            result = factory(**overrides)
+            db.session.commit()
+            for row in result if isinstance(result, list) else [result]:
+                db.session.refresh(row)
+                db.session.expunge(row)
+            return result
+    return create
+
+@pytest.fixture
+def auth_headers(app):
+    """auth_headers(user): Authorization header with an access token for `user`"""
+    def auth_headers(user):
+        with app.app_context():
+            return {'Authorization': f"Bearer {create_access_token(identity=str(user.id))}"}
+    return auth_headers
+
+@pytest.fixture
+def daraja(app, monkeypatch):
+    """Send Daraja calls, with test mode off, to a MockDaraja transport"""
+    monkeypatch.setitem(app.config, 'MPESA_TEST_MODE', False)
+    monkeypatch.setitem(app.config, 'MPESA_CONSUMER_KEY', 'test-consumer-key')
+    monkeypatch.setitem(app.config, 'MPESA_CONSUMER_SECRET', 'test-consumer-secret')
+    monkeypatch.setitem(app.config, 'MPESA_PASSKEY', 'test-passkey')
+    monkeypatch.setattr(daraja_service, '_token_cache', {'token': None, 'expires_at': None})
+
+    transport = MockDaraja()
+    session = daraja_service.get_http_session()
+    base_url = app.config['MPESA_BASE_URL']
+    session.mount(base_url, transport)
+    yield transport
+    session.adapters.pop(base_url, None)
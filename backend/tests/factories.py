@@ -0,0 +1,154 @@
+# tests/factories.py
+"""
+Factories for every model
+
+Each one builds a valid row with unique defaults, adds it to db.session and
+flushes it, so its id is set; keyword arguments override any column. Related
+rows are created when not given. Nothing is committed. Call them inside an
+app context, or through the `create` fixture, which commits and hands back
+the loaded row.
+"""
+import itertools
+from datetime import date, datetime, timedelta
+
+from app.models import db
+from app.models.admin_log import AdminActivityLog
+from app.models.c2b_transaction import C2BTransaction
+from app.models.cache_version import CacheVersion
+from app.models.contribution import Contribution
+from app.models.investment import ExternalInvestment
+from app.models.ledger import LedgerEntry, LedgerSnapshot
+from app.models.loan import Loan, LoanPayment
+from app.models.otp import OTP
+from app.models.overpayment import Overpayment
+from app.models.payment_status import PaymentStatus
+from app.models.user import User
+from app.services import ledger
+
+PASSWORD = 'correct horse battery staple'
+
+_sequence = itertools.count(1)
+
+def _add(model, defaults, overrides):
+    obj = model(**{**defaults, **overrides})
+    db.session.add(obj)
+    db.session.flush()
+    return obj
+
+def _related(overrides, key, factory):
+    """Create the row `key` points at unless the caller gave one"""
+    if key not in overrides:
+        overrides[key] = factory().id
+    return overrides
+
+def user(password=PASSWORD, **overrides):
+    n = next(_sequence)
+    member = User(**{
+        'username': f"member{n}",
+        'email': f"member{n}@example.com",
+        'first_name': 'Test',
+        'last_name': f"Member{n}",
+        'phone_number': f"2547{n:08d}",
+        'is_verified': True,
+        **overrides
+    })
+    member.password = password
+    db.session.add(member)
+    db.session.flush()
+    return member
+
+def admin(**overrides):
+    return user(**{'is_admin': True, **overrides})
+
+def contribution(**overrides):
+    return _add(Contribution, {
+        'amount': 3000.0,
+        'month': date.today().replace(day=1),
+        'payment_method': 'mpesa',
+        'transaction_id': f"TEST{next(_sequence):08d}"
+    }, _related(overrides, 'user_id', user))
+
+def loan(**overrides):
+    defaults = {'amount': 10000.0, 'status': 'pending'}
+    if overrides.get('status', 'pending') != 'pending':
+        defaults['due_date'] = datetime.utcnow() + timedelta(days=30)
+    return _add(Loan, defaults, _related(overrides, 'user_id', user))
+
+def loan_payment(**overrides):
+    return _add(LoanPayment, {
+        'amount': 1000.0,
+        'payment_method': 'mpesa',
+        'transaction_id': f"TEST{next(_sequence):08d}"
+    }, _related(overrides, 'loan_id', lambda: loan(status='approved')))
+
+def investment(**overrides):
+    return _add(ExternalInvestment, {
+        'amount': 50000.0,
+        'description': 'Treasury bill',
+        'expected_return': 55000.0,
+        'expected_return_date': datetime.utcnow() + timedelta(days=182)
+    }, _related(overrides, 'admin_id', admin))
+
+def otp(**overrides):
+    return _add(OTP, {
+        'code': f"{next(_sequence) % 1000000:06d}",
+        'expires_at': datetime.utcnow() + timedelta(minutes=10)
+    }, _related(overrides, 'user_id', user))
+
+def payment_status(**overrides):
+    n = next(_sequence)
+    return _add(PaymentStatus, {
+        'checkout_request_id': f"ws_CO_TEST_{n}",
+        'merchant_request_id': f"MR-TEST-{n}",
+        'transaction_type': 'contribution',
+        'amount': 3000.0,
+        'phone_number': '254712345678',
+        'status': 'pending'
+    }, _related(overrides, 'user_id', user))
+
+def admin_log(**overrides):
+    return _add(AdminActivityLog, {
+        'action': 'user_updated',
+        'target_type': 'user',
+        'description': 'Updated by a test'
+    }, _related(overrides, 'admin_id', admin))
+
+def overpayment(**overrides):
+    return _add(Overpayment, {
+        'original_payment_type': 'contribution',
+        'expected_amount': 3000.0,
+        'actual_amount': 3500.0,
+        'overpayment_amount': 500.0,
+        'remaining_amount': 500.0
+    }, _related(overrides, 'user_id', user))
+
+def ledger_posting(amount=1000.0, account=ledger.FUND_CASH, contra_account=ledger.INTEREST_INCOME,
+                   entry_type='adjustment', **overrides):
+    """A balanced two-leg posting (debit `account`, credit `contra_account`); returns its entries"""
+    transaction_ref = ledger.post(entry_type, [(account, amount), (contra_account, -amount)], **overrides)
+    db.session.flush()
+    return LedgerEntry.query.filter_by(transaction_ref=transaction_ref).order_by(LedgerEntry.id).all()
+
+def ledger_snapshot(**overrides):
+    return _add(LedgerSnapshot, {
+        'account': ledger.FUND_CASH,
+        'period': date.today().replace(day=1),
+        'balance': 0.0,
+        'entry_count': 0
+    }, overrides)
+
+def cache_version(**overrides):
+    return _add(CacheVersion, {'scope': f"table:test{next(_sequence)}", 'version': 1}, overrides)
+
+def c2b_transaction(**overrides):
+    n = next(_sequence)
+    return _add(C2BTransaction, {
+        'trans_id': f"TEST{n:06d}C2B",
+        'trans_type': 'Pay Bill',
+        'trans_time': datetime.utcnow(),
+        'amount': 3000.0,
+        'business_short_code': '174379',
+        'bill_ref_number': 'NINEFUND',
+        'msisdn': '254712345678',
+        'status': 'received'
+    }, overrides)
@@ -0,0 +1,64 @@
+# tests/mock_daraja.py
+import itertools
+import json
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+
+AUTH_PATH = '/oauth/v1/generate'
+STK_PUSH_PATH = '/mpesa/stkpush/v1/processrequest'
+
+class MockDaraja(BaseAdapter):
+    """
+    requests transport answering Daraja's OAuth and STK push endpoints
+
+    Mount it on daraja_service.get_http_session() for the Daraja base URL
+    (the `daraja` fixture does). Every request is recorded in `calls`; set
+    `stk_response` to change the STK push answer, or `error` to an exception
+    such as requests.ConnectTimeout to make every call fail.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        self.stk_response = None
+        self.error = None
+        self._ids = itertools.count(1)
+
+    def send(self, request, **kwargs):
+        self.calls.append(request)
+        if self.error is not None:
+            raise self.error
+
+        path = urlparse(request.url).path
+        if path == AUTH_PATH:
+            return self._reply(request, 200, {'access_token': 'mock-token', 'expires_in': '3599'})
+        if path == STK_PUSH_PATH:
+            n = next(self._ids)
+            return self._reply(request, 200, self.stk_response or {
+                'MerchantRequestID': f"MOCK-MR-{n}",
+                'CheckoutRequestID': f"ws_CO_MOCK_{n}",
+                'ResponseCode': '0',
+                'ResponseDescription': 'Success. Request accepted for processing',
+                'CustomerMessage': 'Success. Request accepted for processing'
+            })
+        return self._reply(request, 404, {'errorMessage': f"No mock for {path}"})
+
+    def close(self):
+        pass
+
+    def stk_pushes(self):
+        """JSON bodies of the STK push requests sent so far"""
+        return [json.loads(call.body) for call in self.calls if urlparse(call.url).path == STK_PUSH_PATH]
+
+    @staticmethod
+    def _reply(request, status, body):
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode('utf-8')
+        response.headers['Content-Type'] = 'application/json'
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
@@ -0,0 +1,60 @@
+# tests/test_admin_routes.py
+import json
+
+import factories
+from app.models import db
+from app.models.admin_log import AdminActivityLog
+from app.models.loan import Loan
+from app.services import ledger
+
+def test_dashboard_is_admin_only(client, create, auth_headers):
+    admin = create(factories.admin)
+    member = create(factories.user)
+
+    assert client.get('/api/admin/dashboard', headers=auth_headers(admin)).status_code == 200
+    assert client.get('/api/admin/dashboard', headers=auth_headers(member)).status_code == 403
+    assert client.get('/api/admin/dashboard').status_code == 401
+
+def test_add_contribution_posts_ledger_and_activity_log(app, client, create, auth_headers):
+    admin = create(factories.admin)
+    member = create(factories.user)
+
+    response = client.post('/api/admin/contributions', headers=auth_headers(admin),
+                           json={'user_id': member.id, 'amount': 2500, 'month': '2026-01'})
+
+    assert response.status_code == 201
+    with app.app_context():
+        assert ledger.account_balance(ledger.member_savings(member.id)) == 2500
+        log = AdminActivityLog.query.filter_by(admin_id=admin.id).one()
+        assert (log.action, log.target_type) == ('contribution_added', 'contribution')
+
+def test_approve_loan_disburses_it(app, client, create, auth_headers):
+    admin = create(factories.admin)
+    loan = create(factories.loan, amount=10000)
+
+    response = client.put(f"/api/admin/loans/{loan.id}/approve", headers=auth_headers(admin))
+
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.get(Loan, loan.id).status == 'approved'
+        assert ledger.account_balance(ledger.loan_receivable(loan.id)) == 10500
+        assert AdminActivityLog.query.filter_by(target_type='loan', target_id=loan.id).count() == 1
+
+def test_approve_loan_rejects_non_pending(client, create, auth_headers):
+    admin = create(factories.admin)
+    loan = create(factories.loan, status='approved')
+
+    response = client.put(f"/api/admin/loans/{loan.id}/approve", headers=auth_headers(admin))
+
+    assert response.status_code == 400
+
+def test_deleted_user_is_logged_with_iso_timestamps(app, client, create, auth_headers):
+    admin = create(factories.admin)
+    member = create(factories.user)
+
+    response = client.delete(f"/api/admin/users/{member.id}", headers=auth_headers(admin))
+
+    assert response.status_code == 200
+    with app.app_context():
+        log = AdminActivityLog.query.filter_by(action='user_deleted', target_id=member.id).one()
+        assert json.loads(log.old_values)['created_at'] == member.created_at.isoformat()
@@ -0,0 +1,48 @@
+# tests/test_audit_writer.py
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import factories
+from app.models.admin_log import AdminActivityLog
+from app.services.audit_writer import AuditLogWriter
+
+def spooled_row(admin_id, action):
+    return json.dumps({'admin_id': admin_id, 'action': action, 'target_type': 'user',
+                       'created_at': '2026-03-01T08:00:00'}) + '\n'
+
+def test_flush_replays_spool_past_truncated_lines(app, db_session, create, tmp_path, monkeypatch):
+    admin = create(factories.admin)
+    spool = tmp_path / 'audit_spool.ndjson'
+    monkeypatch.setitem(app.config, 'AUDIT_LOG_SPOOL_PATH', str(spool))
+    writer = AuditLogWriter()
+    writer.app = app
+
+    # A crash mid-write left the last line cut off
+    spool.write_text(spooled_row(admin.id, 'spooled') + spooled_row(admin.id, 'truncated')[:30])
+    # Claimed by a worker that died before replaying it, and by an earlier process with our PID
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    (tmp_path / f"audit_spool.ndjson.{dead.pid}").write_text(spooled_row(admin.id, 'stranded'))
+    (tmp_path / f"audit_spool.ndjson.{os.getpid()}").write_text(spooled_row(admin.id, 'same_pid'))
+
+    writer.write(admin_id=admin.id, action='written', target_type='user')
+
+    with app.app_context():
+        actions = sorted(log.action for log in AdminActivityLog.query.filter_by(admin_id=admin.id))
+    assert actions == ['same_pid', 'spooled', 'stranded', 'written']
+    assert writer._buffer == []
+    assert sorted(os.listdir(tmp_path)) == ['audit_spool.ndjson.rejected']
+    assert (tmp_path / 'audit_spool.ndjson.rejected').read_text().startswith('{"admin_id"')
+
+def test_write_rejects_values_json_cannot_hold(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'AUDIT_LOG_SPOOL_PATH', str(tmp_path / 'audit_spool.ndjson'))
+    writer = AuditLogWriter()
+    writer.app = app
+
+    with pytest.raises(TypeError):
+        writer.write(admin_id=1, action='user_updated', target_type='user', new_values={'tags': {'a'}})
+    assert writer._buffer == []
@@ -0,0 +1,92 @@
+# tests/test_auth_routes.py
+import pytest
+
+import factories
+from app.models import db
+from app.models.user import User
+
+@pytest.fixture
+def sent_codes(monkeypatch):
+    """OTP codes the auth routes email, by user ID"""
+    codes = {}
+    monkeypatch.setattr('app.routes.auth.send_otp_email', lambda user, code: codes.__setitem__(user.id, code))
+    return codes
+
+def test_register_creates_unverified_member(app, client, sent_codes):
+    response = client.post('/api/auth/register', json={
+        'username': 'wanjiru', 'email': 'wanjiru@example.com', 'password': factories.PASSWORD,
+        'first_name': 'Wanjiru', 'last_name': 'Kamau', 'phone_number': '0712345678'
+    })
+
+    assert response.status_code == 201
+    user_id = response.get_json()['user_id']
+    assert user_id in sent_codes
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert not user.is_verified
+        assert user.verify_password(factories.PASSWORD)
+
+def test_register_rejects_taken_username(client, create, sent_codes):
+    member = create(factories.user)
+
+    response = client.post('/api/auth/register', json={
+        'username': member.username, 'email': 'other@example.com', 'password': factories.PASSWORD,
+        'first_name': 'Other', 'last_name': 'Member', 'phone_number': '0712345678'
+    })
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Username already taken"}
+
+def test_login_and_verify_otp_returns_tokens(client, create, sent_codes):
+    member = create(factories.user)
+
+    response = client.post('/api/auth/login', json={'username': member.username, 'password': factories.PASSWORD})
+    assert response.status_code == 200
+
+    response = client.post('/api/auth/verify-otp', json={'user_id': member.id, 'otp_code': sent_codes[member.id]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['access_token'] and body['refresh_token']
+
+    response = client.get('/api/users/me', headers={'Authorization': f"Bearer {body['access_token']}"})
+    assert response.get_json()['username'] == member.username
+
+def test_login_keeps_otp_out_of_production_logs(app, client, create, sent_codes, monkeypatch, capsys):
+    member = create(factories.user)
+    monkeypatch.setitem(app.config, 'TESTING', False)
+    monkeypatch.setitem(app.config, 'DEBUG', False)
+
+    response = client.post('/api/auth/login', json={'username': member.username, 'password': factories.PASSWORD})
+
+    assert response.status_code == 200
+    assert sent_codes[member.id] not in capsys.readouterr().out
+
+def test_login_rejects_wrong_password(client, create, sent_codes):
+    member = create(factories.user)
+
+    response = client.post('/api/auth/login', json={'username': member.username, 'password': 'wrong'})
+
+    assert response.status_code == 401
+    assert not sent_codes
+
+def test_login_is_rate_limited_per_username(app, client, create, sent_codes):
+    member = create(factories.user)
+    allowed = int(app.config['LOGIN_RATE_LIMIT_PER_USER'].split('/')[0])
+
+    statuses = [
+        client.post('/api/auth/login', json={'username': member.username, 'password': 'wrong'}).status_code
+        for _ in range(allowed + 1)
+    ]
+
+    assert statuses == [401] * allowed + [429]
+
+def test_register_limit_ignores_forged_forwarded_for(client):
+    limit = int(client.application.config['REGISTER_RATE_LIMIT_PER_IP'].split('/')[0])
+
+    statuses = [
+        client.post('/api/auth/register', json={}, headers={'X-Forwarded-For': f"10.0.{n // 256}.{n % 256}"}).status_code
+        for n in range(limit + 1)
+    ]
+
+    assert statuses[:limit] == [400] * limit
+    assert statuses[limit] == 429
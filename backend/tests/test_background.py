@@ -0,0 +1,35 @@
+# tests/test_background.py
+import threading
+
+from app.services.background import BackgroundWorker
+
+class Counter(BackgroundWorker):
+    thread_name = 'test-counter'
+    interval_config = 'TEST_COUNTER_INTERVAL'
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self.ran = threading.Event()
+
+    def run_once(self):
+        self.ran.set()
+
+def test_wake_runs_on_one_thread_per_process(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'TEST_COUNTER_INTERVAL', 60)
+    worker = Counter(app)
+
+    worker._wake()
+    thread = worker._thread
+    worker._wake()
+
+    assert worker.ran.wait(5)
+    assert worker._thread is thread and thread.name == 'test-counter' and thread.daemon
+
+def test_zero_interval_disables_the_thread(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'TEST_COUNTER_INTERVAL', 0)
+    worker = Counter(app)
+
+    worker._ensure_thread()
+
+    assert worker._thread is None
@@ -0,0 +1,132 @@
+# tests/test_c2b.py
+from datetime import date, datetime, timedelta
+
+import factories
+from app.models import db
+from app.models.c2b_transaction import C2BTransaction
+from app.models.contribution import Contribution
+from app.models.loan import Loan
+from app.models.overpayment import Overpayment
+from app.services import ledger
+from app.services.c2b import parse_bill_ref, process_pending
+
+# The registered ConfirmationURL, with the token TestingConfig expects
+CONFIRMATION_URL = '/api/mpesa/confirmation?token=test-c2b-token'
+
+def confirmation(trans_id, amount, bill_ref, msisdn='254712345678'):
+    return {
+        'TransactionType': 'Pay Bill', 'TransID': trans_id, 'TransTime': '20260315101530',
+        'TransAmount': str(amount), 'BusinessShortCode': '174379', 'BillRefNumber': bill_ref,
+        'InvoiceNumber': '', 'OrgAccountBalance': '', 'ThirdPartyTransID': '',
+        'MSISDN': msisdn, 'FirstName': 'Wanjiru', 'MiddleName': '', 'LastName': 'Kamau'
+    }
+
+def test_parse_bill_ref():
+    assert parse_bill_ref('CONTRIB-12-2026-03') == ('contribution', 12, date(2026, 3, 1))
+    assert parse_bill_ref(' loan-7-12 ') == ('loan_repayment', 7, 12)
+    assert parse_bill_ref('CONTRIB-12-2026-13') is None
+    assert parse_bill_ref('NINEFUND') is None and parse_bill_ref(None) is None
+
+def test_confirmation_posts_referenced_contribution_once(app, client, create):
+    member = create(factories.user)
+    body = confirmation('RCF1AB2CD3', 3500, f"CONTRIB-{member.id}-2026-03")
+
+    first = client.post(CONFIRMATION_URL, json=body)
+    again = client.post(CONFIRMATION_URL, json=body)
+
+    assert first.get_json() == again.get_json() == {"ResultCode": "0", "ResultDesc": "Accepted"}
+    with app.app_context():
+        contribution = Contribution.query.filter_by(user_id=member.id).one()
+        assert (contribution.amount, contribution.month, contribution.transaction_id) == (3000, date(2026, 3, 1), 'RCF1AB2CD3')
+        assert Overpayment.query.filter_by(user_id=member.id).one().overpayment_amount == 500
+        txn = C2BTransaction.query.filter_by(trans_id='RCF1AB2CD3').one()
+        assert (txn.status, txn.match_method, txn.contribution_id) == ('posted', 'reference', contribution.id)
+        assert ledger.account_balance(ledger.member_savings(member.id)) == 3000
+
+def test_forged_confirmations_are_not_posted(app, client, create):
+    member = create(factories.user)
+    body = confirmation('FORGED0001', 50000, f"CONTRIB-{member.id}-2026-03")
+
+    responses = [
+        client.post('/api/mpesa/confirmation', json=body),
+        client.post('/api/mpesa/confirmation?token=guessed', json=body),
+        client.post(CONFIRMATION_URL, json=body, environ_base={'REMOTE_ADDR': '203.0.113.9'}),
+        client.post(CONFIRMATION_URL, json=dict(body, BusinessShortCode='999999')),
+        client.post('/api/mpesa/validation', json=dict(body, BusinessShortCode='999999')),
+    ]
+
+    assert [response.status_code for response in responses] == [403] * 5
+    with app.app_context():
+        assert C2BTransaction.query.filter_by(trans_id='FORGED0001').count() == 0
+        assert Contribution.query.filter_by(user_id=member.id).count() == 0
+        assert Overpayment.query.filter_by(user_id=member.id).count() == 0
+
+def test_confirmation_matches_member_by_msisdn(app, client, create):
+    member = create(factories.user, phone_number='0722000111')
+
+    client.post(CONFIRMATION_URL, json=confirmation('RCF2AB2CD3', 3000, 'my savings', msisdn='254722000111'))
+
+    with app.app_context():
+        txn = C2BTransaction.query.filter_by(trans_id='RCF2AB2CD3').one()
+        assert (txn.status, txn.user_id, txn.match_method) == ('posted', member.id, 'msisdn')
+        assert Contribution.query.filter_by(user_id=member.id).one().month == date(2026, 3, 1)
+
+def test_confirmation_repays_referenced_loan(app, client, create):
+    loan = create(factories.loan, status='approved', amount=10000, amount_due=10500, unpaid_balance=10500)
+
+    client.post(CONFIRMATION_URL, json=confirmation('RCF3AB2CD3', 4000, f"LOAN-{loan.id}-{loan.user_id}"))
+
+    with app.app_context():
+        assert db.session.get(Loan, loan.id).unpaid_balance == 6500
+        txn = C2BTransaction.query.filter_by(trans_id='RCF3AB2CD3').one()
+        assert (txn.status, txn.transaction_type, txn.loan_id) == ('posted', 'loan_repayment', loan.id)
+
+def test_repayment_of_unapproved_loan_waits_for_admin(app, client, create, auth_headers):
+    admin = create(factories.admin)
+    pending = create(factories.loan, status='pending', amount=10000, amount_due=10500, unpaid_balance=10500)
+    rejected = create(factories.loan, status='rejected', amount=10000, amount_due=10500, unpaid_balance=10500)
+
+    for n, loan in enumerate((pending, rejected)):
+        client.post(CONFIRMATION_URL, json=confirmation(f"RCF6AB2CD{n}", 4000, f"LOAN-{loan.id}-{loan.user_id}"))
+
+    with app.app_context():
+        for n, loan in enumerate((pending, rejected)):
+            txn = C2BTransaction.query.filter_by(trans_id=f"RCF6AB2CD{n}").one()
+            assert (txn.status, txn.loan_id) == ('unmatched', None)
+            assert (db.session.get(Loan, loan.id).status, db.session.get(Loan, loan.id).unpaid_balance) == (loan.status, 10500)
+        txn_id = C2BTransaction.query.filter_by(trans_id='RCF6AB2CD0').one().id
+
+    response = client.put(f"/api/admin/c2b-payments/{txn_id}/assign", headers=auth_headers(admin),
+                          json={'user_id': pending.user_id, 'loan_id': pending.id})
+
+    assert response.status_code == 400
+    with app.app_context():
+        assert db.session.get(C2BTransaction, txn_id).status == 'unmatched'
+        assert db.session.get(Loan, pending.id).status == 'pending'
+
+def test_unmatched_payment_waits_for_admin(app, client, create, auth_headers):
+    admin = create(factories.admin)
+    member = create(factories.user)
+    client.post(CONFIRMATION_URL, json=confirmation('RCF4AB2CD3', 2000, 'JOHN', msisdn='254799999999'))
+
+    queue = client.get('/api/admin/c2b-payments', headers=auth_headers(admin)).get_json()['payments']
+    assert [(p['trans_id'], p['status']) for p in queue] == [('RCF4AB2CD3', 'unmatched')]
+
+    response = client.put(f"/api/admin/c2b-payments/{queue[0]['id']}/assign", headers=auth_headers(admin),
+                          json={'user_id': member.id, 'month': '2026-02'})
+
+    assert response.status_code == 200
+    assert response.get_json()['payment']['match_method'] == 'admin'
+    assert client.put(f"/api/admin/c2b-payments/{queue[0]['id']}/assign", headers=auth_headers(admin),
+                      json={'user_id': member.id}).status_code == 400
+    with app.app_context():
+        assert Contribution.query.filter_by(user_id=member.id).one().month == date(2026, 2, 1)
+
+def test_stale_claims_are_retried(app, create):
+    member = create(factories.user)
+    txn = create(factories.c2b_transaction, bill_ref_number=f"CONTRIB-{member.id}-2026-03", status='processing',
+                 claimed_at=datetime.utcnow() - timedelta(hours=1), attempts=1)
+
+    with app.app_context():
+        assert process_pending() == {'posted': 1, 'unmatched': 0, 'skipped': 0}
+        assert db.session.get(C2BTransaction, txn.id).attempts == 2
@@ -0,0 +1,68 @@
+# tests/test_loan_ledger.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import create_app
+from app import config
+from app.models import db
+from app.models.loan import Loan, LoanPayment
+from app.models.overpayment import Overpayment
+from app.models.user import User
+from app.services.loan_ledger import apply_loan_payment, run_in_transaction
+
+PAYMENTS = 2000
+PAYMENT_AMOUNT = 7
+WORKERS = 8
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # A file database, so every worker thread gets its own connection
+    monkeypatch.setattr(config.TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'ledger.db'}")
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+@pytest.fixture
+def loan_id(app):
+    with app.app_context():
+        user = User(
+            username='member', email='member@example.com', first_name='Test',
+            last_name='Member', phone_number='254700000001'
+        )
+        user.password = 'password'
+        db.session.add(user)
+        db.session.flush()
+
+        loan = Loan(user_id=user.id, amount=10000, interest_rate=5, status='pending')
+        loan.approve_loan()
+        db.session.add(loan)
+        db.session.commit()
+        return loan.id
+
+def test_concurrent_payments_keep_exact_balances(app, loan_id):
+    def pay(n):
+        with app.app_context():
+            run_in_transaction(lambda: apply_loan_payment(
+                loan_id, PAYMENT_AMOUNT, transaction_id=f"STRESS-{n}", require_status=None
+            ))
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(pay, range(PAYMENTS)))
+
+    with app.app_context():
+        loan = db.session.get(Loan, loan_id)
+        total_paid = db.session.scalar(
+            db.select(db.func.sum(LoanPayment.amount)).where(LoanPayment.loan_id == loan_id)
+        )
+        total_overpaid = db.session.scalar(db.select(db.func.sum(Overpayment.overpayment_amount)))
+
+        assert loan.amount_due == 10500
+        assert loan.paid_amount == 10500
+        assert loan.unpaid_balance == 0
+        assert loan.status == 'paid'
+        assert total_paid == 10500
+        assert total_overpaid == PAYMENTS * PAYMENT_AMOUNT - 10500
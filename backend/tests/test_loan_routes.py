@@ -0,0 +1,34 @@
+# tests/test_loan_routes.py
+from datetime import date
+
+import factories
+from app.models.loan import Loan
+
+def test_member_applies_within_loan_limit(app, client, create, auth_headers):
+    member = create(factories.user)
+    for month in range(1, 4):
+        create(factories.contribution, user_id=member.id, month=date(2026, month, 1))
+
+    response = client.post('/api/loans', headers=auth_headers(member), json={'amount': 5000})
+
+    assert response.status_code == 201
+    assert response.get_json()['loan']['status'] == 'pending'
+    with app.app_context():
+        assert Loan.query.filter_by(user_id=member.id).count() == 1
+
+def test_member_cannot_exceed_loan_limit(client, create, auth_headers):
+    member = create(factories.user)
+
+    response = client.post('/api/loans', headers=auth_headers(member), json={'amount': 5000})
+
+    assert response.status_code == 400
+    assert 'loan limit' in response.get_json()['error']
+
+def test_member_sees_only_their_loans(client, create, auth_headers):
+    member = create(factories.user)
+    own = create(factories.loan, user_id=member.id)
+    create(factories.loan)
+
+    response = client.get('/api/loans', headers=auth_headers(member))
+
+    assert [loan['id'] for loan in response.get_json()['loans']] == [own.id]
@@ -0,0 +1,67 @@
+# tests/test_mpesa_routes.py
+import requests
+
+import factories
+from app.models import db
+from app.models.contribution import Contribution
+from app.models.ledger import LedgerEntry
+from app.models.payment_status import PaymentStatus
+from app.services import ledger
+
+def callback(checkout_request_id, amount, receipt='QKT1ABC2DE', result_code=0):
+    stk_callback = {
+        'MerchantRequestID': 'MR-TEST', 'CheckoutRequestID': checkout_request_id,
+        'ResultCode': result_code, 'ResultDesc': 'The service request is processed successfully.'
+    }
+    if result_code == 0:
+        stk_callback['CallbackMetadata'] = {'Item': [
+            {'Name': 'Amount', 'Value': amount},
+            {'Name': 'MpesaReceiptNumber', 'Value': receipt},
+            {'Name': 'PhoneNumber', 'Value': 254712345678}
+        ]}
+    return {'Body': {'stkCallback': stk_callback}}
+
+def test_initiate_contribution_sends_stk_push(app, client, create, auth_headers, daraja):
+    member = create(factories.user)
+
+    response = client.post('/api/mpesa/initiate-contribution', headers=auth_headers(member),
+                           json={'amount': 3000, 'phone_number': '0712345678'})
+
+    assert response.status_code == 200
+    assert response.get_json()['checkout_request_id'] == 'ws_CO_MOCK_1'
+    [push] = daraja.stk_pushes()
+    assert (push['Amount'], push['PhoneNumber'], push['PartyB']) == (3000, '254712345678', app.config['MPESA_SHORTCODE'])
+    with app.app_context():
+        payment = PaymentStatus.query.filter_by(user_id=member.id).one()
+        assert (payment.status, payment.merchant_request_id) == ('pending', 'MOCK-MR-1')
+
+def test_initiate_contribution_reports_daraja_outage(client, create, auth_headers, daraja):
+    member = create(factories.user)
+    daraja.error = requests.ConnectTimeout("Daraja is down")
+
+    response = client.post('/api/mpesa/initiate-contribution', headers=auth_headers(member), json={'amount': 3000})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "Could not get authentication token"
+
+def test_successful_callback_records_contribution(app, client, create):
+    payment = create(factories.payment_status, amount=3000)
+
+    response = client.post('/api/mpesa/callback', json=callback(payment.checkout_request_id, 3000))
+
+    assert response.get_json() == {"ResultCode": 0, "ResultDesc": "Success"}
+    with app.app_context():
+        contribution = Contribution.query.filter_by(user_id=payment.user_id).one()
+        assert (contribution.amount, contribution.transaction_id) == (3000, 'QKT1ABC2DE')
+        assert db.session.get(PaymentStatus, payment.id).status == 'success'
+        assert ledger.account_balance(ledger.member_savings(payment.user_id)) == 3000
+
+def test_failed_callback_marks_payment_failed(app, client, create):
+    payment = create(factories.payment_status)
+
+    response = client.post('/api/mpesa/callback', json=callback(payment.checkout_request_id, 0, result_code=1032))
+
+    assert response.get_json()['ResultCode'] == 1
+    with app.app_context():
+        assert db.session.get(PaymentStatus, payment.id).status == 'failed'
+        assert not LedgerEntry.query.count()
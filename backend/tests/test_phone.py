@@ -0,0 +1,44 @@
+# tests/test_phone.py
+import pytest
+
+import factories
+from app.models import db
+from app.models.user import User
+from app.utils.phone import is_safaricom, to_e164, to_msisdn
+
+@pytest.mark.parametrize('phone', ['0712345678', '712345678', '254712345678', '+254 712 345 678', '+254-712-345-678'])
+def test_to_msisdn_accepts_local_and_international_formats(phone):
+    assert to_msisdn(phone) == '254712345678'
+    assert to_e164(phone) == '+254712345678'
+
+@pytest.mark.parametrize('phone', ['', '4412345678', '07123456', '0712345678901'])
+def test_to_msisdn_rejects_other_numbers(phone):
+    with pytest.raises(ValueError):
+        to_msisdn(phone)
+
+def test_is_safaricom():
+    assert is_safaricom('254712345678') and is_safaricom('254799000000')
+    assert not is_safaricom('254110000000') and not is_safaricom('254762000000')
+
+def test_member_phone_is_stored_normalized(app, create):
+    member = create(factories.user, phone_number='0712 345 678')
+
+    assert member.phone_number == '+254712345678'
+    assert member.msisdn == '254712345678'
+    with app.app_context():
+        assert User.find_by_msisdn(254712345678).id == member.id
+        assert User.find_by_msisdn('not a number') is None
+
+def test_backfill_normalizes_existing_rows(app, create):
+    members = [create(factories.user) for _ in range(5)]
+    foreign = create(factories.user, phone_number='+4420794600000')
+    with app.app_context():
+        db.session.execute(db.update(User).values(phone_number='0712000001', msisdn=None)
+                           .where(User.id == members[0].id))
+        db.session.execute(db.update(User).values(msisdn=None).where(User.id.in_([m.id for m in members[1:]])))
+        db.session.commit()
+
+        assert User.backfill_msisdn(chunk_size=2) == 5
+
+        assert User.find_by_msisdn('0712000001').id == members[0].id
+        assert User.query.filter(User.msisdn.is_(None)).one().id == foreign.id
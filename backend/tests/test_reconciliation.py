@@ -0,0 +1,88 @@
+# tests/test_reconciliation.py
+import io
+from datetime import datetime
+
+import pytest
+
+import factories
+from app.services.reconciliation import StatementError, iter_statement, reconcile_statement
+
+HEADER = ('Receipt No.,Completion Time,Initiation Time,Details,Transaction Status,Paid In,Withdrawn,'
+          'Balance,Balance Confirmed,Reason Type,Other Party Info,Linked Transaction ID,A/C No.')
+
+def statement(*rows):
+    """Settlement CSV as the M-PESA org portal exports it, title block first"""
+    lines = ['Organization Name:,NINEFUND', 'Time Period:,01-03-2026 - 31-03-2026', '', HEADER]
+    for receipt, completed, paid_in, withdrawn, details in rows:
+        lines.append(f'{receipt},{completed},{completed},{details},Completed,"{paid_in}",{withdrawn},'
+                     f'0.00,true,Pay Bill,254712***678 - W K,,')
+    return io.StringIO('\n'.join(lines) + '\n')
+
+def test_iter_statement_yields_completed_credits():
+    counts = {}
+    entries = list(iter_statement(statement(
+        ('RCA1', '01-03-2026 08:00:00', '3,000.00', '', 'Pay Bill from 254712***678'),
+        ('RCA2', '01-03-2026 09:00:00', '', '50.00', 'Business charge'),
+    ), counts))
+
+    assert [(e.receipt, e.amount, e.completed_at) for e in entries] == [('RCA1', 3000.0, datetime(2026, 3, 1, 8))]
+    assert counts == {'rows': 2, 'skipped': 1}
+
+def test_iter_statement_rejects_other_files():
+    with pytest.raises(StatementError):
+        list(iter_statement(io.StringIO('name,email\nWanjiru,w@example.com\n')))
+
+def test_reconcile_statement_classifies_entries(app, create):
+    create(factories.payment_status, amount=3500, status='success', mpesa_receipt_number='RCB1',
+           completed_at=datetime(2026, 3, 2, 10))
+    create(factories.c2b_transaction, trans_id='RCB2', amount=3000, trans_time=datetime(2026, 3, 3, 10))
+    contribution = create(factories.contribution, transaction_id='RCB3', amount=3000)
+    create(factories.overpayment, user_id=contribution.user_id, original_payment_id=contribution.id,
+           overpayment_amount=500, actual_amount=3500)
+    create(factories.c2b_transaction, trans_id='RCB4', amount=1000, trans_time=datetime(2026, 3, 4, 10))
+    create(factories.c2b_transaction, trans_id='RCB5', amount=1000, trans_time=datetime(2025, 1, 1))
+
+    with app.app_context():
+        report = reconcile_statement(statement(
+            ('RCB1', '02-03-2026 10:00:00', '3,500.00', '', 'STK'),
+            ('RCB2', '03-03-2026 10:00:00', '2,000.00', '', 'Pay Bill'),
+            ('RCB3', '05-03-2026 10:00:00', '3,500.00', '', 'Pay Bill'),
+            ('RCB6', '06-03-2026 10:00:00', '700.00', '', 'Pay Bill'),
+        ))
+
+    assert report['summary'] == {
+        'matched': 2, 'matched_amount': 7000.0, 'amount_mismatches': 1,
+        'missing_in_system': 1, 'missing_in_statement': 1
+    }
+    assert [(m['receipt'], m['statement_amount'], m['recorded_amount']) for m in report['amount_mismatches']] == [('RCB2', 2000, 3000)]
+    assert report['missing_in_system'][0]['receipt'] == 'RCB6'
+    assert report['missing_in_statement'][0]['receipt'] == 'RCB4'
+
+def test_missing_in_statement_window_is_compared_in_utc(app, create):
+    # Statement covers 08:00-20:00 EAT, i.e. 05:00-17:00 UTC
+    create(factories.contribution, transaction_id='RCD1', created_at=datetime(2026, 3, 1, 5, 30))  # 08:30 EAT
+    create(factories.contribution, transaction_id='RCD2', created_at=datetime(2026, 3, 1, 4, 30))  # 07:30 EAT
+    create(factories.contribution, transaction_id='RCD3', created_at=datetime(2026, 3, 1, 16, 30))  # 19:30 EAT
+    create(factories.contribution, transaction_id='RCD4', created_at=datetime(2026, 3, 1, 18))  # 21:00 EAT
+    create(factories.c2b_transaction, trans_id='RCD5', trans_time=datetime(2026, 3, 1, 19, 59))  # TransTime is EAT
+    create(factories.c2b_transaction, trans_id='RCD6', trans_time=datetime(2026, 3, 1, 20, 1))
+
+    with app.app_context():
+        report = reconcile_statement(statement(
+            ('RCD7', '01-03-2026 08:00:00', '100.00', '', 'Pay Bill'),
+            ('RCD8', '01-03-2026 20:00:00', '100.00', '', 'Pay Bill'),
+        ))
+
+    assert sorted(m['receipt'] for m in report['missing_in_statement']) == ['RCD1', 'RCD3', 'RCD5']
+    assert (report['statement']['from'], report['statement']['to']) == (datetime(2026, 3, 1, 8), datetime(2026, 3, 1, 20))
+
+def test_admin_uploads_statement(client, create, auth_headers):
+    admin = create(factories.admin)
+    upload = io.BytesIO(statement(('RCC1', '01-03-2026 08:00:00', '3,000.00', '', 'Pay Bill')).getvalue().encode('utf-8'))
+
+    response = client.post('/api/admin/reconciliation', headers=auth_headers(admin),
+                           data={'statement': (upload, 'statement.csv')}, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    assert response.get_json()['summary']['missing_in_system'] == 1
+    assert client.post('/api/admin/reconciliation', headers=auth_headers(admin)).status_code == 400
@@ -0,0 +1,72 @@
+# tests/test_startup.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous defaults for shared CI machines; tighten per environment
+STARTUP_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', '4'))
+IMPORT_BUDGET_SECONDS = float(os.environ.get('IMPORT_BUDGET_SECONDS', '2.5'))
+
+# Wall-clock budgets mean nothing while other workers compete for the CPU; check them in a serial run
+timing_budget = pytest.mark.skipif(
+    'PYTEST_XDIST_WORKER' in os.environ, reason="timing budget; run serially: pytest tests/test_startup.py"
+)
+
+# Best of this many runs, so one slow run on a busy machine doesn't fail the build
+BUDGET_SAMPLES = 3
+
+# Only needed by the first Daraja call, the first email, registration or the flask db commands
+LAZY_MODULES = ('requests', 'flask_mail', 'email_validator', 'flask_migrate', 'alembic')
+
+def run_python(code, *flags):
+    """Run `code` in a fresh interpreter, as a new worker or CLI process would"""
+    env = dict(os.environ, FLASK_ENV='testing')
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    return subprocess.run(
+        [sys.executable, *flags, '-c', code], cwd=BACKEND, env=env, capture_output=True, text=True, check=True
+    )
+
+def loaded_after(code, modules):
+    check = f"import sys; print(','.join(m for m in {modules!r} if m in sys.modules))"
+    output = run_python(f"{code}\n{check}").stdout.strip().splitlines()
+    return [module for module in output[-1].split(',') if module] if output else []
+
+def test_web_app_defers_optional_imports():
+    assert loaded_after("from app import create_app; create_app('testing')", LAZY_MODULES) == []
+
+def test_slim_app_skips_routes():
+    modules = ('app.routes', 'flask_cors', 'flask_compress') + LAZY_MODULES[:3]
+    assert loaded_after("from app import create_app; create_app('testing', slim=True)", modules) == []
+
+def top_level_import_seconds():
+    stderr = run_python("from app import create_app", '-X', 'importtime').stderr
+
+    # Lines look like "import time:   self [us] |   cumulative | <indent>module"; top-level imports aren't indented
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '[us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            top_level[name.strip()] = int(cumulative)
+    return sum(top_level.values()) / 1e6, top_level
+
+@timing_budget
+def test_cold_start_within_budget():
+    code = (
+        "import time; started = time.perf_counter()\n"
+        "from app import create_app; create_app('testing')\n"
+        "print(time.perf_counter() - started)"
+    )
+    seconds = min(float(run_python(code).stdout.strip().splitlines()[-1]) for _ in range(BUDGET_SAMPLES))
+    assert seconds < STARTUP_BUDGET_SECONDS, f"create_app took {seconds:.2f}s (budget {STARTUP_BUDGET_SECONDS}s)"
+
+@timing_budget
+def test_import_time_within_budget():
+    seconds, top_level = min((top_level_import_seconds() for _ in range(BUDGET_SAMPLES)), key=lambda sample: sample[0])
+    slowest = ', '.join(f"{name} {us / 1000:.0f}ms" for name, us in sorted(top_level.items(), key=lambda i: -i[1])[:5])
+    assert seconds < IMPORT_BUDGET_SECONDS, f"Imports took {seconds:.2f}s (budget {IMPORT_BUDGET_SECONDS}s): {slowest}"
@@ -1,13 +1,16 @@
-from app import create_app
+from app import create_app  # Loads .env (app.config)
 from app.models import db
 from app.models.user import User
-from app.seed import seed_database
-from dotenv import load_dotenv
+import click
 import os
+import sys
 
-load_dotenv()
+# Maintenance commands (`flask seed-db`, ...) get the slim app without the web
+# stack; gunicorn, `python wsgi.py` and these flask commands get the full one
+FULL_APP_COMMANDS = {'run', 'routes', 'shell'}
+cli_command = os.environ.get('FLASK_RUN_FROM_CLI') == 'true' and not FULL_APP_COMMANDS & set(sys.argv[1:])
 
-app = create_app(os.getenv('FLASK_ENV', 'development'))
+app = create_app(os.getenv('FLASK_ENV', 'development'), slim=cli_command)
 
 @app.cli.command("create-admin")
 def create_admin():
@@ -38,8 +41,85 @@ def create_admin():
 @app.cli.command("seed-db")
 def run_seed():
     """Seed the database with initial data"""
+    from app.seed import seed_database
+    
     with app.app_context():
         seed_database()
 
+@app.cli.command("archive-activity-logs")
+@click.option('--months', type=int, default=None, help='Keep this many months in the database (default: AUDIT_LOG_RETENTION_MONTHS)')
+def archive_activity_logs_command(months):
+    """Move old admin activity logs into monthly gzipped NDJSON archives"""
+    from app.services.audit_archive import archive_activity_logs
+    
+    with app.app_context():
+        counts = archive_activity_logs(retention_months=months)
+        if not counts:
+            print("No activity logs to archive")
+        for month, count in sorted(counts.items()):
+            print(f"Archived {count} activity logs for {month}")
+
+@app.cli.command("process-c2b")
+def process_c2b_command():
+    """Match and post stored PayBill payments, leaving unmatched ones for admin review"""
+    from app.services.c2b import c2b_processor
+    
+    counts = c2b_processor.process()
+    print(f"Posted {counts['posted']}, unmatched {counts['unmatched']}, skipped {counts['skipped']}")
+
+@app.cli.command("reconcile")
+@click.argument('statement', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Write the full report to this JSON file')
+@click.option('--max-items', type=int, default=1000, help='Entries listed per category (counts are always exact)')
+def reconcile_command(statement, output, max_items):
+    """Reconcile an M-PESA settlement statement CSV against recorded payments"""
+    import json
+    from app.services.reconciliation import StatementError, reconcile_statement
+    
+    with app.app_context():
+        try:
+            with open(statement, encoding='utf-8-sig', newline='') as lines:
+                report = reconcile_statement(lines, max_items=max_items)
+        except StatementError as e:
+            raise click.ClickException(str(e))
+    
+    totals = report['statement']
+    print(f"Statement: {totals['credits']} credits of {totals['rows']} rows, KES {totals['total_paid_in']:,.2f}, "
+          f"{totals['from']} to {totals['to']}")
+    for category, count in report['summary'].items():
+        print(f"   {category:<22} {count:>12,}")
+    
+    if output:
+        with open(output, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, indent=2, default=str)
+        print(f"Report written to {output}")
+
+@app.cli.command("rebuild-search-index")
+def rebuild_search_index():
+    """Create or rebuild the full-text search index for members and activity logs"""
+    from app.services.search_index import ensure_search_index
+    
+    with app.app_context():
+        ensure_search_index(rebuild=True)
+        print("Search index rebuilt")
+
+@app.cli.group("statements")
+def statements_cli():
+    """Member statement commands"""
+
+@statements_cli.command("build")
+@click.option('--month', required=True, help='Closed month to build, as YYYY-MM')
+@click.option('--format', 'formats', multiple=True, type=click.Choice(['html', 'csv', 'pdf']), default=['html', 'csv'], help='Output formats (repeatable)')
+@click.option('--workers', type=int, default=None, help='Rendering processes (default: CPU count)')
+@click.option('--force', is_flag=True, help='Re-render statements that are already cached')
+def build_statements_command(month, formats, workers, force):
+    """Build and cache every member's statement for a closed month"""
+    from app.services.statements import build_statements, parse_month
+    
+    with app.app_context():
+        written = build_statements(parse_month(month), formats=formats, workers=workers, force=force)
+        print(f"Wrote {written} statement files for {month}")
+
 if __name__ == '__main__':
+    # Development server only; in production run `gunicorn wsgi:app` (see gunicorn.conf.py)
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -10,8 +10,10 @@ const getDashboard = async () => {
 };
 
 // Get all users
-const getUsers = async () => {
-  const response = await axios.get('/admin/users');
+// Pass fields (e.g. ['id', 'first_name', 'last_name']) to skip the derived loan figures
+const getUsers = async (fields) => {
+  const params = fields ? { fields: fields.join(',') } : undefined;
+  const response = await axios.get('/admin/users', { params });
   return response.data;
 };
 
@@ -57,6 +59,12 @@ const rejectLoan = async (loanId) => {
   return response.data;
 };
 
+// Approve or reject several loans at once
+const bulkLoanDecision = async (loanIds, decision) => {
+  const response = await axios.put('/admin/loans/bulk-decision', { loan_ids: loanIds, decision });
+  return response.data;
+};
+
 // Add loan payment
 const addLoanPayment = async (loanId, paymentData) => {
   const response = await axios.post(`/admin/loans/${loanId}/payment`, paymentData);
@@ -125,6 +133,12 @@ const getUserActiveLoans = async (userId) => {
   return response.data;
 };
 
+// Search members and activity logs
+const search = async (query, type = 'all') => {
+  const response = await axios.get('/admin/search', { params: { q: query, type } });
+  return response.data;
+};
+
 const adminService = {
   // Existing services
   getDashboard,
@@ -136,6 +150,7 @@ const adminService = {
   getPendingLoans,
   approveLoan,
   rejectLoan,
+  bulkLoanDecision,
   addLoanPayment,
   addContribution,
   getInvestments,
@@ -148,7 +163,8 @@ const adminService = {
   allocateOverpayment,
   modifyLoanDebt,
   addAdminContribution,
-  getUserActiveLoans
+  getUserActiveLoans,
+  search
 };
 
 export default adminService;
\ No newline at end of file